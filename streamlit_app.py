@@ -1,7 +1,13 @@
+import importlib
+
 import streamlit as st
-from utils.openai_client import init_open_ai_client
-from views import document_upload, earnings_script, qa_input, market_updates, shareholders
-from views import investor_outreach, investor_targeting, analyst_coverage, ir_communications, ir_crm
+from utils.document_store import missing_documents
+from utils.llm_metrics import ensure_metrics_server
+from utils.startup_metrics import get_startup_metrics
+
+startup = get_startup_metrics()
+run_started = startup.start_run()
+ensure_metrics_server()
 
 # Initialize page config and styling
 st.set_page_config(page_title="IR Content Creation Hub", layout="wide")
@@ -31,8 +37,6 @@ if 'company_highlights' not in st.session_state:
     st.session_state.company_highlights = {}
 if 'performance_data' not in st.session_state:
     st.session_state.performance_data = {}
-if 'weekly_summaries' not in st.session_state:
-    st.session_state.weekly_summaries = {}
 if 'company_name' not in st.session_state:
     st.session_state.company_name = "Stitch Fix"
 if 'quarter_options' not in st.session_state:
@@ -46,23 +50,23 @@ if 'selected_quarter' not in st.session_state:
     st.session_state.selected_quarter = "Q1"
 if 'fiscal_year' not in st.session_state:
     st.session_state.fiscal_year = "2025"
-if 'openai_client' not in st.session_state:
-    st.session_state.openai_client = init_open_ai_client()
-# Initialize session states for analyst coverage
-if 'analyst_coverage_data' not in st.session_state:
-    st.session_state.analyst_coverage_data = []
-if 'rating_history' not in st.session_state:
-    st.session_state.rating_history = []
 # Initialize session states for IR Communications
-if 'ir_emails' not in st.session_state:
-    st.session_state.ir_emails = []
-if 'ir_email_stats' not in st.session_state:
-    st.session_state.ir_email_stats = {}
 if 'ir_chatbot_conversations' not in st.session_state:
     st.session_state.ir_chatbot_conversations = []
-# Initialize session state for IR CRM
-if 'ir_meetings' not in st.session_state:
-    st.session_state.ir_meetings = {}
+# IR CRM, analyst coverage, calendar, inbox and weekly summaries live in utils.workspace_store
+
+# Forget uploads the shared store evicted and could not restore, so no view reads a missing document
+evicted = missing_documents(st.session_state.uploaded_files)
+if evicted:
+    names = ', '.join(st.session_state.uploaded_files[key]['name'] for key in evicted)
+    for key in evicted:
+        st.session_state.uploaded_files.pop(key)
+        for category_files in st.session_state.get('document_categories', {}).values():
+            category_files.pop(key, None)
+        for index in ('search_index', 'vector_index'):
+            if index in st.session_state:
+                st.session_state[index].remove_document(key)
+    st.warning(f"These documents are no longer on the server; please upload them again: {names}")
 
 
 # Add PEAK6 styling
@@ -103,17 +107,28 @@ fiscal_year = st.sidebar.text_input("Fiscal Year:", value=st.session_state.fisca
 st.title("IR Content Creation and Prep Hub")
 
 
+def view_page(module, **kwargs):
+    """Page whose view module (and its dependencies) is imported on first visit, not at startup"""
+    def run():
+        with startup.timed_import(f"views.{module}"):
+            view = importlib.import_module(f"views.{module}")
+        view.run()
+    return st.Page(run, **kwargs)
+
+
 pg = st.navigation([
-    st.Page(document_upload.run, title="Document Upload", icon=":material/upload_file:", url_path="1"),
-    st.Page(earnings_script.run, title="Earnings Script", icon=":material/script:", url_path="2"),
-    st.Page(qa_input.run, title="Q&A Preparation", icon=":material/design_services:", url_path="3"),
-    st.Page(shareholders.run, title="ShareHolders", icon=":material/local_library:", url_path="4"),
-    st.Page(investor_outreach.run, title="Investor Outreach", icon=":material/cell_tower:", url_path="5"),
-    st.Page(investor_targeting.run, title="Investor Targeting", icon=":material/track_changes:", url_path="6"),
-    st.Page(market_updates.run, title="Market Updates", icon=":material/sync_alt:", url_path="7"),
-    st.Page(analyst_coverage.run, title="Analyst Coverage", icon=":material/analytics:", url_path="8"),
-    st.Page(ir_communications.run, title="IR Communications", icon=":material/email:", url_path="9"),
-    st.Page(ir_crm.run, title="IR CRM", icon=":material/account_box:", url_path="10"),
+    view_page("document_upload", title="Document Upload", icon=":material/upload_file:", url_path="1"),
+    view_page("earnings_script", title="Earnings Script", icon=":material/script:", url_path="2"),
+    view_page("qa_input", title="Q&A Preparation", icon=":material/design_services:", url_path="3"),
+    view_page("shareholders", title="ShareHolders", icon=":material/local_library:", url_path="4"),
+    view_page("investor_outreach", title="Investor Outreach", icon=":material/cell_tower:", url_path="5"),
+    view_page("investor_targeting", title="Investor Targeting", icon=":material/track_changes:", url_path="6"),
+    view_page("market_updates", title="Market Updates", icon=":material/sync_alt:", url_path="7"),
+    view_page("analyst_coverage", title="Analyst Coverage", icon=":material/analytics:", url_path="8"),
+    view_page("ir_communications", title="IR Communications", icon=":material/email:", url_path="9"),
+    view_page("ir_crm", title="IR CRM", icon=":material/account_box:", url_path="10"),
+    view_page("llm_usage", title="LLM Usage", icon=":material/monitoring:", url_path="11"),
 ])
 
-pg.run()
\ No newline at end of file
+pg.run()
+startup.page_rendered(pg.title, run_started)
\ No newline at end of file
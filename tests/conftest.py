@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Stores resolve their directories at import; keep test runs out of the app's data directory
+os.environ.setdefault('IR_DATA_DIR', tempfile.mkdtemp(prefix='ir-data-'))
@@ -0,0 +1,27 @@
+from utils.document_store import DocumentStore
+from utils.search_index import BM25Index
+
+
+def test_evicted_document_is_reported_missing(tmp_path):
+    store = DocumentStore(str(tmp_path), max_bytes=1000)
+    store.put('old', ["gross margin " * 50])
+    store.put('new', ["revenue growth " * 50])
+
+    assert not store.available('old')
+    assert store.available('new')
+    assert store.read_text('new').startswith("revenue growth")
+
+
+def test_bm25_removal_does_not_read_the_store(tmp_path, monkeypatch):
+    store = DocumentStore(str(tmp_path))
+    store.put('doc', ["gross margin expanded\n\nrevenue grew"])
+    monkeypatch.setattr('utils.search_index.get_document_store', lambda: store)
+    index = BM25Index()
+    index.add_document('key', {'name': 'doc.txt', 'digest': 'doc'})
+    assert index.search("margin")
+
+    # Removal must still work after the text is gone from the store
+    monkeypatch.setattr('utils.search_index.get_document_store', lambda: None)
+    index.remove_document('key')
+    assert 'key' not in index
+    assert not index.search("margin")
@@ -0,0 +1,70 @@
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REQUEST = {'model': 'gpt-4o', 'messages': [{'role': 'user', 'content': 'Summarize the quarter.'}]}
+
+SYNTHETIC_RUN = """
+import json, sys
+from utils.openai_client import chat_completion
+response = chat_completion('test', **json.loads(sys.argv[1]))
+print(response.choices[0].message.content)
+"""
+
+LIVE_RUN = """
+import json, sys
+from types import SimpleNamespace
+import utils.openai_client as openai_client
+from utils.llm_cache import request_key
+
+params = json.loads(sys.argv[1])
+assert openai_client._cached_completion(request_key(params)) is None
+
+# Stand in for the upstream call: live mode must reach it rather than the cache
+sentinel = SimpleNamespace(usage=None, choices=[SimpleNamespace(message=SimpleNamespace(content='live'))])
+openai_client.get_llm_scheduler = lambda: SimpleNamespace(call=lambda create, params, priority: sentinel)
+openai_client._cache_completion = lambda *args: None
+print(openai_client.chat_completion('test', **params).choices[0].message.content)
+"""
+
+LIVE_CACHED_RUN = """
+import json, sys
+from utils.llm_cache import get_llm_cache, request_key
+completion = {'id': 'c', 'object': 'chat.completion', 'created': 0, 'model': 'gpt-4o',
+              'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': 'live'}}]}
+get_llm_cache().put(request_key(json.loads(sys.argv[1])), json.dumps(completion), 3600, call_site='test')
+"""
+
+CACHE_LOOKUP_RUN = """
+import json, sys
+import utils.openai_client as openai_client
+from utils.llm_cache import request_key
+print(openai_client._cached_completion(request_key(json.loads(sys.argv[1]))))
+"""
+
+
+def _run(script, tmp_path, **env):
+    env = dict(os.environ, IR_DATA_DIR=str(tmp_path), PYTHONPATH=REPO_ROOT, **env)
+    result = subprocess.run([sys.executable, '-c', script, json.dumps(REQUEST)], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip()
+
+
+def test_synthetic_response_never_served_live(tmp_path):
+    synthetic = _run(SYNTHETIC_RUN, tmp_path, OPENAI_TRANSPORT='synthetic', OPENAI_SYNTHETIC_LATENCY='0.01')
+    assert synthetic
+
+    live = _run(LIVE_RUN, tmp_path, OPENAI_TRANSPORT='live', OPENAI_KEY='test')
+    assert live == 'live'
+
+
+def test_record_mode_does_not_answer_from_the_live_cache(tmp_path):
+    _run(LIVE_CACHED_RUN, tmp_path, OPENAI_TRANSPORT='live')
+
+    # A cached answer would keep the request from reaching the recorder, leaving no fixture for replay
+    assert _run(CACHE_LOOKUP_RUN, tmp_path, OPENAI_TRANSPORT='record', OPENAI_KEY='test') == 'None'
+    assert _run(CACHE_LOOKUP_RUN, tmp_path, OPENAI_TRANSPORT='live', OPENAI_KEY='test') != 'None'
@@ -0,0 +1,107 @@
+import threading
+import time
+
+import httpx
+import openai
+import pytest
+from tenacity import wait_none
+
+from utils.llm_scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, LLMScheduler, TokenBucket
+
+PARAMS = {'model': 'gpt-4o', 'messages': [{'role': 'user', 'content': 'hi'}], 'max_tokens': 10}
+
+
+def test_bucket_refills_continuously():
+    bucket = TokenBucket(60)
+    now = bucket._updated
+    bucket.take(60, now)
+
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(30, now + 10) == pytest.approx(20.0)
+    assert bucket.wait_time(30, now + 30) == 0.0
+    # The level never refills past capacity
+    assert bucket.wait_time(60, now + 600) == 0.0
+    assert bucket.level == 60
+
+
+def test_charge_larger_than_capacity_delays_later_requests():
+    bucket = TokenBucket(60)
+    now = bucket._updated
+    assert bucket.wait_time(500, now) == 0.0
+    bucket.take(500, now)
+    assert bucket.wait_time(1, now) == pytest.approx(441.0)
+
+
+def test_interactive_requests_are_admitted_first():
+    scheduler = LLMScheduler(rpm=120, tpm=10 ** 6)
+    scheduler._requests.level = 0  # next admission in 0.5s
+    admitted = []
+
+    def acquire(name, priority):
+        scheduler.acquire(1, priority)
+        admitted.append(name)
+
+    background = threading.Thread(target=acquire, args=('background', PRIORITY_BACKGROUND))
+    background.start()
+    time.sleep(0.1)
+    interactive = threading.Thread(target=acquire, args=('interactive', PRIORITY_INTERACTIVE))
+    interactive.start()
+    background.join(timeout=5)
+    interactive.join(timeout=5)
+
+    assert admitted == ['interactive', 'background']
+
+
+def _rate_limit_error():
+    response = httpx.Response(429, request=httpx.Request('POST', 'https://api.openai.com/v1/chat/completions'))
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+def _without_backoff(scheduler, monkeypatch):
+    options = scheduler._retry_options()
+    monkeypatch.setattr(scheduler, '_retry_options', lambda: dict(options, wait=wait_none()))
+
+
+def test_rate_limited_call_is_retried(monkeypatch):
+    scheduler = LLMScheduler(max_attempts=3)
+    _without_backoff(scheduler, monkeypatch)
+    attempts = []
+
+    def create(**params):
+        attempts.append(params)
+        if len(attempts) < 3:
+            raise _rate_limit_error()
+        return 'done'
+
+    assert scheduler.call(create, PARAMS) == 'done'
+    assert len(attempts) == 3
+    # Every attempt went back through admission
+    assert scheduler._requests.level == pytest.approx(scheduler._requests.capacity - 3, abs=0.1)
+
+
+def test_retries_stop_after_max_attempts(monkeypatch):
+    scheduler = LLMScheduler(max_attempts=2)
+    _without_backoff(scheduler, monkeypatch)
+    attempts = []
+
+    def create(**params):
+        attempts.append(params)
+        raise _rate_limit_error()
+
+    with pytest.raises(openai.RateLimitError):
+        scheduler.call(create, PARAMS)
+    assert len(attempts) == 2
+
+
+def test_other_errors_are_not_retried(monkeypatch):
+    scheduler = LLMScheduler(max_attempts=3)
+    _without_backoff(scheduler, monkeypatch)
+    attempts = []
+
+    def create(**params):
+        attempts.append(params)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        scheduler.call(create, PARAMS)
+    assert len(attempts) == 1
@@ -0,0 +1,41 @@
+from utils.script_aligner import DELIVERED, REORDERED, SKIPPED, ScriptAligner
+
+OPENING = "alpha bravo charlie delta echo foxtrot golf hotel india juliet"
+GUIDANCE = "kilo lima mike november oscar papa quebec romeo sierra tango"
+CLOSING = "uniform victor whiskey xray yankee zulu amber basalt cobalt dune"
+
+
+def test_delivered_in_order():
+    aligner = ScriptAligner(' '.join([OPENING, GUIDANCE, CLOSING]))
+    aligner.feed(' '.join([OPENING, GUIDANCE, CLOSING]) + ' ')
+
+    state = aligner.snapshot()
+    assert set(state['status']) == {DELIVERED}
+    assert state['passages'] == []
+
+
+def test_skipped_then_reordered_section():
+    aligner = ScriptAligner(' '.join([OPENING, GUIDANCE, CLOSING]))
+    aligner.feed(OPENING + ' ')
+    aligner.feed(CLOSING + ' ')
+
+    state = aligner.snapshot()
+    assert [(passage['kind'], passage['text']) for passage in state['passages']] == [('skipped', GUIDANCE)]
+    assert state['status'][10:20] == [SKIPPED] * 10
+
+    # Coming back to the skipped section marks it delivered out of order
+    aligner.feed(GUIDANCE + ' ')
+    state = aligner.snapshot()
+    assert [(passage['kind'], passage['text']) for passage in state['passages']] == [
+        ('skipped', GUIDANCE), ('reordered', GUIDANCE)]
+    assert state['status'][10:20] == [REORDERED] * 10
+
+
+def test_adlib_is_reported():
+    aligner = ScriptAligner(' '.join([OPENING, GUIDANCE]))
+    aligner.feed(OPENING + ' ')
+    aligner.feed("before guidance let me thank our teams for an outstanding effort this quarter ")
+    aligner.feed(GUIDANCE + ' ')
+
+    kinds = [passage['kind'] for passage in aligner.snapshot()['passages']]
+    assert kinds == ['ad-lib']
@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+CALLERS = 5
+
+
+def _run_concurrently(flights, call):
+    start = threading.Barrier(CALLERS)
+    outcomes = [None] * CALLERS
+
+    def caller(i):
+        start.wait()
+        try:
+            outcomes[i] = ('result', flights.do('key', call))
+        except Exception as e:
+            outcomes[i] = ('error', e)
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+def test_concurrent_callers_share_one_call():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        release.wait(timeout=5)
+        return object()
+
+    threads, outcomes = _run_concurrently(flights, call)
+    # Hold the leader until every caller has had time to join its flight
+    release.wait(timeout=0.3)
+    release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert len(calls) == 1
+    assert len({id(result) for _, result in outcomes}) == 1
+    assert flights.in_flight() == 0
+
+
+def test_errors_reach_every_caller():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        release.wait(timeout=5)
+        raise ValueError("upstream failed")
+
+    threads, outcomes = _run_concurrently(flights, call)
+    release.wait(timeout=0.3)
+    release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert len(calls) == 1
+    assert all(kind == 'error' and isinstance(error, ValueError) for kind, error in outcomes)
+    assert flights.in_flight() == 0
+
+    # A finished flight does not cache its failure
+    assert flights.do('key', lambda: 'ok') == 'ok'
+
+
+def test_later_call_runs_again():
+    flights = SingleFlight()
+    assert flights.do('key', lambda: 1) == 1
+    assert flights.do('key', lambda: 2) == 2
+    with pytest.raises(KeyError):
+        flights.do('other', lambda: {}['missing'])
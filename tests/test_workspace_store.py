@@ -0,0 +1,66 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+import pytest
+
+from utils.workspace_store import WorkspaceStore
+
+ANALYST = {'id': 'a1', 'name': 'Jane Smith', 'firm': 'Firm', 'current_rating': 'Hold', 'price_target': 10.0}
+
+
+def _change(change_id, rating, target, day=1):
+    return {'id': change_id, 'analyst_id': 'a1', 'change_date': f'2026-01-{day:02d}',
+            'new_rating': rating, 'new_target': target}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = WorkspaceStore(str(tmp_path / 'workspace.sqlite3'))
+    store.put_analyst(ANALYST)
+    return store
+
+
+def test_rating_change_updates_analyst(store):
+    store.record_rating_change(_change('r1', 'Buy', 12.0))
+
+    analyst, = store.analysts()
+    assert (analyst['current_rating'], analyst['price_target'], analyst['last_updated']) == ('Buy', 12.0, '2026-01-01')
+    assert [change['id'] for change in store.rating_changes()] == ['r1']
+
+
+def test_failed_rating_change_leaves_nothing_behind(store):
+    store._conn.execute("CREATE TRIGGER fail_update BEFORE UPDATE ON analysts BEGIN SELECT RAISE(ABORT, 'boom'); END")
+
+    with pytest.raises(sqlite3.DatabaseError):
+        store.record_rating_change(_change('r1', 'Buy', 12.0))
+
+    assert store.rating_change_count() == 0
+    assert store.analysts()[0]['current_rating'] == 'Hold'
+    assert not store._conn.in_transaction
+
+
+def test_concurrent_rating_changes_from_two_connections(store, tmp_path):
+    # A second store on the same file stands in for another server process
+    other = WorkspaceStore(str(tmp_path / 'workspace.sqlite3'))
+    changes = [(target, _change(f'r{i}', 'Buy', float(i), day=i + 1)) for i, target in enumerate([store, other] * 5)]
+    threads = [threading.Thread(target=target.record_rating_change, args=(change,)) for target, change in changes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert store.rating_change_count() == 10
+    analyst, = store.analysts()
+    assert analyst['firm'] == 'Firm'
+    assert analyst['price_target'] in {float(i) for i in range(10)}
+
+
+def test_update_email(store):
+    store.add_email({'id': 'e1', 'timestamp': datetime(2026, 1, 2, 9, 30), 'subject': 'Q&A', 'read': False})
+
+    updated = store.update_email('e1', read=True)
+    assert updated['read'] is True
+    assert updated['timestamp'] == datetime(2026, 1, 2, 9, 30)
+    assert store.email_stats()['unread'] == 0
+    assert store.update_email('missing', read=True) is None
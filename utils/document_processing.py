@@ -1,29 +1,118 @@
 import io
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import Dict, Any, Optional
 from datetime import datetime
-import PyPDF2
-from docx import Document
 
+from utils.extraction_cache import get_extraction_cache, hash_file_bytes
 
-def extract_text_from_pdf(file_bytes):
-    try:
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_bytes))
-        text = ""
+# File types whose parse is expensive enough to be worth caching on disk
+CACHED_FILE_TYPES = {'pdf', 'docx'}
+
+# PDFs shorter than this are cheaper to parse inline than to hand to the pool
+PARALLEL_PAGE_THRESHOLD = int(os.getenv('IR_PDF_PARALLEL_THRESHOLD', 24))
+PAGES_PER_TASK = int(os.getenv('IR_PDF_PAGES_PER_TASK', 8))
+PDF_WORKERS = int(os.getenv('IR_PDF_WORKERS', min(4, os.cpu_count() or 1)))
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+# Worker-side reader, reused across the page ranges of one document
+_worker_reader = None
+_worker_reader_path = None
+
+
+def _get_pdf_pool():
+    """Process pool shared by all sessions for page-level PDF extraction"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+        return _pdf_pool
+
+def _extract_page_range(pdf_path, start, end):
+    """Runs in a pool worker; the PDF is read from disk so bytes aren't pickled per task"""
+    import PyPDF2
+    global _worker_reader, _worker_reader_path
+    if _worker_reader_path != pdf_path:
+        with open(pdf_path, 'rb') as f:
+            _worker_reader = PyPDF2.PdfReader(io.BytesIO(f.read()))
+        _worker_reader_path = pdf_path
+    return start, [_worker_reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+def extract_pdf_pages(file_bytes, progress_callback=None):
+    """Extract text page by page, fanning long documents out across the process pool.
+
+    progress_callback(pages_done, page_count) is called on the caller's thread.
+    """
+    # Parser libraries load on first upload, not with every page that imports this module
+    import PyPDF2
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_bytes))
+    page_count = len(pdf_reader.pages)
+
+    if page_count < PARALLEL_PAGE_THRESHOLD or PDF_WORKERS < 2:
+        pages = []
         for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text
-    except Exception as e:
-        return f"Error extracting PDF text: {str(e)}"
+            pages.append(page.extract_text() or "")
+            if progress_callback:
+                progress_callback(len(pages), page_count)
+        return pages
 
-def extract_text_from_docx(file_bytes):
+    pages = [None] * page_count
+    pages_done = 0
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+        tmp.write(file_bytes)
     try:
-        doc = Document(io.BytesIO(file_bytes))
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text
+        pool = _get_pdf_pool()
+        futures = [
+            pool.submit(_extract_page_range, tmp.name, start, min(start + PAGES_PER_TASK, page_count))
+            for start in range(0, page_count, PAGES_PER_TASK)
+        ]
+        for future in as_completed(futures):
+            start, texts = future.result()
+            pages[start:start + len(texts)] = texts
+            pages_done += len(texts)
+            if progress_callback:
+                progress_callback(pages_done, page_count)
+    finally:
+        os.remove(tmp.name)
+    return pages
+
+def _read_docx_pages(file_bytes):
+    from docx import Document
+    # DOCX has no fixed pagination, so the whole body is a single page
+    doc = Document(io.BytesIO(file_bytes))
+    return ["\n".join(paragraph.text for paragraph in doc.paragraphs)]
+
+def _cached_pages(file_type, file_bytes, digest, progress_callback):
+    if digest is None:
+        digest = hash_file_bytes(file_bytes)
+    if file_type == 'pdf':
+        extract = lambda: extract_pdf_pages(file_bytes, progress_callback=progress_callback)
+    else:
+        extract = lambda: _read_docx_pages(file_bytes)
+    # Failed parses raise out of the cache so they are never stored
+    return get_extraction_cache().get_or_extract(digest, extract)
+
+def extract_pages(file_name, file_bytes, digest=None, progress_callback=None):
+    """Extract per-page text from an uploaded file, parsing each unique PDF/DOCX only once per server"""
+    file_type = file_name.split('.')[-1].lower()
+
+    if file_type == 'txt':
+        return [file_bytes.decode('utf-8')]
+    if file_type not in CACHED_FILE_TYPES:
+        return [f"File uploaded: {file_name} (Content extraction not supported for {file_type} files)"]
+
+    try:
+        return _cached_pages(file_type, file_bytes, digest, progress_callback)
     except Exception as e:
-        return f"Error extracting DOCX text: {str(e)}"
+        return [f"Error extracting {file_type.upper()} text: {str(e)}"]
+
+def is_extraction_error(pages):
+    """True when extract_pages returned an error message instead of content"""
+    return len(pages) == 1 and pages[0].startswith("Error extracting")
 
 def estimate_tokens(text):
-    return len(text) // 4
\ No newline at end of file
+    return len(text) // 4
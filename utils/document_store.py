@@ -0,0 +1,281 @@
+import json
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+from utils.extraction_cache import get_extraction_cache
+from utils.storage import data_dir
+
+DEFAULT_MAX_BYTES = int(os.getenv('IR_DOCUMENT_STORE_MAX_BYTES', 1024 * 1024 * 1024))
+# Documents kept memory-mapped (one mmap and fd each) at once
+DEFAULT_MAX_OPEN = int(os.getenv('IR_DOCUMENT_STORE_MAX_OPEN', 64))
+
+
+class DocumentStore:
+    """Process-wide, content-addressed store of extracted document text.
+
+    Each unique upload is written to disk once and then served from a shared
+    read-only memory map, so sessions only hold small handles (digest plus
+    metadata) instead of their own copy of every document.
+
+    Documents are evicted least recently used first once the directory grows
+    past ``max_bytes``, and at most ``max_open`` of them stay mapped. An
+    evicted PDF or DOCX comes back from the extraction cache while that cache
+    still holds it; anything else is gone, and sessions drop their handles to
+    it (see missing_documents).
+    """
+
+    def __init__(self, store_dir, max_bytes=DEFAULT_MAX_BYTES, max_open=DEFAULT_MAX_OPEN):
+        self.store_dir = store_dir
+        self.max_bytes = max_bytes
+        self.max_open = max_open
+        self._lock = threading.Lock()
+        self._maps = OrderedDict()
+        self._page_offsets = OrderedDict()
+        self._sizes = {}
+        for entry in os.scandir(store_dir):
+            if entry.is_file() and entry.name.endswith('.txt'):
+                digest = entry.name[:-4]
+                try:
+                    self._sizes[digest] = entry.stat().st_size + os.path.getsize(self._index_path(digest))
+                except OSError:
+                    self._sizes[digest] = entry.stat().st_size
+
+    def _text_path(self, digest):
+        return os.path.join(self.store_dir, f"{digest}.txt")
+
+    def _index_path(self, digest):
+        return os.path.join(self.store_dir, f"{digest}.pages.json")
+
+    def has(self, digest):
+        return os.path.exists(self._text_path(digest))
+
+    def available(self, digest):
+        """Whether a document can be read, restoring it first if it was evicted"""
+        self._restore(digest)
+        return self.has(digest)
+
+    def put(self, digest, pages):
+        """Write extracted pages once; later puts of the same digest are no-ops"""
+        if self.has(digest):
+            return
+
+        offsets = [0]
+        tmp_suffix = f".{threading.get_ident()}.tmp"
+        with open(self._text_path(digest) + tmp_suffix, 'wb') as f:
+            for page in pages:
+                encoded = (page + "\n").encode('utf-8')
+                f.write(encoded)
+                offsets.append(offsets[-1] + len(encoded))
+        with open(self._index_path(digest) + tmp_suffix, 'w', encoding='utf-8') as f:
+            json.dump(offsets, f)
+
+        # The index lands first so a visible text file always has its page offsets
+        os.replace(self._index_path(digest) + tmp_suffix, self._index_path(digest))
+        os.replace(self._text_path(digest) + tmp_suffix, self._text_path(digest))
+        size = os.path.getsize(self._text_path(digest)) + os.path.getsize(self._index_path(digest))
+        with self._lock:
+            self._sizes[digest] = size
+            self._evict(keep=digest)
+
+    def _restore(self, digest):
+        """Rewrite an evicted document from the extraction cache, if it is still there"""
+        if not self.has(digest):
+            pages = get_extraction_cache().get(digest)
+            if pages is not None:
+                self.put(digest, pages)
+
+    def _map(self, digest):
+        """Memoryview over a document's map; the map cannot be closed while the view is alive"""
+        with self._lock:
+            mapped = self._maps.get(digest)
+            if mapped is not None:
+                self._maps.move_to_end(digest)
+                return memoryview(mapped)
+        self._restore(digest)
+        with self._lock:
+            mapped = self._maps.get(digest)
+            if mapped is None:
+                with open(self._text_path(digest), 'rb') as f:
+                    # mmap refuses empty files; an empty bytes object behaves the same for readers
+                    if os.fstat(f.fileno()).st_size == 0:
+                        mapped = b""
+                    else:
+                        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[digest] = mapped
+                # Touch so eviction order across restarts follows last use rather than creation
+                try:
+                    os.utime(self._text_path(digest))
+                except OSError:
+                    pass
+                while len(self._maps) > self.max_open:
+                    self._close(next(iter(self._maps)))
+            else:
+                self._maps.move_to_end(digest)
+            return memoryview(mapped)
+
+    def _close(self, digest):
+        mapped = self._maps.pop(digest, None)
+        self._page_offsets.pop(digest, None)
+        if isinstance(mapped, mmap.mmap):
+            try:
+                mapped.close()
+            except BufferError:
+                # A reader still holds a view; the map closes once the last view is released
+                pass
+
+    def _evict(self, keep):
+        total = sum(self._sizes.values())
+        if total <= self.max_bytes:
+            return
+
+        # Mapped documents are the most recently used, in map order; the rest go by mtime
+        open_order = {digest: i for i, digest in enumerate(self._maps)}
+        entries = []
+        for digest in self._sizes:
+            if digest == keep:
+                continue
+            if digest in open_order:
+                entries.append((1, open_order[digest], digest))
+                continue
+            try:
+                entries.append((0, os.path.getmtime(self._text_path(digest)), digest))
+            except OSError:
+                entries.append((0, 0, digest))
+        entries.sort()
+
+        for _, _, digest in entries:
+            if total <= self.max_bytes:
+                break
+            # The text goes first so has() never sees a document without its page index
+            for path in (self._text_path(digest), self._index_path(digest)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= self._sizes.pop(digest)
+            self._close(digest)
+
+    def _offsets(self, digest):
+        with self._lock:
+            offsets = self._page_offsets.get(digest)
+            if offsets is not None:
+                self._page_offsets.move_to_end(digest)
+                return offsets
+        self._restore(digest)
+        with open(self._index_path(digest), 'r', encoding='utf-8') as f:
+            offsets = json.load(f)
+        with self._lock:
+            self._page_offsets[digest] = offsets
+            while len(self._page_offsets) > self.max_open:
+                self._page_offsets.popitem(last=False)
+        return offsets
+
+    def view(self, digest, start=0, end=None):
+        """Zero-copy view of the UTF-8 bytes of a stored document"""
+        return self._map(digest)[start:end]
+
+    def size(self, digest):
+        return len(self._map(digest))
+
+    def page_count(self, digest):
+        return len(self._offsets(digest)) - 1
+
+    def read_page(self, digest, page_number):
+        offsets = self._offsets(digest)
+        return str(self.view(digest, offsets[page_number], offsets[page_number + 1]), 'utf-8')
+
+    def iter_pages(self, digest):
+        for page_number in range(self.page_count(digest)):
+            yield self.read_page(digest, page_number)
+
+    def read_text(self, digest, max_chars=None):
+        """Decode a document, or only its first max_chars characters"""
+        if max_chars is None:
+            return str(self.view(digest), 'utf-8')
+        # A UTF-8 character is at most 4 bytes; 'ignore' only drops a character split at the cut
+        return str(self.view(digest, 0, max_chars * 4), 'utf-8', 'ignore')[:max_chars]
+
+    def iter_split(self, digest, separator):
+        """Lazy text.split(separator) over the memory map, decoding one piece at a time"""
+        view = self._map(digest)
+        mapped = view.obj
+        sep = separator.encode('utf-8')
+        start = 0
+        while True:
+            end = mapped.find(sep, start)
+            if end == -1:
+                yield str(view[start:], 'utf-8')
+                return
+            yield str(view[start:end], 'utf-8')
+            start = end + len(sep)
+
+    def read_range(self, digest, start, end):
+        return str(self.view(digest, start, end), 'utf-8')
+
+    def iter_chunk_spans(self, digest, max_bytes=2000):
+        """Yield (start, end) byte spans of roughly max_bytes, cut on paragraph boundaries where possible"""
+        # Holding the view keeps the map open until the generator finishes
+        view = self._map(digest)
+        mapped = view.obj
+        total = len(mapped)
+        start = 0
+        while start < total:
+            end = min(start + max_bytes, total)
+            if end < total:
+                # Prefer the last paragraph break, then line break, then space inside the window
+                for sep in (b"\n\n", b"\n", b" "):
+                    cut = mapped.rfind(sep, start + 1, end)
+                    if cut != -1:
+                        end = cut + len(sep)
+                        break
+                else:
+                    # Never split a multi-byte UTF-8 character
+                    while end > start + 1 and (mapped[end] & 0xC0) == 0x80:
+                        end -= 1
+            yield start, end
+            start = end
+
+    def iter_lines(self, digest):
+        return self.iter_split(digest, '\n')
+
+    def iter_line_spans(self, digest):
+        """(start, end, line) for every line, with byte offsets into the stored text"""
+        view = self._map(digest)
+        mapped = view.obj
+        start = 0
+        while True:
+            end = mapped.find(b"\n", start)
+            if end == -1:
+                yield start, len(mapped), str(view[start:], 'utf-8')
+                return
+            yield start, end, str(view[start:end], 'utf-8')
+            start = end + 1
+
+    def iter_paragraphs(self, digest):
+        return self.iter_split(digest, '\n\n')
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_document_store():
+    """Process-wide document store shared across sessions"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DocumentStore(data_dir('documents'))
+        return _store
+
+
+def missing_documents(handles):
+    """Keys of a {key: handle} mapping whose documents were evicted and cannot be restored"""
+    store = get_document_store()
+    return [key for key, doc in handles.items() if not store.available(doc['digest'])]
+
+
+def read_document(doc, max_chars=None):
+    """Full (or leading) text of a session document handle"""
+    return get_document_store().read_text(doc['digest'], max_chars=max_chars)
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import threading
+
+from utils.storage import data_dir
+
+# Bump when extractor output changes so stale entries are never served
+CACHE_VERSION = "v2"
+DEFAULT_MAX_BYTES = int(os.getenv('IR_EXTRACTION_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+
+def hash_file_bytes(file_bytes):
+    """Content address used for every derived artifact of an uploaded file"""
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+class ExtractionCache:
+    """Disk-backed cache of extracted document pages, keyed by content hash.
+
+    Shared by all sessions in the server process. Entries are evicted least
+    recently used first once the directory grows past ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._sizes = {}
+        for entry in os.scandir(cache_dir):
+            if entry.is_file() and entry.name.endswith('.json'):
+                self._sizes[entry.name[:-5]] = entry.stat().st_size
+
+    def _path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def get(self, digest):
+        path = self._path(digest)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                pages = json.load(f)
+        except FileNotFoundError:
+            return None
+        # Touch so eviction order follows last use rather than creation
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return pages
+
+    def put(self, digest, pages):
+        path = self._path(digest)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(pages, f)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._sizes[digest] = os.path.getsize(path)
+            self._evict()
+
+    def get_or_extract(self, digest, extract):
+        """Return cached pages for digest, running extract() at most once per digest"""
+        pages = self.get(digest)
+        if pages is not None:
+            return pages
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(digest, threading.Lock())
+
+        try:
+            with key_lock:
+                # Another session may have finished the same file while we waited
+                pages = self.get(digest)
+                if pages is None:
+                    pages = extract()
+                    self.put(digest, pages)
+        finally:
+            with self._lock:
+                self._key_locks.pop(digest, None)
+        return pages
+
+    def _evict(self):
+        total = sum(self._sizes.values())
+        if total <= self.max_bytes:
+            return
+
+        entries = []
+        for digest in self._sizes:
+            try:
+                entries.append((os.path.getmtime(self._path(digest)), digest))
+            except OSError:
+                entries.append((0, digest))
+        entries.sort()
+
+        for _, digest in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(digest))
+            except OSError:
+                pass
+            total -= self._sizes.pop(digest)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache():
+    """Process-wide extraction cache shared across sessions"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ExtractionCache(data_dir('extraction', CACHE_VERSION))
+        return _cache
@@ -0,0 +1,285 @@
+import codecs
+import os
+import re
+import socket
+import threading
+import time
+from collections import deque
+
+from utils.search_index import tokenize
+from utils.transcript_parser import IR_MANAGEMENT_SPEAKERS, parse_speaker_list
+from utils.vector_index import HashingVectorizer, VectorIndex
+
+LIVE_MATCH_TOP_K = 3
+# Content words a question needs before it is matched; fewer gives noisy suggestions
+LIVE_MATCH_MIN_TOKENS = 3
+LIVE_FEED_POLL_INTERVAL = float(os.getenv('IR_LIVE_FEED_POLL_INTERVAL', 0.05))
+LIVE_HISTORY_TURNS = 50
+
+# "Jane Roe: text" or "Jane Roe - Firm: text" opens a turn; so does a "Jane Roe - Firm" line on its own
+COLON_LABEL = re.compile(r"^([A-Z][\w.'-]*(?: [A-Z][\w.'-]*){0,3})(?: [-–] ([^:]{1,80}))?:\s*")
+DASH_LABEL = re.compile(r"^([A-Z][\w.'-]*(?: [A-Z][\w.'-]*){0,3}) [-–] ([^:]{1,80})$")
+# An unfinished line that may still turn out to be one of the labels above
+LABEL_PREFIX = re.compile(r"^[A-Z][\w.'-]*(?: [A-Z][\w.'-]*){0,3} ?(?:[-–] ?[^:]{0,80})?$")
+
+
+class AnswerIndex:
+    """Prepared Q&A embedded once, so a question in progress is matched with one matrix product"""
+
+    def __init__(self, entries, vectorizer=None):
+        self.vectorizer = vectorizer or HashingVectorizer()
+        self.entries = [entry for entry in entries if entry.get('question')]
+        self.index = VectorIndex(dim=self.vectorizer.dim, capacity=max(len(self.entries), 1))
+        if self.entries:
+            self.index.add(self.vectorizer.transform([entry['question'] for entry in self.entries]), self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def match(self, text, k=LIVE_MATCH_TOP_K):
+        """Up to k (entry, score) pairs for the text, best first"""
+        return [(entry, score) for entry, score in self.index.search(self.vectorizer.transform([text]), k=k)[0]
+                if score > 0]
+
+
+class LiveQuestionTracker:
+    """Follows a live transcript and keeps the question being asked matched against prepared answers.
+
+    Text arrives in arbitrary fragments. A line opening with a speaker label
+    starts a turn; turns by anyone other than management or the operator
+    are questions, and they are re-matched every time they grow, including
+    the unfinished last line, so suggestions are ready before the analyst
+    finishes asking.
+    """
+
+    def __init__(self, answer_index, management_speakers=None, top_k=LIVE_MATCH_TOP_K):
+        if management_speakers is None:
+            management_speakers = parse_speaker_list(IR_MANAGEMENT_SPEAKERS)
+        self.answer_index = answer_index
+        self.management_speakers = {name.lower() for name in management_speakers}
+        self.top_k = top_k
+        self._lock = threading.Lock()
+        self._partial = ""
+        self._turn = None
+        self.turns = deque(maxlen=LIVE_HISTORY_TURNS)
+        self.live = None
+        # Called as listener(role, new_text, new_turn) with speech as it arrives
+        self.speech_listeners = []
+        self._opened = 0
+        self._forwarded = {}  # turn number -> characters passed on
+        self._last_forwarded = None
+
+    def _role(self, speaker):
+        if speaker is None:
+            return None
+        if speaker.lower() == 'operator':
+            return 'operator'
+        return 'management' if speaker.lower() in self.management_speakers else 'analyst'
+
+    def _label(self, line, complete):
+        """(speaker, firm, body) if the line opens a turn"""
+        match = COLON_LABEL.match(line)
+        if match:
+            return match.group(1), match.group(2), line[match.end():]
+        if complete:
+            stripped = line.strip()
+            if stripped.lower() in self.management_speakers:
+                return stripped, None, ""
+            match = DASH_LABEL.match(stripped)
+            if match:
+                return match.group(1), match.group(2), ""
+        return None
+
+    def _open_turn(self, speaker, firm, body):
+        self._close_turn()
+        self._opened += 1
+        self._turn = {'number': self._opened, 'speaker': speaker, 'firm': firm, 'role': self._role(speaker),
+                      'lines': [], 'matches': [], 'matched_text': ""}
+        if body.strip():
+            self._turn['lines'].append(body.strip())
+
+    def _close_turn(self):
+        if self._turn is not None and self._turn['lines']:
+            text = ' '.join(self._turn['lines'])
+            self._forward(self._turn['number'], self._turn['role'], text)
+            if self._turn['role'] == 'analyst' and text != self._turn['matched_text']:
+                self._match(self._turn, text)
+            self.turns.append({'speaker': self._turn['speaker'], 'firm': self._turn['firm'],
+                               'role': self._turn['role'], 'text': text, 'matches': self._turn['matches']})
+        self._turn = None
+
+    def _forward(self, number, role, text):
+        """Pass what a turn has added since the last call on to the speech listeners"""
+        if not self.speech_listeners:
+            return
+        sent = self._forwarded.get(number, 0)
+        if len(text) <= sent:
+            return
+        for listener in self.speech_listeners:
+            listener(role, text[sent:], number != self._last_forwarded)
+        self._last_forwarded = number
+        self._forwarded = {n: chars for n, chars in self._forwarded.items() if n >= self._opened}
+        self._forwarded[number] = len(text)
+
+    def _match(self, turn, text):
+        if len(tokenize(text)) < LIVE_MATCH_MIN_TOKENS or not len(self.answer_index):
+            return False
+        turn['matches'] = self.answer_index.match(text, k=self.top_k)
+        turn['matched_text'] = text
+        return True
+
+    def feed(self, fragment, received=None):
+        """Add transcript text as it arrives and refresh the suggestions for the question in progress"""
+        received = received if received is not None else time.perf_counter()
+        with self._lock:
+            lines = (self._partial + fragment).split('\n')
+            self._partial = lines.pop()
+            for line in lines:
+                if not line.strip():
+                    continue
+                label = self._label(line, complete=True)
+                if label is not None:
+                    self._open_turn(*label)
+                elif self._turn is None:
+                    self._open_turn(None, None, line)
+                else:
+                    self._turn['lines'].append(line.strip())
+
+            # The unfinished line belongs to a new turn if it already shows a label, else to the open one
+            label = self._label(self._partial, complete=False)
+            if label is not None:
+                speaker, firm, body = label
+                turn = {'number': self._opened + 1, 'speaker': speaker, 'firm': firm, 'role': self._role(speaker),
+                        'matches': [], 'matched_text': ""}
+                text = body.strip()
+                spoken = text
+            else:
+                turn = self._turn
+                lines = self._turn['lines'] if self._turn else []
+                text = ' '.join(lines + [self._partial.strip()]).strip()
+                # Hold back a line that may yet be the next speaker's label
+                spoken = ' '.join(lines) if LABEL_PREFIX.match(self._partial.strip()) else text
+            if turn is not None:
+                self._forward(turn['number'], turn['role'], spoken)
+
+            if turn is None or turn['role'] != 'analyst':
+                self.live = None if turn is None else dict(turn, text=text, match_ms=None)
+                return
+            if text != turn['matched_text'] and self._match(turn, text):
+                self.live = dict(turn, text=text, match_ms=(time.perf_counter() - received) * 1000)
+            elif self.live is None or self.live.get('speaker') != turn['speaker']:
+                self.live = dict(turn, text=text, match_ms=None)
+            else:
+                self.live['text'] = text
+
+    def snapshot(self):
+        """(question in progress, completed turns newest first) for rendering"""
+        with self._lock:
+            return (dict(self.live) if self.live else None), list(reversed(self.turns))
+
+
+def tail_file(path, stop, poll_interval=LIVE_FEED_POLL_INTERVAL, from_start=True):
+    """Yield the file's text, then text appended as it is written; starts over if the file is truncated"""
+    decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    position = 0 if from_start or not os.path.exists(path) else os.path.getsize(path)
+    while not stop.is_set():
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            stop.wait(poll_interval)
+            continue
+        if size < position:
+            position = 0
+            decoder.reset()
+        if size == position:
+            stop.wait(poll_interval)
+            continue
+        with open(path, 'rb') as f:
+            f.seek(position)
+            data = f.read(size - position)
+        position += len(data)
+        yield decoder.decode(data)
+
+
+def read_socket(port, stop, poll_interval=LIVE_FEED_POLL_INTERVAL):
+    """Yield text sent to a local TCP port, one connection at a time (e.g. `transcriber | nc 127.0.0.1 PORT`)"""
+    with socket.create_server(('127.0.0.1', port)) as server:
+        server.settimeout(poll_interval)
+        while not stop.is_set():
+            try:
+                connection, _ = server.accept()
+            except socket.timeout:
+                continue
+            decoder = codecs.getincrementaldecoder('utf-8')('replace')
+            with connection:
+                connection.settimeout(poll_interval)
+                while not stop.is_set():
+                    try:
+                        data = connection.recv(4096)
+                    except socket.timeout:
+                        continue
+                    if not data:
+                        break
+                    yield decoder.decode(data)
+
+
+class LiveFeed:
+    """Background ingestion loop that feeds a transcript source into a tracker as text arrives"""
+
+    def __init__(self, source, tracker, aligner=None):
+        self.source = source  # source(stop) -> iterable of text fragments
+        self.tracker = tracker
+        self.aligner = aligner  # script aligner listening to the tracker, if any
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="live-transcript", daemon=True)
+
+    def _run(self):
+        try:
+            for fragment in self.source(self._stop):
+                self.tracker.feed(fragment)
+        except Exception as e:
+            self.error = e
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=1.0)
+
+
+_feeds = {}
+_feeds_lock = threading.Lock()
+
+
+def get_live_feed(key):
+    """Feed last started on a source (e.g. 'file:/path' or 'tcp:8766') by any session, or None"""
+    with _feeds_lock:
+        return _feeds.get(key)
+
+
+def start_live_feed(key, feed):
+    """Start feed on a source, first stopping whatever feed holds it so the file or port is free"""
+    with _feeds_lock:
+        previous = _feeds.pop(key, None)
+        if previous is not None:
+            previous.stop()
+        # Finished feeds are only kept to show their last state on their own source
+        for other in [other for other, existing in _feeds.items() if not existing.running]:
+            del _feeds[other]
+        _feeds[key] = feed.start()
+        return feed
+
+
+def stop_live_feed(key):
+    with _feeds_lock:
+        feed = _feeds.get(key)
+    if feed is not None:
+        feed.stop()
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from utils.storage import data_dir
+
+DEFAULT_MAX_BYTES = int(os.getenv('IR_LLM_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+
+def normalize_request(params):
+    """Canonical form of a chat-completion request, insensitive to key order and prompt edge whitespace"""
+    normalized = dict(params)
+    normalized['messages'] = [
+        dict(message, content=message['content'].replace('\r\n', '\n').strip())
+        if isinstance(message.get('content'), str) else message
+        for message in params.get('messages', [])
+    ]
+    return normalized
+
+
+def request_key(params):
+    canonical = json.dumps(normalize_request(params), sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """SQLite-backed cache of chat-completion responses with per-entry TTL and LRU size cap.
+
+    One connection is shared by every session in the process and guarded by a
+    lock; WAL mode keeps readers from blocking on the occasional write.
+    """
+
+    def __init__(self, db_path, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                call_site TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_expires_at ON responses (expires_at)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, expires_at, size FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            response, expires_at, size = row
+            if expires_at <= now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= size
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            return response
+
+    def put(self, key, response, ttl, call_site=''):
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, call_site, response, size, created_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, call_site, response, size, now, now + ttl, now))
+            self._total_bytes += size - (previous[0] if previous else 0)
+            self._evict(now)
+
+    def _evict(self, now):
+        if self._total_bytes <= self.max_bytes:
+            return
+        # Expired rows go first, then least recently used until back under the cap
+        freed = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses WHERE expires_at <= ?", (now,)).fetchone()[0]
+        self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        self._total_bytes -= freed
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            if self._total_bytes <= self.max_bytes:
+                break
+            victims.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+
+    def clear(self, call_site=None):
+        with self._lock:
+            if call_site is None:
+                self._conn.execute("DELETE FROM responses")
+            else:
+                self._conn.execute("DELETE FROM responses WHERE call_site = ?", (call_site,))
+            self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Process-wide LLM response cache shared across sessions.
+
+    Every transport but live (record, replay, synthetic) gets its own
+    database, emptied when the process starts: their completions never reach
+    live runs, a recording run sends every request upstream so each one gets
+    a fixture, and an offline run never starts from an earlier run's hits.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            from utils.llm_transport import OPENAI_TRANSPORT
+            if OPENAI_TRANSPORT != 'live':
+                _cache = LLMResponseCache(os.path.join(data_dir('llm_cache'), f'responses.{OPENAI_TRANSPORT}.sqlite3'))
+                _cache.clear()
+            else:
+                _cache = LLMResponseCache(os.path.join(data_dir('llm_cache'), 'responses.sqlite3'))
+        return _cache
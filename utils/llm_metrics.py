@@ -0,0 +1,276 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.startup_metrics import get_startup_metrics, prometheus_label
+from utils.storage import data_dir
+
+# Serve /metrics (Prometheus text) and /calls.jsonl on this port when set
+IR_METRICS_PORT = os.getenv('IR_METRICS_PORT')
+# The endpoint has no auth, so it only listens on loopback unless a host is given
+IR_METRICS_HOST = os.getenv('IR_METRICS_HOST', '127.0.0.1')
+IR_METRICS_MAX_RECORDS = int(os.getenv('IR_METRICS_MAX_RECORDS', 10000))
+# The call log is rotated to a single .1 backup once it reaches this size
+IR_METRICS_LOG_MAX_BYTES = int(os.getenv('IR_METRICS_LOG_MAX_BYTES', 64 * 1024 * 1024))
+
+# USD per million (prompt, completion) tokens
+MODEL_PRICES = {
+    'gpt-4-turbo-preview': (10.0, 30.0),
+    'gpt-4-turbo': (10.0, 30.0),
+    'gpt-4o': (2.5, 10.0),
+    'gpt-4o-mini': (0.15, 0.6),
+    'gpt-3.5-turbo': (0.5, 1.5),
+}
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60, 120)
+
+logger = logging.getLogger(__name__)
+
+_current_call = contextvars.ContextVar('llm_call', default=None)
+
+
+def call_cost(model, prompt_tokens, completion_tokens):
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+
+class LLMCall:
+    """Measurements for one logical chat-completion call, recorded into the process-wide metrics.
+
+    Inside its with-block, HTTP hooks on the shared clients attribute every
+    attempt and the response headers to this call. Non-streamed calls are
+    recorded on exit; streamed ones call finish() when the stream ends.
+    """
+
+    def __init__(self, call_site, params, stream=False):
+        self.call_site = call_site
+        self.model = params.get('model')
+        self.stream = stream
+        self.cache = None  # hit | miss | coalesced
+        self.attempts = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.ttft = None
+        self.started = time.perf_counter()
+        self._first_request = None
+        self._last_request = None
+        self.ttfb = None
+        self._token = None
+        self._finished = False
+
+    def __enter__(self):
+        self._token = _current_call.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_call.reset(self._token)
+        if exc_type is not None:
+            self.finish(error=exc)
+        elif not self.stream:
+            self.finish()
+        return False
+
+    def on_request(self):
+        now = time.perf_counter()
+        self.attempts += 1
+        self._last_request = now
+        if self._first_request is None:
+            self._first_request = now
+
+    def on_response(self):
+        # Time from sending the final attempt to its response headers
+        if self._last_request is not None:
+            self.ttfb = time.perf_counter() - self._last_request
+
+    def set_usage(self, usage):
+        if usage is not None:
+            self.prompt_tokens = usage.prompt_tokens
+            self.completion_tokens = usage.completion_tokens
+
+    def finish(self, error=None):
+        if self._finished:
+            return
+        self._finished = True
+        latency = time.perf_counter() - self.started
+        upstream = self.cache == 'miss'
+        get_llm_metrics().record({
+            'ts': time.time(),
+            'call_site': self.call_site,
+            'model': self.model,
+            'stream': self.stream,
+            'cache': self.cache or ('miss' if self.attempts else 'hit'),
+            'status': 'error' if error is not None else 'ok',
+            'error': type(error).__name__ if error is not None else None,
+            'prompt_tokens': self.prompt_tokens if upstream else 0,
+            'completion_tokens': self.completion_tokens if upstream else 0,
+            'cost_usd': call_cost(self.model, self.prompt_tokens, self.completion_tokens) if upstream else 0.0,
+            'queue_wait_s': (self._first_request - self.started) if self._first_request is not None else None,
+            'ttfb_s': self.ttfb,
+            'ttft_s': self.ttft,
+            'latency_s': latency,
+            'attempts': self.attempts,
+            'retries': max(self.attempts - 1, 0),
+        })
+
+
+def _on_request(request):
+    call = _current_call.get()
+    if call is not None:
+        call.on_request()
+
+def _on_response(response):
+    call = _current_call.get()
+    if call is not None:
+        call.on_response()
+
+async def _on_request_async(request):
+    _on_request(request)
+
+async def _on_response_async(response):
+    _on_response(response)
+
+# httpx event hooks for the shared OpenAI clients
+HTTP_EVENT_HOOKS = {'request': [_on_request], 'response': [_on_response]}
+ASYNC_HTTP_EVENT_HOOKS = {'request': [_on_request_async], 'response': [_on_response_async]}
+
+
+class LLMMetrics:
+    """Recent call records plus cumulative per-call-site counters, exportable as JSONL or Prometheus text"""
+
+    def __init__(self, log_path=None, max_records=IR_METRICS_MAX_RECORDS, max_log_bytes=IR_METRICS_LOG_MAX_BYTES):
+        self.log_path = log_path
+        self.max_log_bytes = max_log_bytes
+        self._log_bytes = os.path.getsize(log_path) if log_path and os.path.exists(log_path) else 0
+        self._lock = threading.Lock()
+        self._records = deque(maxlen=max_records)
+        self._counters = defaultdict(float)
+        self._latency = defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+        self._latency_sum = defaultdict(float)
+
+    def record(self, call):
+        line = json.dumps(call)
+        site = call['call_site']
+        with self._lock:
+            self._records.append(call)
+            self._counters[('calls', site, call['cache'], call['status'])] += 1
+            self._counters[('prompt_tokens', site)] += call['prompt_tokens']
+            self._counters[('completion_tokens', site)] += call['completion_tokens']
+            self._counters[('cost_usd', site)] += call['cost_usd'] or 0.0
+            self._counters[('retries', site)] += call['retries']
+            buckets = self._latency[site]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if call['latency_s'] <= bound:
+                    buckets[i] += 1
+            buckets[-1] += 1
+            self._latency_sum[site] += call['latency_s']
+            if self.log_path:
+                if self._log_bytes >= self.max_log_bytes:
+                    os.replace(self.log_path, self.log_path + '.1')
+                    self._log_bytes = 0
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    self._log_bytes += f.write(line + '\n')
+
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def to_jsonl(self):
+        return ''.join(json.dumps(call) + '\n' for call in self.records())
+
+    def to_prometheus(self):
+        with self._lock:
+            counters = dict(self._counters)
+            latency = {site: list(buckets) for site, buckets in self._latency.items()}
+            latency_sum = dict(self._latency_sum)
+
+        lines = [
+            "# HELP ir_llm_calls_total Chat-completion calls by call site, cache outcome and status.",
+            "# TYPE ir_llm_calls_total counter",
+        ]
+        for key, value in sorted(counters.items()):
+            if key[0] == 'calls':
+                site, cache, status = (prometheus_label(label) for label in key[1:])
+                lines.append(f'ir_llm_calls_total{{call_site="{site}",cache="{cache}",status="{status}"}} {value:g}')
+        for name, help_text in (('prompt_tokens', "Prompt tokens sent upstream."),
+                                ('completion_tokens', "Completion tokens received from upstream."),
+                                ('cost_usd', "Estimated spend in USD."),
+                                ('retries', "Retried upstream attempts.")):
+            lines += [f"# HELP ir_llm_{name}_total {help_text}", f"# TYPE ir_llm_{name}_total counter"]
+            for key, value in sorted(counters.items()):
+                if key[0] == name:
+                    lines.append(f'ir_llm_{name}_total{{call_site="{prometheus_label(key[1])}"}} {value:g}')
+
+        lines += ["# HELP ir_llm_latency_seconds End-to-end call latency.", "# TYPE ir_llm_latency_seconds histogram"]
+        for site, buckets in sorted(latency.items()):
+            label = prometheus_label(site)
+            for bound, count in zip(LATENCY_BUCKETS, buckets):
+                lines.append(f'ir_llm_latency_seconds_bucket{{call_site="{label}",le="{bound:g}"}} {count}')
+            lines.append(f'ir_llm_latency_seconds_bucket{{call_site="{label}",le="+Inf"}} {buckets[-1]}')
+            lines.append(f'ir_llm_latency_seconds_sum{{call_site="{label}"}} {latency_sum[site]:g}')
+            lines.append(f'ir_llm_latency_seconds_count{{call_site="{label}"}} {buckets[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        metrics = get_llm_metrics()
+        if self.path == '/metrics':
+            body = metrics.to_prometheus() + get_startup_metrics().to_prometheus()
+            content_type = 'text/plain; version=0.0.4'
+        elif self.path == '/calls.jsonl':
+            body, content_type = metrics.to_jsonl(), 'application/x-ndjson'
+        else:
+            self.send_error(404)
+            return
+        encoded = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host=IR_METRICS_HOST):
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="llm-metrics", daemon=True).start()
+    return server
+
+
+_server = None
+_server_attempted = False
+_server_lock = threading.Lock()
+
+
+def ensure_metrics_server():
+    """Start the export endpoint once per process when IR_METRICS_PORT is set; bind errors are logged, not raised"""
+    global _server, _server_attempted
+    with _server_lock:
+        if not _server_attempted and IR_METRICS_PORT:
+            _server_attempted = True
+            try:
+                _server = start_metrics_server(int(IR_METRICS_PORT))
+            except OSError as error:
+                logger.warning("Metrics endpoint not started on %s:%s: %s", IR_METRICS_HOST, IR_METRICS_PORT, error)
+        return _server
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_llm_metrics():
+    """Process-wide LLM call metrics"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = LLMMetrics(os.path.join(data_dir('metrics'), 'llm_calls.jsonl'))
+        return _metrics
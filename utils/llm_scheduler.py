@@ -0,0 +1,177 @@
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+
+from tenacity import AsyncRetrying, Retrying, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+
+from utils.document_processing import estimate_tokens
+
+# Account-level budgets the scheduler keeps every session within
+OPENAI_RPM_LIMIT = int(os.getenv('OPENAI_RPM_LIMIT', 500))
+OPENAI_TPM_LIMIT = int(os.getenv('OPENAI_TPM_LIMIT', 150000))
+OPENAI_MAX_ATTEMPTS = int(os.getenv('OPENAI_MAX_ATTEMPTS', 5))
+OPENAI_RETRY_MAX_WAIT = float(os.getenv('OPENAI_RETRY_MAX_WAIT', 30.0))
+# Completion size assumed when a request sets no max_tokens
+DEFAULT_COMPLETION_TOKENS = 1000
+
+# Lower values are admitted first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+RETRYABLE_ERRORS = ('RateLimitError', 'APIConnectionError', 'APITimeoutError', 'InternalServerError')
+
+
+class TokenBucket:
+    """Continuously refilling budget of capacity units per minute"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.level = float(capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.capacity / 60.0)
+        self._updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until amount units are available (0 if they are now)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) * 60.0 / self.capacity
+
+    def take(self, amount, now):
+        self._refill(now)
+        # May go negative: a charge larger than the budget simply delays everyone after it
+        self.level -= amount
+
+
+def estimate_request_tokens(params):
+    """Tokens a request counts against TPM: prompt estimate plus its completion allowance"""
+    prompt_tokens = sum(estimate_tokens(message['content']) for message in params.get('messages', [])
+                        if isinstance(message.get('content'), str))
+    return prompt_tokens + (params.get('max_tokens') or DEFAULT_COMPLETION_TOKENS)
+
+
+class LLMScheduler:
+    """Process-wide admission control for OpenAI requests.
+
+    Requests wait in priority order until both the requests-per-minute and
+    tokens-per-minute buckets can cover them; interactive work is admitted
+    ahead of background refreshes. Transient failures (429, 5xx, timeouts,
+    dropped connections) are retried with jittered exponential backoff, and
+    every attempt goes back through admission.
+    """
+
+    def __init__(self, rpm=OPENAI_RPM_LIMIT, tpm=OPENAI_TPM_LIMIT, max_attempts=OPENAI_MAX_ATTEMPTS):
+        self.max_attempts = max_attempts
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+        self._condition = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    def _admit(self, ticket, tokens):
+        """With the condition held: 0 if ticket was admitted, else seconds to wait (None: not its turn)"""
+        if self._waiters[0] is not ticket:
+            return None
+        now = time.monotonic()
+        wait = max(self._requests.wait_time(1, now), self._tokens.wait_time(tokens, now))
+        if wait:
+            return wait
+        self._requests.take(1, now)
+        self._tokens.take(tokens, now)
+        heapq.heappop(self._waiters)
+        self._condition.notify_all()
+        return 0
+
+    def _withdraw(self, ticket):
+        with self._condition:
+            if ticket in self._waiters:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+    def acquire(self, tokens, priority=PRIORITY_INTERACTIVE):
+        ticket = (priority, next(self._sequence))
+        with self._condition:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    wait = self._admit(ticket, tokens)
+                    if wait == 0:
+                        return
+                    self._condition.wait(timeout=wait if wait is not None else 1.0)
+            except BaseException:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+                raise
+
+    async def acquire_async(self, tokens, priority=PRIORITY_INTERACTIVE):
+        ticket = (priority, next(self._sequence))
+        with self._condition:
+            heapq.heappush(self._waiters, ticket)
+        try:
+            while True:
+                with self._condition:
+                    wait = self._admit(ticket, tokens)
+                if wait == 0:
+                    return
+                # Never block the event loop on the condition; poll until it is this ticket's turn
+                await asyncio.sleep(min(wait, 1.0) if wait is not None else 0.05)
+        except BaseException:
+            self._withdraw(ticket)
+            raise
+
+    def settle(self, estimated_tokens, usage):
+        """Correct the TPM bucket once the real usage of an admitted request is known"""
+        if usage is None:
+            return
+        with self._condition:
+            self._tokens.take(usage.total_tokens - estimated_tokens, time.monotonic())
+            self._condition.notify_all()
+
+    def _retry_options(self):
+        # The SDK is looked up here, on the first request, so importing the scheduler stays cheap
+        import openai
+        return dict(
+            retry=retry_if_exception_type(tuple(getattr(openai, name) for name in RETRYABLE_ERRORS)),
+            wait=wait_random_exponential(multiplier=1, max=OPENAI_RETRY_MAX_WAIT),
+            stop=stop_after_attempt(self.max_attempts),
+            reraise=True,
+        )
+
+    def call(self, create, params, priority=PRIORITY_INTERACTIVE):
+        """Run create(**params) under the rate limits with retries; returns its result"""
+        tokens = estimate_request_tokens(params)
+        for attempt in Retrying(**self._retry_options()):
+            with attempt:
+                self.acquire(tokens, priority)
+                response = create(**params)
+        self.settle(tokens, getattr(response, 'usage', None))
+        return response
+
+    async def call_async(self, create, params, priority=PRIORITY_INTERACTIVE):
+        tokens = estimate_request_tokens(params)
+        async for attempt in AsyncRetrying(**self._retry_options()):
+            with attempt:
+                await self.acquire_async(tokens, priority)
+                response = await create(**params)
+        self.settle(tokens, getattr(response, 'usage', None))
+        return response
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_llm_scheduler():
+    """Process-wide LLM request scheduler shared across sessions"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+        return _scheduler
@@ -0,0 +1,279 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+import httpx
+
+from utils.document_processing import estimate_tokens
+from utils.storage import data_dir
+
+# live | record | replay | synthetic
+OPENAI_TRANSPORT = os.getenv('OPENAI_TRANSPORT', 'live').lower()
+OPENAI_FIXTURES_DIR = os.getenv('OPENAI_FIXTURES_DIR')
+# Synthetic mode: time to first byte, streaming speed, completion length cap and injected 429 share
+OPENAI_SYNTHETIC_LATENCY = float(os.getenv('OPENAI_SYNTHETIC_LATENCY', 0.5))
+OPENAI_SYNTHETIC_TOKENS_PER_SECOND = float(os.getenv('OPENAI_SYNTHETIC_TOKENS_PER_SECOND', 50))
+OPENAI_SYNTHETIC_COMPLETION_TOKENS = int(os.getenv('OPENAI_SYNTHETIC_COMPLETION_TOKENS', 400))
+OPENAI_SYNTHETIC_429_RATE = float(os.getenv('OPENAI_SYNTHETIC_429_RATE', 0.0))
+OPENAI_SYNTHETIC_SEED = int(os.getenv('OPENAI_SYNTHETIC_SEED', 0))
+
+OFFLINE_MODES = ('replay', 'synthetic')
+
+SYNTHETIC_WORDS = ("revenue grew year-over-year as active clients increased and gross margin expanded while "
+                   "operating expenses declined; guidance reflects disciplined investment in strategic initiatives "
+                   "and free cash flow").split()
+
+# Synthetic JSON answers, picked by the first schema key a prompt mentions
+SYNTHETIC_JSON = [
+    ('"peers"', {"peers": [
+        {"name": f"Peer Company {i}", "ticker": f"PEER{i}", "market_cap": f"${5 + i}B", "industry": "Retail",
+         "shared_analysts": 3 + i, "shared_investors": 5 + i,
+         "business_model_similarities": "Subscription and direct-to-consumer retail.",
+         "competitive_positioning": "Competes on personalization and assortment."} for i in range(1, 6)]}),
+    ('"performance_data"', {
+        "date": "2025-01-03",
+        "company_events": ["Announced quarterly results", "Launched a new client offering"],
+        "peer_events": ["Peer Company 1 reported earnings"],
+        "industry_events": ["Retail sales data released"],
+        "performance_data": {"company": {"1w": -1.2, "6m": 8.4, "52w": 15.1},
+                             "peer_avg": {"1w": -0.8, "6m": 6.3, "52w": 11.7}}}),
+    ('"news_items"', {"news_items": [
+        {"company": "Peer Company 1 (PEER1)", "industry": "Retail", "headline": f"Synthetic headline {i}",
+         "date": "2025-01-03", "summary": "A synthetic news summary for offline runs.", "source": "Synthetic Wire",
+         "link": "https://example.com/news", "category": "Strategy", "impact": "Moderate"} for i in range(1, 4)]}),
+]
+SYNTHETIC_DEFAULT_JSON = {
+    "Financial Performance": ["What drove the change in gross margin this quarter?"],
+    "Guidance": ["What assumptions underpin the full-year revenue guidance?"],
+}
+
+
+def is_offline():
+    return OPENAI_TRANSPORT in OFFLINE_MODES
+
+
+def _request_body(request):
+    try:
+        return json.loads(request.content or b'{}')
+    except ValueError:
+        return {}
+
+
+def fixture_key(request):
+    """Stable key for a request: method, path and canonical JSON body"""
+    canonical = json.dumps(_request_body(request), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(f"{request.method} {request.url.path} {canonical}".encode('utf-8')).hexdigest()
+
+
+class FixtureStore:
+    """Recorded responses on disk, one JSON file per request key"""
+
+    def __init__(self, fixtures_dir):
+        self.fixtures_dir = fixtures_dir
+
+    def _path(self, key):
+        return os.path.join(self.fixtures_dir, f"{key}.json")
+
+    def load(self, request):
+        try:
+            with open(self._path(fixture_key(request)), 'r', encoding='utf-8') as f:
+                fixture = json.load(f)
+        except FileNotFoundError:
+            return httpx.Response(404, json={"error": {
+                "message": f"No recorded fixture for {request.method} {request.url.path}",
+                "type": "fixture_missing"}})
+        return httpx.Response(fixture['status'], headers={'content-type': fixture['content_type']},
+                              content=fixture['body'].encode('utf-8'))
+
+    def save(self, request, response):
+        key = fixture_key(request)
+        fixture = {
+            'request': {'method': request.method, 'path': request.url.path, 'body': _request_body(request)},
+            'status': response.status_code,
+            'content_type': response.headers.get('content-type', 'application/json'),
+            'body': response.content.decode('utf-8'),
+        }
+        tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(fixture, f, indent=1)
+        os.replace(tmp_path, self._path(key))
+
+    def recorded(self, request, response):
+        # The body is already decoded, so drop encoding and length headers that no longer match it
+        self.save(request, response)
+        return httpx.Response(response.status_code, headers={'content-type': response.headers.get('content-type', '')},
+                              content=response.content, request=request)
+
+
+class RecordTransport(httpx.BaseTransport):
+    """Passes requests to the real transport and saves every response as a fixture.
+
+    Streamed responses are read in full before being returned, so recording
+    trades away incremental streaming.
+    """
+
+    def __init__(self, transport, store):
+        self.transport = transport
+        self.store = store
+
+    def handle_request(self, request):
+        response = self.transport.handle_request(request)
+        response.read()
+        response.close()
+        return self.store.recorded(request, response)
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncRecordTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport, store):
+        self.transport = transport
+        self.store = store
+
+    async def handle_async_request(self, request):
+        response = await self.transport.handle_async_request(request)
+        await response.aread()
+        await response.aclose()
+        return self.store.recorded(request, response)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class ReplayTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Serves recorded fixtures; unknown requests get a 404 so they fail fast instead of retrying"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def handle_request(self, request):
+        return self.store.load(request)
+
+    async def handle_async_request(self, request):
+        return self.store.load(request)
+
+
+class SyntheticTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """OpenAI-compatible chat completions generated locally with configurable latency, throughput and 429s"""
+
+    def __init__(self, latency=OPENAI_SYNTHETIC_LATENCY, tokens_per_second=OPENAI_SYNTHETIC_TOKENS_PER_SECOND,
+                 completion_tokens=OPENAI_SYNTHETIC_COMPLETION_TOKENS, rate_limit_rate=OPENAI_SYNTHETIC_429_RATE,
+                 seed=OPENAI_SYNTHETIC_SEED):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.rate_limit_rate = rate_limit_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _rate_limited(self):
+        with self._lock:
+            return self._random.random() < self.rate_limit_rate
+
+    def _completion_text(self, body):
+        prompt = '\n'.join(message.get('content') or '' for message in body.get('messages', [])
+                           if isinstance(message.get('content'), str))
+        if (body.get('response_format') or {}).get('type') == 'json_object':
+            payload = next((payload for marker, payload in SYNTHETIC_JSON if marker in prompt), SYNTHETIC_DEFAULT_JSON)
+            return json.dumps(payload)
+        # Deterministic per prompt, so repeated benchmark runs see identical text
+        words = random.Random(hashlib.sha256(prompt.encode('utf-8')).digest())
+        length = min(body.get('max_tokens') or self.completion_tokens, self.completion_tokens)
+        return ' '.join(words.choice(SYNTHETIC_WORDS) for _ in range(length))
+
+    def _plan(self, request):
+        """(status, headers, body) for non-streamed replies, or the pieces of a streamed one"""
+        if self._rate_limited():
+            return 429, {'retry-after': '1'}, json.dumps({"error": {
+                "message": "Synthetic rate limit", "type": "requests", "code": "rate_limit_exceeded"}}), None
+        body = _request_body(request)
+        text = self._completion_text(body)
+        words = text.split(' ')
+        usage = {"prompt_tokens": sum(estimate_tokens(message.get('content') or '')
+                                      for message in body.get('messages', [])),
+                 "completion_tokens": len(words)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        base = {"id": f"chatcmpl-synthetic-{fixture_key(request)[:12]}", "created": int(time.time()),
+                "model": body.get('model', 'synthetic')}
+        if not body.get('stream'):
+            return 200, {}, json.dumps(dict(base, object="chat.completion", usage=usage, choices=[
+                {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}])), None
+
+        events = [dict(base, object="chat.completion.chunk", choices=[
+            {"index": 0, "finish_reason": None,
+             "delta": {"role": "assistant", "content": word if i == 0 else ' ' + word}}])
+            for i, word in enumerate(words)]
+        events.append(dict(base, object="chat.completion.chunk",
+                           choices=[{"index": 0, "finish_reason": "stop", "delta": {}}]))
+        if (body.get('stream_options') or {}).get('include_usage'):
+            events.append(dict(base, object="chat.completion.chunk", choices=[], usage=usage))
+        return 200, {'content-type': 'text/event-stream'}, None, events
+
+    def _sse(self, event):
+        return f"data: {json.dumps(event)}\n\n".encode('utf-8')
+
+    def handle_request(self, request):
+        status, headers, content, events = self._plan(request)
+        time.sleep(self.latency)
+        if events is None:
+            if status == 200:
+                time.sleep(len(content.split(' ')) / self.tokens_per_second)
+            return httpx.Response(status, headers=dict(headers, **{'content-type': 'application/json'}),
+                                  content=content.encode('utf-8'))
+
+        def stream():
+            for event in events:
+                yield self._sse(event)
+                time.sleep(1 / self.tokens_per_second)
+            yield b"data: [DONE]\n\n"
+
+        return httpx.Response(status, headers=headers, content=stream())
+
+    async def handle_async_request(self, request):
+        status, headers, content, events = self._plan(request)
+        await asyncio.sleep(self.latency)
+        if events is None:
+            if status == 200:
+                await asyncio.sleep(len(content.split(' ')) / self.tokens_per_second)
+            return httpx.Response(status, headers=dict(headers, **{'content-type': 'application/json'}),
+                                  content=content.encode('utf-8'))
+
+        async def stream():
+            for event in events:
+                yield self._sse(event)
+                await asyncio.sleep(1 / self.tokens_per_second)
+            yield b"data: [DONE]\n\n"
+
+        return httpx.Response(status, headers=headers, content=stream())
+
+
+def _fixture_store():
+    return FixtureStore(OPENAI_FIXTURES_DIR or data_dir('llm_fixtures'))
+
+
+def wrap_transport(transport, mode=None):
+    """Transport for the sync OpenAI client according to OPENAI_TRANSPORT (or mode)"""
+    mode = mode or OPENAI_TRANSPORT
+    if mode == 'record':
+        return RecordTransport(transport, _fixture_store())
+    if mode == 'replay':
+        return ReplayTransport(_fixture_store())
+    if mode == 'synthetic':
+        return SyntheticTransport()
+    return transport
+
+
+def wrap_async_transport(transport, mode=None):
+    mode = mode or OPENAI_TRANSPORT
+    if mode == 'record':
+        return AsyncRecordTransport(transport, _fixture_store())
+    if mode == 'replay':
+        return ReplayTransport(_fixture_store())
+    if mode == 'synthetic':
+        return SyntheticTransport()
+    return transport
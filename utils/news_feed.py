@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Keys (e.g. company and date) kept per feed; the least recently used idle ones go first
+DEFAULT_MAX_ENTRIES = int(os.getenv('IR_FEED_MAX_ENTRIES', 256))
+
+
+class BackgroundFeed:
+    """Process-wide store of generated feeds with at most one refresh in flight per key.
+
+    Reruns read the last result instantly via get(); refresh() does the slow
+    work on a background thread so the script thread never blocks on it.
+    At most ``max_entries`` keys are kept.
+    """
+
+    def __init__(self, max_workers=4, max_entries=DEFAULT_MAX_ENTRIES):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="feed-refresh")
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.max_entries = max_entries
+
+    def _entry(self, key):
+        """Entry for key, created if needed; callers hold the lock"""
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = {'data': None, 'generated_at': None, 'refreshing': False, 'error': None}
+            # A refresh in flight still writes to its entry, so only idle entries are dropped
+            idle = [other for other, existing in self._entries.items() if not existing['refreshing'] and other != key]
+            for other in idle[:max(len(self._entries) - self.max_entries, 0)]:
+                del self._entries[other]
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key):
+        """Snapshot of the entry for key: data, generated_at, refreshing and error"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return dict(entry)
+
+    def put(self, key, data):
+        """Store a result produced elsewhere, e.g. by a batch refresh"""
+        with self._lock:
+            entry = self._entry(key)
+            entry.update(data=data, generated_at=time.time(), error=None)
+
+    def refresh(self, key, fetch):
+        """Run fetch() in the background and store its result; no-op if key is already refreshing"""
+        with self._lock:
+            entry = self._entry(key)
+            if entry['refreshing']:
+                return False
+            entry['refreshing'] = True
+
+        def run():
+            try:
+                data = fetch()
+            except Exception as e:
+                with self._lock:
+                    entry.update(refreshing=False, error=str(e))
+            else:
+                with self._lock:
+                    entry.update(data=data, generated_at=time.time(), refreshing=False, error=None)
+
+        self._executor.submit(run)
+        return True
+
+    def refresh_if_stale(self, key, fetch, max_age):
+        """Kick a background refresh when the stored result is older than max_age seconds"""
+        entry = self.get(key)
+        if entry and entry['generated_at'] is not None and time.time() - entry['generated_at'] > max_age:
+            return self.refresh(key, fetch)
+        return False
+
+
+_company_news_feed = None
+_feed_lock = threading.Lock()
+
+
+def get_company_news_feed():
+    global _company_news_feed
+    with _feed_lock:
+        if _company_news_feed is None:
+            _company_news_feed = BackgroundFeed()
+        return _company_news_feed
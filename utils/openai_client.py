@@ -1,46 +1,460 @@
 from utils.document_processing import estimate_tokens
+from utils.document_store import get_document_store
+from utils.llm_cache import get_llm_cache, request_key
+from utils.llm_metrics import ASYNC_HTTP_EVENT_HOOKS, HTTP_EVENT_HOOKS, LLMCall
+from utils.llm_scheduler import PRIORITY_INTERACTIVE, estimate_request_tokens, get_llm_scheduler
+from utils.single_flight import get_request_flights
+from utils.transcript_parser import fiscal_period, fiscal_period_label
+from utils.transcript_store import get_transcript_store, has_qa_section
+from utils.search_index import BM25Index, excerpt_text, format_context, fuse_rankings, pack_context
+from utils.vector_index import DocumentVectorIndex
 import streamlit as st
+import asyncio
+import importlib.util
 import json
-import openai
-import httpx
-import ssl
 import os
+import threading
+import time
+
+# Retrieval queries used to pick prompt context out of the uploaded documents
+QUESTION_CONTEXT_QUERY = "revenue margin guidance strategic operational million billion growth client customer"
+TEMPLATE_CONTEXT_QUERY = ("net revenue active clients revenue per client adjusted EBITDA gross margin operating expenses "
+                          "free cash flow inventory guidance outlook strategic initiatives quarter year-over-year")
+QUESTION_CONTEXT_TOKENS = 12000
+TEMPLATE_MAIN_CALL_TOKENS = 2500
+TEMPLATE_PRIOR_CALL_TOKENS = 1250
+SECTION_CONTEXT_TOKENS = 1500
+
+# Map-reduce summarization: documents are summarized in large chunks, then summaries are merged until they fit
+SUMMARY_CHUNK_BYTES = 16000
+SUMMARY_CHUNK_TOKENS = 400
+SUMMARY_REDUCE_INPUT_TOKENS = 8000
+
+# Sections of the earnings call script in call order, for section-wise generation. Each section
+# gets only the document excerpts (query) and financial disclosure categories it needs.
+TEMPLATE_SECTIONS = [
+    {'heading': "OPERATOR INTRODUCTION", 'query': None, 'disclosures': (), 'initiatives': False, 'max_tokens': 300},
+    {'heading': "IR INTRODUCTION", 'query': None, 'disclosures': (), 'initiatives': False, 'max_tokens': 700},
+    {'heading': "CEO STRATEGIC OVERVIEW",
+     'query': "strategy transformation strategic initiatives client experience active clients highlights progress quarter",
+     'disclosures': ('financial_highlights',), 'initiatives': True, 'max_tokens': 1000},
+    {'heading': "CFO FINANCIAL REVIEW",
+     'query': ("net revenue year-over-year gross margin basis points operating expenses marketing technology "
+               "cash free cash flow inventory adjusted EBITDA"),
+     'disclosures': ('financial_highlights', 'non_gaap_metrics', 'cfo_metrics'), 'initiatives': False,
+     'max_tokens': 1500},
+    {'heading': "GUIDANCE SECTION",
+     'query': "guidance outlook next quarter full year expect revenue range adjusted EBITDA margin",
+     'disclosures': ('guidance',), 'initiatives': False, 'max_tokens': 800},
+    {'heading': "CEO CLOSING REMARKS",
+     'query': "strategic priorities achievements confident momentum long-term opportunity",
+     'disclosures': (), 'initiatives': True, 'max_tokens': 800},
+    {'heading': "Q&A TRANSITION", 'query': None, 'disclosures': (), 'initiatives': False, 'max_tokens': 200},
+    {'heading': "CLOSING", 'query': None, 'disclosures': (), 'initiatives': False, 'max_tokens': 200},
+]
+FINANCIAL_DISCLOSURE_TITLES = {
+    'financial_highlights': "Financial Highlights",
+    'non_gaap_metrics': "Non-GAAP Metrics",
+    'cfo_metrics': "CFO Metrics",
+    'guidance': "Guidance",
+}
+
+# Connection pool settings for the process-wide OpenAI client
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', 100))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('OPENAI_MAX_KEEPALIVE_CONNECTIONS', 20))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv('OPENAI_KEEPALIVE_EXPIRY', 30.0))
+OPENAI_HTTP2 = os.getenv('OPENAI_HTTP2', '0').lower() in ('1', 'true', 'yes')
+# Upper bound on concurrent requests issued by the async fan-out
+OPENAI_MAX_CONCURRENCY = int(os.getenv('OPENAI_MAX_CONCURRENCY', 8))
+
+# Response cache lifetimes (seconds) per call site; unlisted call sites use the default
+LLM_CACHE_TTLS = {
+    'generate_questions': 24 * 3600,
+    'generate_earnings_template': 24 * 3600,
+    'generate_earnings_section': 24 * 3600,
+    # Chunk summaries are keyed on the chunk text itself, so they stay valid for as long as we keep them
+    'summarize_chunk': 30 * 24 * 3600,
+    'summarize_reduce': 30 * 24 * 3600,
+    'market_updates.peer_set': 7 * 24 * 3600,
+    'market_updates.weekly_summary': 24 * 3600,
+    'market_updates.company_news': 3600,
+    'market_updates.peer_news': 3600,
+    'market_updates.industry_news': 3600,
+}
+DEFAULT_LLM_CACHE_TTL = 3600
+
+_openai_clients = {}
+_async_openai_clients = {}
+_openai_clients_lock = threading.Lock()
+
+_async_loop = None
+_async_semaphore = None
+_async_loop_lock = threading.Lock()
+
+
+# The OpenAI SDK, httpx and the transports are imported on first request, so pages that
+# never call a model don't pay for them at startup
+
+def _http_client_options():
+    import httpx
+    limits = httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+    )
+    # HTTP/2 needs the optional h2 package; fall back to HTTP/1.1 keep-alive without it
+    http2 = OPENAI_HTTP2 and importlib.util.find_spec('h2') is not None
+    return {'verify': False, 'limits': limits, 'http2': http2}
+
+def _build_http_client(transport_mode=None):
+    import httpx
+    from utils.llm_transport import wrap_transport
+    # OPENAI_TRANSPORT swaps the network for recording, fixture replay or a synthetic model
+    return httpx.Client(transport=wrap_transport(httpx.HTTPTransport(**_http_client_options()), transport_mode),
+                        event_hooks=HTTP_EVENT_HOOKS)
+
+def _build_async_http_client(transport_mode=None):
+    import httpx
+    from utils.llm_transport import wrap_async_transport
+    return httpx.AsyncClient(
+        transport=wrap_async_transport(httpx.AsyncHTTPTransport(**_http_client_options()), transport_mode),
+        event_hooks=ASYNC_HTTP_EVENT_HOOKS)
+
+def _api_key(api_key):
+    from utils.llm_transport import is_offline
+    # Offline transports never send the key anywhere, but the SDK insists on one
+    return api_key or os.getenv('OPENAI_KEY') or ('offline' if is_offline() else None)
+
+def get_openai_client(api_key=None, base_url=None):
+    """Process-wide OpenAI client, one per (api_key, base_url), shared by every session"""
+    import openai
+    api_key = _api_key(api_key)
+    registry_key = (api_key, base_url)
+    with _openai_clients_lock:
+        openai_client = _openai_clients.get(registry_key)
+        if openai_client is None:
+            # Retries belong to the scheduler, so the SDK's own are turned off
+            openai_client = openai.OpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=_build_http_client(),
+                max_retries=0
+            )
+            _openai_clients[registry_key] = openai_client
+        return openai_client
+
+def get_async_openai_client(api_key=None, base_url=None):
+    """Process-wide AsyncOpenAI client; only ever used on the shared background event loop"""
+    import openai
+    api_key = _api_key(api_key)
+    registry_key = (api_key, base_url)
+    with _openai_clients_lock:
+        openai_client = _async_openai_clients.get(registry_key)
+        if openai_client is None:
+            openai_client = openai.AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=_build_async_http_client(),
+                max_retries=0
+            )
+            _async_openai_clients[registry_key] = openai_client
+        return openai_client
+
+def _get_async_loop():
+    """Event loop on a daemon thread that runs every async LLM request in the process"""
+    global _async_loop, _async_semaphore
+    with _async_loop_lock:
+        if _async_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="openai-async", daemon=True).start()
+            _async_semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+            _async_loop = loop
+        return _async_loop
+
+def submit_async(coroutine):
+    """Schedule a coroutine on the background loop and return a concurrent.futures.Future"""
+    return asyncio.run_coroutine_threadsafe(coroutine, _get_async_loop())
 
 def init_open_ai_client():
-    api_key = os.getenv('OPENAI_KEY')
-    ssl._create_default_https_context = ssl._create_unverified_context
-    http_client = httpx.Client(verify=False)
-    openai_client = openai.OpenAI(
-        api_key=api_key,
-        http_client=http_client
+    # Sessions borrow the shared client so keep-alive connections are reused across users
+    return get_openai_client()
+
+
+def chat_completion(call_site, bypass_cache=False, ttl=None, priority=PRIORITY_INTERACTIVE, **params):
+    """Create a chat completion through the shared response cache and the request scheduler.
+
+    call_site names the caller for per-site TTLs. bypass_cache skips the
+    lookup (e.g. for "regenerate") but still stores the fresh response.
+    priority is a llm_scheduler PRIORITY_* class.
+    """
+    with LLMCall(call_site, params) as call:
+        key = request_key(params)
+        cached = None if bypass_cache else _cached_completion(key)
+        if cached is not None:
+            call.cache = 'hit'
+            return cached
+
+        def fetch():
+            call.cache = 'miss'
+            response = get_llm_scheduler().call(get_openai_client().chat.completions.create, params, priority)
+            call.set_usage(response.usage)
+            _cache_completion(call_site, key, response, ttl)
+            return response
+
+        # Identical requests already in flight from any session share one upstream call, errors included
+        response = get_request_flights().do(key, fetch)
+        call.cache = call.cache or 'coalesced'
+        return response
+
+
+async def async_chat_completion(call_site, bypass_cache=False, ttl=None, priority=PRIORITY_INTERACTIVE, **params):
+    """chat_completion for the background loop, bounded by OPENAI_MAX_CONCURRENCY in-flight requests"""
+    with LLMCall(call_site, params) as call:
+        key = request_key(params)
+        cached = None if bypass_cache else _cached_completion(key)
+        if cached is not None:
+            call.cache = 'hit'
+            return cached
+
+        async def fetch():
+            call.cache = 'miss'
+            async with _async_semaphore:
+                response = await get_llm_scheduler().call_async(get_async_openai_client().chat.completions.create,
+                                                                 params, priority)
+            call.set_usage(response.usage)
+            _cache_completion(call_site, key, response, ttl)
+            return response
+
+        response = await get_request_flights().do_async(key, fetch)
+        call.cache = call.cache or 'coalesced'
+        return response
+
+
+class CompletionStream:
+    """Iterator over the text deltas of a streamed chat completion.
+
+    The full response is written to the shared cache once the stream ends,
+    and a cached response is replayed as a single delta. If an identical
+    request is already in flight, this waits for it and replays its result
+    the same way. ttft and elapsed (seconds) are filled in as the stream
+    progresses.
+    """
+
+    def __init__(self, call_site, bypass_cache=False, ttl=None, priority=PRIORITY_INTERACTIVE, **params):
+        self.call_site = call_site
+        self.bypass_cache = bypass_cache
+        self.ttl = ttl
+        self.priority = priority
+        self.params = params
+        self.text = ""
+        self.cached = False
+        self.ttft = None
+        self.elapsed = None
+
+    def __iter__(self):
+        started = time.perf_counter()
+        call = LLMCall(self.call_site, self.params, stream=True)
+        key = request_key(self.params)
+        cached = None if self.bypass_cache else _cached_completion(key)
+        if cached is not None:
+            self.cached = True
+            self.text = cached.choices[0].message.content or ""
+            self.ttft = self.elapsed = call.ttft = time.perf_counter() - started
+            call.cache = 'hit'
+            call.finish()
+            yield self.text
+            return
+
+        flights = get_request_flights()
+        flight, leader = flights.claim(key)
+        if not leader:
+            call.cache = 'coalesced'
+            try:
+                self.text = flight.result().choices[0].message.content or ""
+            except BaseException as e:
+                call.finish(error=e)
+                raise
+            self.ttft = self.elapsed = call.ttft = time.perf_counter() - started
+            call.finish()
+            yield self.text
+            return
+
+        call.cache = 'miss'
+        try:
+            with call:
+                stream = self._open()
+            for delta in self._consume(stream, started):
+                if call.ttft is None:
+                    call.ttft = self.ttft
+                yield delta
+        except GeneratorExit:
+            error = RuntimeError("Streamed request was abandoned before it completed")
+            call.finish(error=error)
+            flights.finish(key, flight, error=error)
+            raise
+        except BaseException as e:
+            call.finish(error=e)
+            flights.finish(key, flight, error=e)
+            raise
+        else:
+            call.set_usage(self._response.usage)
+            call.finish()
+            # Cache before closing the flight so no later caller slips between the two
+            _cache_completion(self.call_site, key, self._response, self.ttl)
+            flights.finish(key, flight, result=self._response)
+
+    def _open(self):
+        # Only opening the stream is retried; once tokens flow, a failure surfaces to the caller
+        return get_llm_scheduler().call(get_openai_client().chat.completions.create,
+                                        dict(self.params, stream=True, stream_options={"include_usage": True}),
+                                        self.priority)
+
+    def _consume(self, stream, started):
+        pieces = []
+        finish_reason = None
+        last_chunk = None
+        usage = None
+        for chunk in stream:
+            last_chunk = chunk
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if self.ttft is None:
+                    self.ttft = time.perf_counter() - started
+                pieces.append(delta)
+                yield delta
+        self.text = ''.join(pieces)
+        self.elapsed = time.perf_counter() - started
+        get_llm_scheduler().settle(estimate_request_tokens(self.params), usage)
+
+        # Kept in the non-streamed shape so chat_completion and waiting streams can use it directly
+        from openai.types.chat import ChatCompletion
+        self._response = ChatCompletion.model_validate({
+            'id': last_chunk.id if last_chunk is not None else '',
+            'created': last_chunk.created if last_chunk is not None else int(time.time()),
+            'model': last_chunk.model if last_chunk is not None else self.params.get('model', ''),
+            'object': 'chat.completion',
+            'choices': [{'index': 0, 'finish_reason': finish_reason or 'stop',
+                         'message': {'role': 'assistant', 'content': self.text}}],
+            'usage': usage.model_dump() if usage is not None else None,
+        })
+
+
+def _cached_completion(key):
+    cached = get_llm_cache().get(key)
+    if cached is None:
+        return None
+    from openai.types.chat import ChatCompletion
+    return ChatCompletion.model_validate_json(cached)
+
+def _cache_completion(call_site, key, response, ttl):
+    get_llm_cache().put(key, response.model_dump_json(),
+                        ttl if ttl is not None else LLM_CACHE_TTLS.get(call_site, DEFAULT_LLM_CACHE_TTL),
+                        call_site=call_site)
+
+
+def get_session_search_index(uploaded_documents):
+    """Session's BM25 index, incrementally synced with the given documents"""
+    if 'search_index' not in st.session_state:
+        st.session_state.search_index = BM25Index()
+    st.session_state.search_index.sync(uploaded_documents)
+    return st.session_state.search_index
+
+def get_session_vector_index(uploaded_documents):
+    """Session's semantic index, incrementally synced with the given documents"""
+    if 'vector_index' not in st.session_state:
+        st.session_state.vector_index = DocumentVectorIndex()
+    st.session_state.vector_index.sync(uploaded_documents)
+    return st.session_state.vector_index
+
+def retrieve_context(uploaded_documents, query, token_budget, doc_keys=None, k=50):
+    """Keyword (BM25) and semantic hits fused by reciprocal rank, packed into token_budget"""
+    keyword_hits = get_session_search_index(uploaded_documents).search(query, k=k, doc_keys=doc_keys)
+    semantic_hits = [(chunk, score) for chunk, score in
+                     get_session_vector_index(uploaded_documents).search(query, k=k, doc_keys=doc_keys) if score > 0]
+    return pack_context(fuse_rankings([keyword_hits, semantic_hits]), token_budget)
+
+
+def _summary_request(instruction, text, max_tokens):
+    return dict(
+        model="gpt-4-turbo-preview",
+        messages=[
+            {"role": "system", "content": "You are a financial analyst summarizing earnings calls and filings."},
+            {"role": "user", "content": f"{instruction} Keep every figure, guidance statement, strategic initiative "
+                                        f"and analyst concern; drop boilerplate. Use at most {max_tokens * 3 // 4} "
+                                        f"words.\n\n{text}"}
+        ],
+        temperature=0,
+        max_tokens=max_tokens
     )
-    return openai_client
 
-def generate_questions(uploaded_documents):
-    openai_client = st.session_state.get('openai_client')
+async def _summarize(call_site, instruction, text, max_tokens):
+    response = await async_chat_completion(call_site, **_summary_request(instruction, text, max_tokens))
+    return response.choices[0].message.content.strip()
+
+async def map_reduce_summary(chunks, token_budget):
+    """Summarize chunks in parallel, then merge groups of summaries until they fit in token_budget"""
+    summaries = await asyncio.gather(*[
+        _summarize("summarize_chunk", "Summarize this excerpt.", chunk, SUMMARY_CHUNK_TOKENS) for chunk in chunks])
+
+    while estimate_tokens('\n\n'.join(summaries)) > token_budget:
+        if len(summaries) == 1:
+            return await _summarize("summarize_reduce", "Condense this summary.", summaries[0], token_budget)
+        groups = [[]]
+        for summary in summaries:
+            if len(groups[-1]) > 1 and estimate_tokens('\n\n'.join(groups[-1] + [summary])) > SUMMARY_REDUCE_INPUT_TOKENS:
+                groups.append([])
+            groups[-1].append(summary)
+        target = max(token_budget // len(groups), 100)
+        summaries = await asyncio.gather(*[
+            _summarize("summarize_reduce", "Combine these consecutive partial summaries into one.",
+                       '\n\n'.join(group), target) for group in groups])
+    return '\n\n'.join(summaries)
+
+def summarize_documents(documents, token_budget):
+    """{doc_key: summary} of whole documents via map-reduce, sharing token_budget evenly.
+
+    Every chunk is read here and summarized concurrently on the background loop;
+    per-chunk summaries come from the response cache when the text was seen before.
+    """
+    if not documents:
+        return {}
+    store = get_document_store()
+    per_document = token_budget // len(documents)
+    futures = {}
+    for doc_key, doc in documents.items():
+        chunks = [store.read_range(doc['digest'], start, end)
+                  for start, end in store.iter_chunk_spans(doc['digest'], max_bytes=SUMMARY_CHUNK_BYTES)]
+        chunks = [chunk for chunk in chunks if chunk.strip()]
+        if chunks:
+            futures[doc_key] = submit_async(map_reduce_summary(chunks, per_document))
+    return {doc_key: future.result() for doc_key, future in futures.items()}
+
+
+def generate_questions(uploaded_documents, bypass_cache=False, summarize=False):
     try:
-        summarized_content = ""
-        for doc in uploaded_documents.values():
-            doc_content = doc['content']
-            if 'earnings' in doc['name'].lower():
-                sections = doc_content.split('\n\n')
-                relevant_sections = []
-                for section in sections:
-                    if any(keyword in section.lower() for keyword in
-                           ['revenue', 'margin', 'guidance', 'strategic', 'operational',
-                            'million', 'billion', 'growth', 'client', 'customer']):
-                        relevant_sections.append(section)
-
-                doc_summary = '\n'.join(relevant_sections[:10])
-                summarized_content += f"\nFrom {doc['name']}:\n{doc_summary}\n"
-
-        if estimate_tokens(summarized_content) > 12000:
-            summarized_content = summarized_content[:48000]
+        if summarize:
+            # Half the budget summarizes every upload in full, half keeps the best verbatim excerpts
+            summaries = summarize_documents(uploaded_documents, QUESTION_CONTEXT_TOKENS // 2)
+            summarized_content = ''.join(f"\nSummary of {uploaded_documents[doc_key]['name']}:\n{summary}\n"
+                                         for doc_key, summary in summaries.items())
+            summarized_content += format_context(
+                retrieve_context(uploaded_documents, QUESTION_CONTEXT_QUERY, token_budget=QUESTION_CONTEXT_TOKENS // 2))
+        else:
+            # Highest-scoring chunks across all uploads, packed up to the token budget
+            summarized_content = format_context(
+                retrieve_context(uploaded_documents, QUESTION_CONTEXT_QUERY, token_budget=QUESTION_CONTEXT_TOKENS))
 
         prompt = f"""Based on these earnings call excerpts, generate a comprehensive set of questions.
         Format the response as a JSON object with categories as keys and lists of specific questions as values."""
 
-        response = openai_client.chat.completions.create(
+        response = chat_completion(
+            "generate_questions",
+            bypass_cache=bypass_cache,
             model="gpt-4-turbo-preview",
             messages=[
                 {"role": "system", "content": "You are an expert financial analyst who understands earnings calls."},
@@ -56,158 +470,82 @@ def generate_questions(uploaded_documents):
         return {}
 
 
-def analyze_analyst_questions(uploaded_documents):
+def analyze_document_questions(doc, management_speakers=None):
+    """Analyst questions of one uploaded document; repeat calls for the same content are served from the store"""
+    transcripts = get_transcript_store()
+    table = transcripts.table(doc['digest'], management_speakers)
+    return {
+        'fiscal_period': fiscal_period_label(doc['name'], table),
+        'questions': transcripts.questions(doc['digest'], management_speakers),
+    }
+
+
+def update_document_analyses(analyses, uploaded_documents, management_speakers=None):
+    """Bring per-document results in line with the uploads: analyze only new documents, drop removed ones"""
+    for doc_key in list(analyses):
+        if doc_key not in uploaded_documents:
+            del analyses[doc_key]
+    for doc_key, doc in uploaded_documents.items():
+        if doc_key not in analyses:
+            analyses[doc_key] = analyze_document_questions(doc, management_speakers)
+    return analyses
+
+
+def merge_analyst_questions(analyses, uploaded_documents):
+    """Per-document results combined into {analyst: {'firm', 'questions'}}"""
+    analyst_questions = {}
+    for doc_key, analysis in analyses.items():
+        doc = uploaded_documents[doc_key]
+        for analyst, firm, question in analysis['questions']:
+            if analyst not in analyst_questions:
+                analyst_questions[analyst] = {'firm': firm, 'questions': []}
+            analyst_questions[analyst]['questions'].append({
+                'question': question,
+                'call_date': doc['upload_time'],
+                'source_doc': doc['name'],
+                'fiscal_period': analysis['fiscal_period'],
+            })
+    return analyst_questions
+
+
+def analyze_analyst_questions(uploaded_documents, management_speakers=None, analyses=None):
+    """Analyst questions across all uploads. Pass the previous per-document results as analyses
+    to update them in place, so only added documents are analyzed."""
     try:
-        analyst_questions = {}
-
-        for doc in uploaded_documents.values():
-            content = doc['content']
-            lines = content.split('\n')
-
-            # Extract fiscal quarter and year info
-            fiscal_period = {
-                'quarter': None,
-                'year': None
-            }
-
-            # Try to extract from filename first
-            filename = doc['name'].lower()
-            if 'q1' in filename or 'q2' in filename or 'q3' in filename or 'q4' in filename:
-                for q in ['q1', 'q2', 'q3', 'q4']:
-                    if q in filename:
-                        fiscal_period['quarter'] = q.upper()
-                        break
-
-            # Try to extract year from filename
-            import re
-            year_match = re.search(r'20\d{2}', filename)
-            if year_match:
-                fiscal_period['year'] = year_match.group(0)
-
-            # If not found in filename, try content
-            if not fiscal_period['quarter'] or not fiscal_period['year']:
-                for line in lines[:20]:  # Check first 20 lines
-                    if 'fiscal year' in line.lower() or 'fiscal 20' in line.lower():
-                        year_match = re.search(r'20\d{2}', line)
-                        if year_match:
-                            fiscal_period['year'] = year_match.group(0)
-
-                    quarter_map = {
-                        'first quarter': 'Q1',
-                        'second quarter': 'Q2',
-                        'third quarter': 'Q3',
-                        'fourth quarter': 'Q4'
-                    }
-                    for quarter_text, quarter_val in quarter_map.items():
-                        if quarter_text in line.lower():
-                            fiscal_period['quarter'] = quarter_val
-                            break
-
-            fiscal_period_str = f"{fiscal_period['quarter']} FY{fiscal_period['year']}" if fiscal_period['quarter'] and \
-                                                                                           fiscal_period[
-                                                                                               'year'] else "Quarter Unknown"
-
-            # Find analysts listed at the top of the document
-            analyst_mapping = {}
-            for line in lines[:20]:
-                if 'analyst' in line.lower():
-                    parts = line.split()
-                    if len(parts) >= 2:
-                        name = ' '.join(parts[:-1])
-                        analyst_mapping[name.lower()] = {'name': name, 'firm': ''}
-
-            # Process Q&A section
-            current_analyst = None
-            collecting_question = False
-            current_question = []
-
-            for i, line in enumerate(lines):
-                if not line.strip():
-                    continue
-
-                if any(a.lower() in line.lower() for a in analyst_mapping.keys()):
-                    for analyst in analyst_mapping.keys():
-                        if analyst.lower() in line.lower():
-                            current_analyst = analyst_mapping[analyst]['name']
-                            collecting_question = True
-                            current_question = []
-                            break
-
-                elif collecting_question:
-                    if line.startswith('Matt Baer') or line.startswith('David Aufderhaar') or line.startswith(
-                            'Operator'):
-                        if current_analyst and current_question:
-                            question_text = ' '.join(current_question).strip()
-                            if current_analyst not in analyst_questions:
-                                analyst_questions[current_analyst] = {
-                                    'firm': analyst_mapping.get(current_analyst.lower(), {}).get('firm', ''),
-                                    'questions': []
-                                }
-                            analyst_questions[current_analyst]['questions'].append({
-                                'question': question_text,
-                                'call_date': doc['upload_time'],
-                                'source_doc': doc['name'],
-                                'fiscal_period': fiscal_period_str,
-                            })
-                        collecting_question = False
-                        current_question = []
-                    else:
-                        current_question.append(line.strip())
-
-        return analyst_questions
+        analyses = update_document_analyses({} if analyses is None else analyses, uploaded_documents,
+                                            management_speakers)
+        return merge_analyst_questions(analyses, uploaded_documents)
 
     except Exception as e:
         st.error(f"Error analyzing analyst questions: {str(e)}")
         return {}
 
 
-def generate_earnings_template(uploaded_documents, company_name, quarter, fiscal_year, context_info=""):
-    openai_client = st.session_state.openai_client
-    quarter_options = st.session_state.quarter_options
-    try:
-        recent_calls = []
-        other_docs = []
-        for doc in uploaded_documents.values():
-            if 'earnings' in doc['name'].lower():
-                recent_calls.append(doc)
-            else:
-                other_docs.append(doc)
-        recent_calls.sort(key=lambda x: x['upload_time'], reverse=True)
-
-        document_excerpts = []
-        if recent_calls:
-            main_doc = recent_calls[0]
-            document_excerpts.append(
-                f"\nMost Recent Earnings Call: {main_doc['name']}\nContent: {main_doc['content'][:10000]}")
-
-            for doc in recent_calls[1:2]:
-                document_excerpts.append(f"\nPrior Earnings Call: {doc['name']}\nKey Excerpts: {doc['content'][:5000]}")
-
-        # Simple system prompt without f-string
-        system_prompt = f"""You are a financial analyst expert creating a detailed earnings call template.
-{context_info}
-
-Please incorporate the provided context into the template, particularly:
-- Adjust the overall tone to match the specified tone
-- Emphasize the strategic initiatives in the CEO sections
-- Include the additional considerations throughout the script where relevant
-"""
-
-        # Create the detailed prompt
-        detailed_prompt = (
-            f"Create an extremely detailed, production-ready earnings call template for {company_name}'s "
-            f"{quarter_options[quarter]} Fiscal Year {fiscal_year}. The template must match this exact "
-            "level of detail and structure:\n\n"
-
-            "OPERATOR INTRODUCTION:\n"
-            f"Good afternoon and thank you for standing by. Welcome to {company_name}'s {quarter_options[quarter]} "
+def recent_earnings_calls(uploaded_documents):
+    """(doc_key, doc) pairs for uploaded earnings call transcripts, latest fiscal period first"""
+    transcripts = get_transcript_store()
+    recent_calls = []
+    for doc_key, doc in uploaded_documents.items():
+        table = transcripts.table(doc['digest'])
+        if doc.get('category') == 'past_earnings' or has_qa_section(table):
+            quarter, year = fiscal_period(doc['name'], table)
+            recent_calls.append(((year or '', quarter or '', doc['upload_time']), doc_key, doc))
+    recent_calls.sort(key=lambda x: x[0], reverse=True)
+    return [(doc_key, doc) for _, doc_key, doc in recent_calls]
+
+
+def earnings_template_outline(company_name, quarter_label, quarter, fiscal_year):
+    """Model script the template must follow, as (heading, text) pairs in call order"""
+    return [
+        ("OPERATOR INTRODUCTION", (
+            f"Good afternoon and thank you for standing by. Welcome to {company_name}'s {quarter_label} "
             f"Fiscal Year {fiscal_year} Earnings Conference Call. Today's conference is being recorded. "
             "[Operator Instructions for Q&A format]. I would now like to turn the conference over to "
             "[IR Name], Head of Investor Relations. Please go ahead.\n\n"
-
-            "IR INTRODUCTION:\n"
+        )),
+        ("IR INTRODUCTION", (
             "Thank you, Operator, and good afternoon everyone. Thank you for joining us today for "
-            f"{company_name}'s {quarter_options[quarter]} Fiscal Year {fiscal_year} earnings call. "
+            f"{company_name}'s {quarter_label} Fiscal Year {fiscal_year} earnings call. "
             "With me today are [CEO Name], Chief Executive Officer, and [CFO Name], Chief Financial Officer.\n\n"
 
             f"We have posted complete {quarter} fiscal {fiscal_year} financial results in our earnings "
@@ -229,8 +567,8 @@ Please incorporate the provided context into the template, particularly:
             "our GAAP results.\n\n"
 
             "With that, I'll turn the call over to [CEO Name].\n\n"
-
-            "CEO STRATEGIC OVERVIEW:\n"
+        )),
+        ("CEO STRATEGIC OVERVIEW", (
             "Thanks [IR Name]. Good afternoon everyone.\n\n"
 
             f"In {quarter} {fiscal_year}, we continued to execute on our transformation strategy and make "
@@ -249,8 +587,8 @@ Please incorporate the provided context into the template, particularly:
             "[Key Strategic Initiative #3 with metrics]\n\n"
 
             "Now I'll turn it over to [CFO Name] to review our financial results and outlook in detail.\n\n"
-
-            "CFO FINANCIAL REVIEW:\n"
+        )),
+        ("CFO FINANCIAL REVIEW", (
             f"Thanks [CEO Name]. I'll now walk through our {quarter} financial results and provide guidance "
             "for [next quarter] and the full year.\n\n"
 
@@ -295,8 +633,8 @@ Please incorporate the provided context into the template, particularly:
             "  * Days inventory outstanding: XX days\n"
             "  * Days payable outstanding: XX days\n"
             "  * Days sales outstanding: XX days\n\n"
-
-            "GUIDANCE SECTION:\n"
+        )),
+        ("GUIDANCE SECTION", (
             "For [Next Quarter]:\n"
             "- Revenue in the range of $XXX million to $XXX million, representing:\n"
             "  * Year-over-year [growth/decline] of XX% to XX%\n"
@@ -312,8 +650,8 @@ Please incorporate the provided context into the template, particularly:
             "- Adjusted EBITDA guidance of $XXX million to $XXX million:\n"
             "  * Implying margins of XX% to XX%\n"
             "  * [Comparison to prior guidance]\n\n"
-
-            "CEO CLOSING REMARKS:\n"
+        )),
+        ("CEO CLOSING REMARKS", (
             "Thank you [CFO Name]. Before we open for questions, I want to emphasize several key points:\n\n"
 
             "First, [Key Achievement 1]:\n"
@@ -335,32 +673,201 @@ Please incorporate the provided context into the template, particularly:
             "[company's main strategic objective].\n\n"
 
             "With that, we'll open the line for questions. Operator, please go ahead.\n\n"
-
-            "Q&A TRANSITION:\n"
+        )),
+        ("Q&A TRANSITION", (
             "We will now begin the question-and-answer session. [Operator instructions for asking questions]. "
             "Our first question comes from [Analyst Name] with [Firm Name].\n\n"
-
-            "CLOSING:\n"
+        )),
+        ("CLOSING", (
             f"Thank you everyone for your questions and ongoing interest in {company_name}. We look forward "
             "to updating you on our continued progress next quarter."
-        )
+        )),
+    ]
+
+
+def earnings_template_request(uploaded_documents, company_name, quarter, fiscal_year, context_info="", summarize=False):
+    """Chat-completion parameters for the earnings call template, with retrieved document excerpts"""
+    quarter_options = st.session_state.quarter_options
+    recent_calls = recent_earnings_calls(uploaded_documents)
+
+    document_excerpts = []
+    if recent_calls and summarize:
+        # Full-length calls are summarized into half the budget; the other half stays verbatim
+        summaries = summarize_documents(dict(recent_calls[:1]), TEMPLATE_MAIN_CALL_TOKENS // 2)
+        summaries.update(summarize_documents(dict(recent_calls[1:2]), TEMPLATE_PRIOR_CALL_TOKENS // 2))
+        main_key, main_doc = recent_calls[0]
+        main_chunks = retrieve_context(uploaded_documents, TEMPLATE_CONTEXT_QUERY,
+                                       token_budget=TEMPLATE_MAIN_CALL_TOKENS // 2, doc_keys={main_key})
+        document_excerpts.append(
+            f"\nMost Recent Earnings Call: {main_doc['name']}\nSummary: {summaries.get(main_key, '')}"
+            f"\nKey Excerpts: {excerpt_text(main_chunks)}")
+
+        for doc_key, doc in recent_calls[1:2]:
+            prior_chunks = retrieve_context(uploaded_documents, TEMPLATE_CONTEXT_QUERY,
+                                            token_budget=TEMPLATE_PRIOR_CALL_TOKENS // 2, doc_keys={doc_key})
+            document_excerpts.append(f"\nPrior Earnings Call: {doc['name']}\nSummary: {summaries.get(doc_key, '')}"
+                                     f"\nKey Excerpts: {excerpt_text(prior_chunks)}")
+    elif recent_calls:
+        main_key, main_doc = recent_calls[0]
+        main_chunks = retrieve_context(uploaded_documents, TEMPLATE_CONTEXT_QUERY,
+                                       token_budget=TEMPLATE_MAIN_CALL_TOKENS, doc_keys={main_key})
+        document_excerpts.append(
+            f"\nMost Recent Earnings Call: {main_doc['name']}\nContent: {excerpt_text(main_chunks)}")
+
+        for doc_key, doc in recent_calls[1:2]:
+            prior_chunks = retrieve_context(uploaded_documents, TEMPLATE_CONTEXT_QUERY,
+                                            token_budget=TEMPLATE_PRIOR_CALL_TOKENS, doc_keys={doc_key})
+            document_excerpts.append(f"\nPrior Earnings Call: {doc['name']}\nKey Excerpts: {excerpt_text(prior_chunks)}")
+
+    # Simple system prompt without f-string
+    system_prompt = f"""You are a financial analyst expert creating a detailed earnings call template.
+{context_info}
+
+Please incorporate the provided context into the template, particularly:
+- Adjust the overall tone to match the specified tone
+- Emphasize the strategic initiatives in the CEO sections
+- Include the additional considerations throughout the script where relevant
+"""
+
+    # Create the detailed prompt
+    detailed_prompt = (
+        f"Create an extremely detailed, production-ready earnings call template for {company_name}'s "
+        f"{quarter_options[quarter]} Fiscal Year {fiscal_year}. The template must match this exact "
+        "level of detail and structure:\n\n"
+    ) + ''.join(f"{heading}:\n{text}" for heading, text in
+              earnings_template_outline(company_name, quarter_options[quarter], quarter, fiscal_year))
+
+    return dict(
+        model="gpt-4-turbo-preview",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": detailed_prompt + "\n\nReference Documents:" + "\n".join(document_excerpts)}
+        ],
+        temperature=0.7,
+        max_tokens=4000
+    )
 
-        response = openai_client.chat.completions.create(
-            model="gpt-4-turbo-preview",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": detailed_prompt + "\n\nReference Documents:" + "\n".join(document_excerpts)}
-            ],
-            temperature=0.7,
-            max_tokens=4000
-        )
 
-        generated_template = response.choices[0].message.content
+def clean_template(generated_template):
+    # Clean up any potential formatting issues
+    return generated_template.replace('```', '').strip()
 
-        # Clean up any potential formatting issues
-        generated_template = generated_template.replace('```', '').strip()
 
-        return generated_template
+def generate_earnings_template(uploaded_documents, company_name, quarter, fiscal_year, context_info="", bypass_cache=False,
+                               summarize=False):
+    try:
+        response = chat_completion(
+            "generate_earnings_template",
+            bypass_cache=bypass_cache,
+            **earnings_template_request(uploaded_documents, company_name, quarter, fiscal_year, context_info, summarize)
+        )
+
+        return clean_template(response.choices[0].message.content)
     except Exception as e:
         st.error(f"Error generating template: {str(e)}")
-        return "Error generating template. Please try again."
\ No newline at end of file
+        return "Error generating template. Please try again."
+
+
+def stream_earnings_template(uploaded_documents, company_name, quarter, fiscal_year, context_info="", bypass_cache=False,
+                             summarize=False):
+    """Streaming variant of generate_earnings_template; iterate the result for text deltas"""
+    return CompletionStream(
+        "generate_earnings_template",
+        bypass_cache=bypass_cache,
+        **earnings_template_request(uploaded_documents, company_name, quarter, fiscal_year, context_info, summarize)
+    )
+
+
+def format_disclosures(financial_disclosures, categories):
+    """Financial disclosure entries of the given categories as prompt text"""
+    text = ""
+    for category in categories:
+        metrics = (financial_disclosures or {}).get(category)
+        if metrics:
+            text += f"\n{FINANCIAL_DISCLOSURE_TITLES[category]}:\n"
+            for metric in metrics:
+                text += f"- {metric['name']}: {metric['value']} ({metric['context']})\n"
+    return text
+
+
+def earnings_section_request(section, uploaded_documents, company_name, quarter, fiscal_year,
+                             script_context=None, disclosure_metrics=None, financial_disclosures=None,
+                             summaries=None):
+    """Chat-completion parameters for one TEMPLATE_SECTIONS entry, with only the context it needs.
+
+    summaries ({doc_key: summary} of the recent calls) take half of the document budget when given.
+    """
+    quarter_label = st.session_state.quarter_options[quarter]
+    script_context = script_context or {}
+    outline = dict(earnings_template_outline(company_name, quarter_label, quarter, fiscal_year))
+
+    context_info = f"Tone: {script_context.get('tone', '')}\n"
+    if section['initiatives']:
+        context_info += f"Strategic Initiatives: {script_context.get('initiatives', '')}\n"
+    context_info += f"Additional Considerations: {script_context.get('considerations', '')}\n"
+    if section['disclosures']:
+        if disclosure_metrics:
+            context_info += "\nDisclosure Metrics:\n"
+            for metric in disclosure_metrics:
+                context_info += f"- {metric['name']}: {metric['value']} ({metric['context']})\n"
+        context_info += format_disclosures(financial_disclosures, section['disclosures'])
+
+    document_excerpts = ""
+    recent_calls = recent_earnings_calls(uploaded_documents)[:2]
+    if section['query'] and recent_calls:
+        chunks = retrieve_context(uploaded_documents, section['query'],
+                                  token_budget=SECTION_CONTEXT_TOKENS // 2 if summaries else SECTION_CONTEXT_TOKENS,
+                                  doc_keys={doc_key for doc_key, _ in recent_calls})
+        document_excerpts = "\n\nReference Documents:" + ''.join(
+            f"\nSummary of {doc['name']}:\n{summaries[doc_key]}\n"
+            for doc_key, doc in recent_calls if doc_key in (summaries or {})) + format_context(chunks)
+
+    system_prompt = f"""You are a financial analyst expert writing one section of a detailed earnings call script.
+{context_info}
+Match the specified tone and incorporate the provided context where relevant.
+"""
+
+    prompt = (
+        f"Write the {section['heading']} section of {company_name}'s {quarter_label} Fiscal Year {fiscal_year} "
+        "earnings call script. It must match this exact level of detail and structure:\n\n"
+        f"{outline[section['heading']]}\n"
+        "Return only the text of this section, without the section heading."
+    )
+
+    return dict(
+        model="gpt-4-turbo-preview",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt + document_excerpts}
+        ],
+        temperature=0.7,
+        max_tokens=section['max_tokens']
+    )
+
+
+def generate_script_sections(uploaded_documents, company_name, quarter, fiscal_year, script_context=None,
+                             disclosure_metrics=None, financial_disclosures=None, headings=None, bypass_cache=False,
+                             summarize=False):
+    """Submit one concurrent request per script section; returns {heading: Future of ChatCompletion} in call order.
+
+    Context retrieval (and, with summarize, one summary of each recent call shared by every section)
+    runs here on the calling thread; only the section calls are fanned out.
+    """
+    sections = [section for section in TEMPLATE_SECTIONS if headings is None or section['heading'] in headings]
+    summaries = None
+    if summarize and any(section['query'] for section in sections):
+        summaries = summarize_documents(dict(recent_earnings_calls(uploaded_documents)[:2]),
+                                        SECTION_CONTEXT_TOKENS // 2)
+    futures = {}
+    for section in sections:
+        params = earnings_section_request(section, uploaded_documents, company_name, quarter, fiscal_year,
+                                          script_context, disclosure_metrics, financial_disclosures, summaries)
+        futures[section['heading']] = submit_async(
+            async_chat_completion("generate_earnings_section", bypass_cache=bypass_cache, **params))
+    return futures
+
+
+def assemble_script(sections):
+    """Join generated {heading: text} sections into one script in call order"""
+    return '\n\n'.join(f"{section['heading']}:\n{sections[section['heading']]}"
+                         for section in TEMPLATE_SECTIONS if section['heading'] in sections)
@@ -0,0 +1,312 @@
+import hashlib
+import re
+import zlib
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from utils.search_index import tokenize
+
+TOPIC_COUNT = 8
+TOPIC_DIM = 2048
+MINI_BATCH_SIZE = 256
+# Passes over the questions the first time the model is fitted; later additions get one pass
+INITIAL_EPOCHS = 5
+TOPIC_LABEL_TERMS = 3
+# Weight of a question one reporting period older than the newest, relative to the newest
+RECENCY_DECAY = 0.6
+# Pseudo-questions drawn from the overall topic mix, so sparse histories fall back to it
+PRIOR_STRENGTH = 2.0
+
+PERIOD_PATTERN = re.compile(r'Q([1-4]) FY(\d{4})')
+# Phrasing shared by questions on any topic
+QUESTION_WORDS = frozenset("""
+what how why when where which who can could would should do does did you your talk about any give us color
+just more maybe also think thinking there then so if
+""".split())
+
+
+def question_id(source, asker, text, date):
+    return hashlib.sha256(f"{source}\n{asker}\n{date}\n{text}".encode('utf-8')).hexdigest()[:16]
+
+
+def question_period(question):
+    """(year, quarter) a question was asked in, or None"""
+    match = PERIOD_PATTERN.match(question.get('fiscal_period') or '')
+    if match:
+        return int(match.group(2)), int(match.group(1))
+    date = question.get('date') or ''
+    if re.match(r'\d{4}-\d{2}', date):
+        return int(date[:4]), (int(date[5:7]) - 1) // 3 + 1
+    return None
+
+
+def historical_questions(analyst_questions, meetings):
+    """Every known question as {id: record}: transcript questions by analyst plus CRM meeting questions by firm"""
+    questions = {}
+    for analyst, data in (analyst_questions or {}).items():
+        for q in data['questions']:
+            record = {'text': q['question'], 'asker': analyst, 'firm': data.get('firm', ''), 'source': q['source_doc'],
+                      'fiscal_period': q['fiscal_period'], 'date': q['call_date']}
+            questions[question_id(record['source'], analyst, record['text'], record['date'])] = record
+    for meeting in meetings or []:
+        for text in meeting.get('questions', []):
+            record = {'text': text, 'asker': meeting.get('firm', ''), 'firm': meeting.get('firm', ''),
+                      'source': f"Meeting: {meeting.get('title', '')}", 'fiscal_period': None,
+                      'date': meeting.get('date', '')}
+            questions[question_id(record['source'], record['asker'], text, record['date'])] = record
+    return questions
+
+
+class HashedTfidf:
+    """TF-IDF over hashed unigrams and bigrams with a fixed width, so vectors of
+    earlier questions stay comparable as new ones arrive.
+
+    Document frequencies are kept as running counts; the most frequent term
+    seen in each bucket names it for topic labels.
+    """
+
+    def __init__(self, dim=TOPIC_DIM):
+        self.dim = dim
+        self.document_frequency = np.zeros(dim, dtype=np.float64)
+        self.document_count = 0
+        self._bucket_terms = defaultdict(Counter)
+
+    def _features(self, text):
+        tokens = [token for token in tokenize(text) if token not in QUESTION_WORDS]
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def term_frequencies(self, texts):
+        """Sublinear term frequency rows, plus the features behind each bucket for labelling"""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        features_by_row = []
+        for row, text in enumerate(texts):
+            features = self._features(text)
+            features_by_row.append(features)
+            if not features:
+                continue
+            buckets = np.fromiter((zlib.crc32(f.encode('utf-8')) % self.dim for f in features),
+                                  dtype=np.intp, count=len(features))
+            matrix[row] = np.log1p(np.bincount(buckets, minlength=self.dim))
+        return matrix, features_by_row
+
+    def add(self, term_frequencies, features_by_row):
+        self.document_frequency += (term_frequencies > 0).sum(axis=0)
+        self.document_count += len(term_frequencies)
+        for features in features_by_row:
+            for feature in features:
+                self._bucket_terms[zlib.crc32(feature.encode('utf-8')) % self.dim][feature] += 1
+
+    def remove(self, term_frequencies):
+        self.document_frequency -= (term_frequencies > 0).sum(axis=0)
+        self.document_count -= len(term_frequencies)
+
+    def transform(self, term_frequencies):
+        """L2-normalised TF-IDF rows under the current document frequencies"""
+        idf = np.log((1 + self.document_count) / (1 + self.document_frequency)) + 1
+        matrix = (term_frequencies * idf).astype(np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def bucket_term(self, bucket):
+        terms = self._bucket_terms.get(bucket)
+        return terms.most_common(1)[0][0] if terms else None
+
+
+class MiniBatchKMeans:
+    """Spherical k-means updated one mini-batch at a time.
+
+    Each centroid is the running mean of the vectors assigned to it, so a
+    batch is folded in (or a removed vector taken back out) in one
+    vectorized step without revisiting earlier data. New centroids are
+    seeded k-means++ style from the points furthest from the existing ones
+    until there are k of them.
+    """
+
+    def __init__(self, k=TOPIC_COUNT, batch_size=MINI_BATCH_SIZE, seed=0):
+        self.k = k
+        self.batch_size = batch_size
+        self.centroids = np.zeros((0, 0), dtype=np.float32)
+        self.counts = np.zeros(0, dtype=np.float64)
+        self._random = np.random.default_rng(seed)
+
+    def _seed(self, vectors):
+        """Add centroids from vectors until there are k, or vectors runs out"""
+        while len(self.centroids) < self.k and len(vectors):
+            if len(self.centroids):
+                distance = 1 - (vectors @ self.unit_centroids().T).max(axis=1)
+                distance = np.clip(distance, 0, None) ** 2
+                if not distance.sum():
+                    return
+                choice = self._random.choice(len(vectors), p=distance / distance.sum())
+            else:
+                self.centroids = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+                choice = self._random.integers(len(vectors))
+            self.centroids = np.vstack([self.centroids, vectors[choice:choice + 1]])
+            self.counts = np.append(self.counts, 1.0)
+
+    def unit_centroids(self):
+        norms = np.linalg.norm(self.centroids, axis=1, keepdims=True)
+        return np.divide(self.centroids, norms, out=np.zeros_like(self.centroids), where=norms > 0)
+
+    def predict(self, vectors):
+        if not len(self.centroids):
+            return np.zeros(len(vectors), dtype=np.intp)
+        return np.argmax(vectors @ self.unit_centroids().T, axis=1)
+
+    def partial_fit(self, vectors, epochs=1):
+        vectors = vectors[np.linalg.norm(vectors, axis=1) > 0]
+        counts_before = self.counts.copy()
+        self._seed(vectors)
+        counts_before = np.append(counts_before, np.zeros(len(self.counts) - len(counts_before)))
+        for _ in range(epochs):
+            order = self._random.permutation(len(vectors))
+            for start in range(0, len(order), self.batch_size):
+                batch = vectors[order[start:start + self.batch_size]]
+                sums, batch_counts = self._assigned_sums(batch, self.predict(batch))
+                updated = self.counts + batch_counts
+                self.centroids = ((self.centroids * self.counts[:, None] + sums) /
+                                  np.maximum(updated, 1)[:, None]).astype(np.float32)
+                self.counts = updated
+        if epochs > 1:
+            # Repeated passes inflate the counts; keep one per vector so later batches weigh in fairly
+            self.counts = np.maximum(counts_before + np.bincount(self.predict(vectors), minlength=len(self.counts)), 1)
+
+    def _assigned_sums(self, vectors, labels):
+        """Per-centroid sum and count of the vectors assigned to it"""
+        one_hot = np.zeros((len(vectors), len(self.centroids)), dtype=np.float32)
+        one_hot[np.arange(len(vectors)), labels] = 1
+        return one_hot.T @ vectors, one_hot.sum(axis=0)
+
+    def forget(self, vectors, labels):
+        """Take vectors previously assigned to labels back out of their centroids' running means"""
+        sums, batch_counts = self._assigned_sums(vectors, labels)
+        remaining = self.counts - batch_counts
+        keep = remaining > 0
+        self.centroids[keep] = ((self.centroids[keep] * self.counts[keep, None] - sums[keep]) /
+                                remaining[keep, None])
+        self.counts = np.maximum(remaining, 0)
+
+
+class QuestionTopicModel:
+    """Offline topic clustering of historical questions with per-asker topic prediction.
+
+    Questions are synced incrementally by id: new ones are vectorized and
+    folded into the clusters as one more mini-batch, removed ones are taken
+    back out. No model calls are made.
+    """
+
+    def __init__(self, k=TOPIC_COUNT, dim=TOPIC_DIM):
+        self.tfidf = HashedTfidf(dim)
+        self.kmeans = MiniBatchKMeans(k)
+        self.questions = {}
+        self._rows = {}  # question id -> (buckets, term frequencies), kept sparse
+        self._assignments = None
+
+    def _term_frequencies(self, ids):
+        matrix = np.zeros((len(ids), self.tfidf.dim), dtype=np.float32)
+        for row, qid in enumerate(ids):
+            buckets, values = self._rows[qid]
+            matrix[row, buckets] = values
+        return matrix
+
+    def sync(self, questions):
+        removed = [qid for qid in self.questions if qid not in questions]
+        if removed:
+            term_frequencies = self._term_frequencies(removed)
+            vectors = self.tfidf.transform(term_frequencies)
+            nonzero = np.linalg.norm(vectors, axis=1) > 0
+            if len(self.kmeans.centroids) and nonzero.any():
+                self.kmeans.forget(vectors[nonzero], self.kmeans.predict(vectors[nonzero]))
+            self.tfidf.remove(term_frequencies)
+            for qid in removed:
+                del self.questions[qid]
+                del self._rows[qid]
+            self._assignments = None
+
+        added = [qid for qid in questions if qid not in self.questions]
+        if added:
+            first_fit = not self.questions
+            term_frequencies, features = self.tfidf.term_frequencies([questions[qid]['text'] for qid in added])
+            self.tfidf.add(term_frequencies, features)
+            for qid, row in zip(added, term_frequencies):
+                buckets = np.flatnonzero(row).astype(np.int32)
+                self.questions[qid] = questions[qid]
+                self._rows[qid] = (buckets, row[buckets])
+            self.kmeans.partial_fit(self.tfidf.transform(term_frequencies),
+                                    epochs=INITIAL_EPOCHS if first_fit else 1)
+            self._assignments = None
+        return self
+
+    def assignments(self):
+        """(question ids, topic per question); questions without indexable terms are left out"""
+        if self._assignments is None:
+            ids = list(self.questions)
+            if not ids or not len(self.kmeans.centroids):
+                return [], np.zeros(0, dtype=np.intp)
+            vectors = self.tfidf.transform(self._term_frequencies(ids))
+            indexable = np.linalg.norm(vectors, axis=1) > 0
+            ids = [qid for qid, keep in zip(ids, indexable) if keep]
+            self._assignments = ids, self.kmeans.predict(vectors[indexable])
+        return self._assignments
+
+    def topic_labels(self):
+        """Short label per topic from the heaviest terms of its centroid"""
+        labels = []
+        for centroid in self.kmeans.centroids:
+            terms = []
+            for bucket in np.argsort(centroid)[::-1]:
+                if centroid[bucket] <= 0 or len(terms) == TOPIC_LABEL_TERMS:
+                    break
+                term = self.tfidf.bucket_term(int(bucket))
+                if term and not any(term in t or t in term for t in terms):
+                    terms.append(term)
+            labels.append(', '.join(terms) or "misc")
+        return labels
+
+    def topics(self):
+        """[{'topic', 'label', 'questions', 'askers', 'examples'}] largest topic first"""
+        ids, labels = self.assignments()
+        topic_labels = self.topic_labels()
+        members = defaultdict(list)
+        for qid, topic in zip(ids, labels):
+            members[int(topic)].append(self.questions[qid])
+        topics = [{
+            'topic': topic,
+            'label': topic_labels[topic],
+            'questions': len(records),
+            'askers': sorted({r['asker'] for r in records if r['asker']}),
+            'examples': [r['text'] for r in records[:3]],
+        } for topic, records in members.items()]
+        return sorted(topics, key=lambda t: t['questions'], reverse=True)
+
+    def predict(self, top_n=3):
+        """{asker: [(topic label, probability)]} for the topics each asker is most likely to raise next.
+
+        An asker's topic mix weights recent periods more (RECENCY_DECAY per
+        period back) and is smoothed toward the overall recency-weighted mix.
+        """
+        ids, labels = self.assignments()
+        if not ids:
+            return {}
+        topic_labels = self.topic_labels()
+        topic_count = len(topic_labels)
+
+        periods = [question_period(self.questions[qid]) for qid in ids]
+        known = sorted({p for p in periods if p is not None}, reverse=True)
+        age = {period: i for i, period in enumerate(known)}
+        weights = np.array([RECENCY_DECAY ** age.get(p, len(known)) for p in periods])
+
+        overall = np.bincount(labels, weights=weights, minlength=topic_count)
+        overall = overall / overall.sum()
+
+        askers = np.array([self.questions[qid]['asker'] for qid in ids], dtype=object)
+        predictions = {}
+        for asker in sorted(set(askers) - {''}):
+            mask = askers == asker
+            mix = np.bincount(labels[mask], weights=weights[mask], minlength=topic_count)
+            probabilities = (mix + PRIOR_STRENGTH * overall) / (weights[mask].sum() + PRIOR_STRENGTH)
+            ranked = np.argsort(probabilities)[::-1][:top_n]
+            predictions[asker] = [(topic_labels[t], float(probabilities[t])) for t in ranked]
+        return predictions
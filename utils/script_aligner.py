@@ -0,0 +1,197 @@
+import bisect
+import html
+import re
+import threading
+import time
+from collections import defaultdict, deque
+
+# Consecutive words that must match the script to anchor the speaker's position
+ALIGN_NGRAM = 4
+# A jump ahead over at most this many script words is paraphrase, not a skip
+ALIGN_SKIP_TOLERANCE = 6
+# Unscripted words in a row before they are reported as an ad-lib
+ALIGN_ADLIB_MIN_WORDS = 8
+# Longest ad-lib kept in full; longer runs are reported in pieces so memory stays flat
+ALIGN_ADLIB_MAX_WORDS = 400
+
+WORD_PATTERN = re.compile(r"[A-Za-z0-9]+(?:['’][A-Za-z]+)?")
+
+PENDING = 'pending'
+DELIVERED = 'delivered'
+SKIPPED = 'skipped'
+REORDERED = 'reordered'
+
+STATUS_STYLES = {
+    PENDING: "color: #888;",
+    DELIVERED: "",
+    SKIPPED: "background: #fde2e1; text-decoration: line-through;",
+    REORDERED: "background: #fff1c2;",
+}
+
+
+def normalize_word(word):
+    return word.lower().replace('’', "'")
+
+
+class ScriptAligner:
+    """Streaming alignment of what is said on the call against the prepared script.
+
+    The script's word n-grams are indexed once. Each live word then costs
+    one dictionary lookup plus a binary search among the script positions
+    sharing its n-gram, so the work per word does not grow with the length
+    of the call. Script words are marked delivered as the speaker reaches
+    them, skipped when the speaker jumps past them, and reordered when they
+    are delivered after being skipped; unscripted runs are reported as
+    ad-libs.
+    """
+
+    def __init__(self, script, n=ALIGN_NGRAM):
+        self.script = script
+        self.n = n
+        matches = list(WORD_PATTERN.finditer(script))
+        self.spans = [(m.start(), m.end()) for m in matches]
+        words = [normalize_word(m.group(0)) for m in matches]
+        self.status = [PENDING] * len(words)
+        self._ngrams = defaultdict(list)
+        for i in range(len(words) - n + 1):
+            self._ngrams[tuple(words[i:i + n])].append(i)
+
+        self._lock = threading.Lock()
+        self.cursor = 0  # script word the speaker is expected to say next
+        self.passages = []  # {'kind': skipped | reordered | ad-lib, 'start', 'end', 'text'}
+        self._recent = deque(maxlen=n)
+        self._unscripted = []
+        self._tentative = None  # a jump waiting for the next word to confirm it
+        self._partial = ""
+        self.live_words = 0
+        self.busy_seconds = 0.0
+
+    def feed(self, text, boundary=False):
+        """Align newly heard text; boundary marks the start of a new turn"""
+        started = time.perf_counter()
+        with self._lock:
+            if boundary:
+                text = " " + text
+            text = self._partial + text
+            words = [(m.group(0), m.end()) for m in WORD_PATTERN.finditer(text)]
+            # A word touching the end of the text may still be growing
+            self._partial = ""
+            if words and words[-1][1] == len(text):
+                self._partial = words.pop()[0]
+            for word, _ in words:
+                self._add_word(word)
+            self.busy_seconds += time.perf_counter() - started
+
+    def _add_word(self, word):
+        self.live_words += 1
+        self._recent.append(normalize_word(word))
+        self._unscripted.append(word)
+        if len(self._unscripted) > ALIGN_ADLIB_MAX_WORDS:
+            self._report_adlib(self._unscripted[:-self.n])
+            self._unscripted = self._unscripted[-self.n:]
+        if len(self._recent) < self.n:
+            return
+        positions = self._ngrams.get(tuple(self._recent))
+
+        if self._tentative is not None:
+            tentative, self._tentative = self._tentative, None
+            i = bisect.bisect_left(positions or [], tentative + 1)
+            if positions and i < len(positions) and positions[i] == tentative + 1:
+                self._anchor(tentative, matched_words=self.n + 1)
+                self._anchor(tentative + 1)
+                return
+
+        position = self._choose(positions)
+        if position is None:
+            return
+        if self.cursor - self.n + 1 <= position <= self.cursor + ALIGN_SKIP_TOLERANCE:
+            self._anchor(position)
+        else:
+            # Jumps ahead or back only count once the next word continues from there
+            self._tentative = position
+
+    def _choose(self, positions):
+        """Script position for a matched n-gram: next at or after the cursor, else nearest not yet delivered"""
+        if not positions:
+            return None
+        i = bisect.bisect_left(positions, self.cursor - self.n + 1)
+        candidates = positions[i:] + positions[:i][::-1]
+        for position in candidates:
+            if any(self.status[p] != DELIVERED for p in range(position, position + self.n)):
+                return position
+            if position == self.cursor - self.n + 1:
+                # Still on the n-gram just aligned (a repeated word); stay put
+                return None
+        return None
+
+    def _anchor(self, position, matched_words=None):
+        self._report_adlib(self._unscripted[:-(matched_words or self.n)])
+        self._unscripted = []
+
+        if position > self.cursor:
+            gap = range(self.cursor, position)
+            pending = [p for p in gap if self.status[p] == PENDING]
+            mark = DELIVERED if len(gap) <= ALIGN_SKIP_TOLERANCE else SKIPPED
+            for p in pending:
+                self.status[p] = mark
+            if mark == SKIPPED and pending:
+                self._report('skipped', pending[0], pending[-1] + 1)
+
+        for p in range(position, position + self.n):
+            if self.status[p] == SKIPPED:
+                self.status[p] = REORDERED
+                self._report('reordered', p, p + 1)
+            elif self.status[p] == PENDING:
+                self.status[p] = DELIVERED
+        self.cursor = position + self.n
+
+    def _report(self, kind, start, end):
+        last = self.passages[-1] if self.passages else None
+        if last is not None and last['kind'] == kind and kind != 'ad-lib' and last['end'] >= start - 1:
+            last['end'] = max(last['end'], end)
+            return
+        self.passages.append({'kind': kind, 'start': start, 'end': end, 'text': None})
+
+    def _report_adlib(self, words):
+        if len(words) >= ALIGN_ADLIB_MIN_WORDS:
+            self.passages.append({'kind': 'ad-lib', 'start': self.cursor, 'end': self.cursor,
+                                  'text': ' '.join(words)})
+
+    def passage_text(self, passage):
+        if passage['text'] is not None:
+            return passage['text']
+        return self.script[self.spans[passage['start']][0]:self.spans[passage['end'] - 1][1]]
+
+    def snapshot(self):
+        """Copy of the alignment state for rendering"""
+        with self._lock:
+            in_progress = self._unscripted[:-(self.n - 1)] if self.n > 1 else list(self._unscripted)
+            return {
+                'status': list(self.status),
+                'cursor': self.cursor,
+                'passages': [dict(passage, text=self.passage_text(passage)) for passage in self.passages],
+                'adlib_in_progress': ' '.join(in_progress) if len(in_progress) >= ALIGN_ADLIB_MIN_WORDS else None,
+                'live_words': self.live_words,
+                'busy_seconds': self.busy_seconds,
+            }
+
+    def render_html(self, status, cursor):
+        """Script as HTML with each run of words styled by its alignment status and the cursor marked"""
+        parts = []
+        previous_end = 0
+        i = 0
+        while i < len(self.spans):
+            j = i + 1
+            while j < len(self.spans) and status[j] == status[i] and j != cursor:
+                j += 1
+            start, end = self.spans[i][0], self.spans[j - 1][1]
+            parts.append(html.escape(self.script[previous_end:start]))
+            if i == cursor:
+                parts.append('<span style="border-left: 2px solid #d33;"></span>')
+            style = STATUS_STYLES[status[i]]
+            text = html.escape(self.script[start:end])
+            parts.append(f'<span style="{style}">{text}</span>' if style else text)
+            previous_end = end
+            i = j
+        parts.append(html.escape(self.script[previous_end:]))
+        return ''.join(parts).replace('\n', '<br>')
@@ -0,0 +1,158 @@
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+
+from utils.document_processing import estimate_tokens
+from utils.document_store import get_document_store
+
+# ~500 tokens per chunk keeps excerpts focused without fragmenting paragraphs
+CHUNK_BYTES = 2000
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have in is it its of on or our that the this to was we were will with
+""".split())
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Chunked inverted index over uploaded documents with Okapi BM25 scoring.
+
+    Chunks are byte spans into the shared document store, so the index holds
+    postings and offsets only, never a second copy of the text. Documents are
+    added and removed incrementally by their upload key.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = defaultdict(dict)  # term -> {chunk_id: term frequency}
+        self._chunks = {}  # chunk_id -> chunk metadata
+        self._chunk_terms = {}  # chunk_id -> terms it contains, so removal never rereads the text
+        self._doc_chunks = {}  # doc_key -> [chunk_id, ...]
+        self._total_length = 0
+        self._next_chunk_id = 0
+
+    def __contains__(self, doc_key):
+        return doc_key in self._doc_chunks
+
+    def add_document(self, doc_key, doc):
+        """Index a session document handle; re-adding the same key is a no-op"""
+        if doc_key in self._doc_chunks:
+            return
+
+        store = get_document_store()
+        chunk_ids = []
+        for position, (start, end) in enumerate(store.iter_chunk_spans(doc['digest'], max_bytes=CHUNK_BYTES)):
+            term_counts = Counter(tokenize(store.read_range(doc['digest'], start, end)))
+            length = sum(term_counts.values())
+            if not length:
+                continue
+
+            chunk_id = self._next_chunk_id
+            self._next_chunk_id += 1
+            self._chunks[chunk_id] = {
+                'doc_key': doc_key,
+                'name': doc['name'],
+                'digest': doc['digest'],
+                'position': position,
+                'start': start,
+                'end': end,
+                'length': length,
+            }
+            for term, count in term_counts.items():
+                self._postings[term][chunk_id] = count
+            self._chunk_terms[chunk_id] = tuple(term_counts)
+            self._total_length += length
+            chunk_ids.append(chunk_id)
+
+        self._doc_chunks[doc_key] = chunk_ids
+
+    def remove_document(self, doc_key):
+        for chunk_id in self._doc_chunks.pop(doc_key, []):
+            chunk = self._chunks.pop(chunk_id)
+            self._total_length -= chunk['length']
+            # Walk only the terms this chunk contained rather than the whole vocabulary
+            for term in self._chunk_terms.pop(chunk_id):
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.pop(chunk_id, None)
+                    if not postings:
+                        del self._postings[term]
+
+    def sync(self, documents):
+        """Bring the index in line with a {doc_key: handle} mapping, touching only the differences"""
+        for doc_key in [key for key in self._doc_chunks if key not in documents]:
+            self.remove_document(doc_key)
+        for doc_key, doc in documents.items():
+            self.add_document(doc_key, doc)
+
+    def search(self, query, k=10, doc_keys=None):
+        """Return up to k (chunk, score) pairs, best first, optionally limited to some documents"""
+        chunk_count = len(self._chunks)
+        if not chunk_count:
+            return []
+
+        avg_length = self._total_length / chunk_count
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (chunk_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, tf in postings.items():
+                chunk = self._chunks[chunk_id]
+                if doc_keys is not None and chunk['doc_key'] not in doc_keys:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * chunk['length'] / avg_length)
+                scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self._chunks[chunk_id], score) for chunk_id, score in best]
+
+    def select_context(self, query, token_budget, doc_keys=None, k=50):
+        """Top-ranked chunks that fit in token_budget, each with its text attached"""
+        return pack_context([chunk for chunk, _ in self.search(query, k=k, doc_keys=doc_keys)], token_budget)
+
+
+def pack_context(ranked_chunks, token_budget):
+    """Greedily keep chunks in rank order while they fit in token_budget, attaching their text"""
+    store = get_document_store()
+    selected = []
+    used_tokens = 0
+    for chunk in ranked_chunks:
+        text = store.read_range(chunk['digest'], chunk['start'], chunk['end'])
+        tokens = estimate_tokens(text)
+        if used_tokens + tokens > token_budget:
+            continue
+        selected.append(dict(chunk, text=text))
+        used_tokens += tokens
+    return selected
+
+
+def fuse_rankings(rankings, k=60):
+    """Reciprocal rank fusion of several [(chunk, score), ...] lists into one ranked chunk list"""
+    fused = {}
+    for ranking in rankings:
+        for rank, (chunk, _) in enumerate(ranking):
+            key = (chunk['digest'], chunk['start'])
+            best_chunk, score = fused.get(key, (chunk, 0.0))
+            fused[key] = (best_chunk, score + 1.0 / (k + rank + 1))
+    return [chunk for chunk, _ in sorted(fused.values(), key=lambda item: item[1], reverse=True)]
+
+
+def excerpt_text(chunks):
+    """Join chunks from one document in reading order"""
+    return '\n'.join(chunk['text'].strip() for chunk in sorted(chunks, key=lambda chunk: chunk['position']))
+
+
+def format_context(chunks):
+    """Render selected chunks grouped per document, in reading order"""
+    by_document = {}
+    for chunk in chunks:
+        by_document.setdefault(chunk['name'], []).append(chunk)
+    return ''.join(f"\nFrom {name}:\n{excerpt_text(doc_chunks)}\n" for name, doc_chunks in by_document.items())
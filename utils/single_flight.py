@@ -0,0 +1,79 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls so only one does the work.
+
+    The first caller for a key becomes the leader and runs the call; anyone
+    asking for the same key while it is in flight waits on the leader's
+    future and receives the same result or the same exception. Futures are
+    concurrent.futures ones, so script threads and the async loop can share
+    a flight in either direction.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def claim(self, key):
+        """(future, is_leader) for key; the leader must later call finish()"""
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                return future, False
+            future = self._flights[key] = Future()
+            return future, True
+
+    def finish(self, key, future, result=None, error=None):
+        """Publish the leader's outcome to every waiter and close the flight"""
+        with self._lock:
+            if self._flights.get(key) is future:
+                del self._flights[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._flights)
+
+    def do(self, key, call):
+        future, leader = self.claim(key)
+        if not leader:
+            return future.result()
+        try:
+            result = call()
+        except BaseException as e:
+            self.finish(key, future, error=e)
+            raise
+        self.finish(key, future, result=result)
+        return result
+
+    async def do_async(self, key, call):
+        """do() for coroutines: call() returns an awaitable"""
+        future, leader = self.claim(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            result = await call()
+        except BaseException as e:
+            self.finish(key, future, error=e)
+            raise
+        self.finish(key, future, result=result)
+        return result
+
+
+_request_flights = None
+_request_flights_lock = threading.Lock()
+
+
+def get_request_flights():
+    """Process-wide single-flight table for LLM requests, keyed on the normalized request"""
+    global _request_flights
+    with _request_flights_lock:
+        if _request_flights is None:
+            _request_flights = SingleFlight()
+        return _request_flights
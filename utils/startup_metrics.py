@@ -0,0 +1,131 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.storage import data_dir
+
+# Past process starts shown alongside this one
+STARTUP_HISTORY_LIMIT = 50
+
+
+def prometheus_label(value):
+    """Escape a label value for the Prometheus text format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def process_start_time():
+    """Wall-clock time the server process started, from /proc where available, else now"""
+    try:
+        with open('/proc/self/stat') as f:
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - uptime + start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+class StartupMetrics:
+    """Cold-start timings of this server process.
+
+    Records when the first script run began and when the first page finished
+    rendering (both relative to process start), the import time of each view
+    on its first visit, and the first render of each page. One line per
+    process is appended to the log when the first page has rendered, so
+    container restarts can be compared over time.
+    """
+
+    def __init__(self, log_path=None):
+        self.log_path = log_path
+        self.process_started = process_start_time()
+        self._lock = threading.Lock()
+        self.first_script_run_s = None
+        self.first_render_s = None
+        self.first_page = None
+        self.imports = {}  # module -> seconds to import on first use
+        self.page_renders = {}  # page -> seconds for its first script run
+
+    def start_run(self):
+        """Mark the start of a script run; returns the run's start time for page_rendered"""
+        started = time.perf_counter()
+        with self._lock:
+            if self.first_script_run_s is None:
+                self.first_script_run_s = time.time() - self.process_started
+        return started
+
+    @contextmanager
+    def timed_import(self, module):
+        started = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.imports.setdefault(module, elapsed)
+
+    def page_rendered(self, page, run_started):
+        elapsed = time.perf_counter() - run_started
+        with self._lock:
+            self.page_renders.setdefault(page, elapsed)
+            if self.first_render_s is not None:
+                return
+            self.first_render_s = time.time() - self.process_started
+            self.first_page = page
+            line = json.dumps(self._snapshot())
+        if self.log_path:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+    def _snapshot(self):
+        return {
+            'ts': time.time(),
+            'process_started': self.process_started,
+            'first_script_run_s': self.first_script_run_s,
+            'first_render_s': self.first_render_s,
+            'first_page': self.first_page,
+            'imports': dict(self.imports),
+            'page_renders': dict(self.page_renders),
+        }
+
+    def snapshot(self):
+        with self._lock:
+            return self._snapshot()
+
+    def history(self, limit=STARTUP_HISTORY_LIMIT):
+        """Logged process starts, newest first"""
+        if not self.log_path or not os.path.exists(self.log_path):
+            return []
+        with open(self.log_path, encoding='utf-8') as f:
+            lines = f.readlines()[-limit:]
+        return [json.loads(line) for line in reversed(lines) if line.strip()]
+
+    def to_prometheus(self):
+        state = self.snapshot()
+        lines = []
+        for name, help_text in (('first_script_run_s', "Seconds from process start to the first script run."),
+                                ('first_render_s', "Seconds from process start to the first rendered page.")):
+            if state[name] is not None:
+                metric = f"ir_app_{name[:-2]}_seconds"
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge", f"{metric} {state[name]:g}"]
+        lines += ["# HELP ir_app_view_import_seconds Import time of each view module on its first visit.",
+                  "# TYPE ir_app_view_import_seconds gauge"]
+        for module, seconds in sorted(state['imports'].items()):
+            lines.append(f'ir_app_view_import_seconds{{module="{prometheus_label(module)}"}} {seconds:g}')
+        lines += ["# HELP ir_app_page_first_render_seconds First script run of each page in this process.",
+                  "# TYPE ir_app_page_first_render_seconds gauge"]
+        for page, seconds in sorted(state['page_renders'].items()):
+            lines.append(f'ir_app_page_first_render_seconds{{page="{prometheus_label(page)}"}} {seconds:g}')
+        return '\n'.join(lines) + '\n'
+
+
+_startup = None
+_startup_lock = threading.Lock()
+
+
+def get_startup_metrics():
+    """Process-wide startup timings"""
+    global _startup
+    with _startup_lock:
+        if _startup is None:
+            _startup = StartupMetrics(os.path.join(data_dir('metrics'), 'startup.jsonl'))
+        return _startup
@@ -0,0 +1,12 @@
+import os
+
+# Root directory for server-side data shared by every session (caches, stores).
+# Override with IR_DATA_DIR when the app directory is read-only.
+DATA_ROOT = os.getenv('IR_DATA_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.ir_data'))
+
+
+def data_dir(*parts):
+    """Return a directory under the shared data root, creating it if needed"""
+    path = os.path.join(DATA_ROOT, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
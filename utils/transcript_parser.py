@@ -0,0 +1,224 @@
+import os
+import re
+from itertools import chain, islice
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Speakers whose lines end an analyst's question; comma separated
+IR_MANAGEMENT_SPEAKERS = os.getenv('IR_MANAGEMENT_SPEAKERS', 'Matt Baer,David Aufderhaar,Operator')
+# Lines at the top of a transcript that list participants and the fiscal period
+HEADER_LINES = 20
+
+YEAR_PATTERN = re.compile(r'20\d{2}')
+FILENAME_QUARTER_PATTERN = re.compile(r'q([1-4])')
+QUARTER_PATTERN = re.compile(r'(first|second|third|fourth) quarter')
+QUARTER_WORDS = {'first': 'Q1', 'second': 'Q2', 'third': 'Q3', 'fourth': 'Q4'}
+
+# One row per non-blank line, independent of the management speaker list. line_number
+# counts blank lines too; analyst and firm are set on lines naming a header analyst.
+LINE_SCHEMA = pa.schema([
+    ('line_number', pa.int32()),
+    ('line_start', pa.int64()),
+    ('line_end', pa.int64()),
+    ('analyst', pa.string()),
+    ('firm', pa.string()),
+])
+
+# One row per speaker turn. Offsets are UTF-8 byte positions in the stored document text:
+# the speaker's line starts at line_start, and the body runs from its first to its last
+# non-blank line (text_start == text_end for an empty turn).
+TURN_SCHEMA = pa.schema([
+    ('turn', pa.int32()),
+    ('speaker', pa.string()),
+    ('role', pa.string()),  # operator | management | analyst; null before the first speaker
+    ('firm', pa.string()),
+    ('section', pa.string()),  # header | prepared | qa
+    ('line_start', pa.int64()),
+    ('text_start', pa.int64()),
+    ('text_end', pa.int64()),
+])
+
+
+def parse_speaker_list(text):
+    return [name.strip() for name in text.split(',') if name.strip()]
+
+
+def names_pattern(names):
+    """Alternation of a set of names, longest first so overlapping names match in full; None when empty"""
+    names = sorted({name for name in names if name}, key=len, reverse=True)
+    if not names:
+        return None
+    return '|'.join(re.escape(name) for name in names)
+
+
+def compile_names(names, anchored=False, ignore_case=False):
+    """One alternation regex for a set of names"""
+    pattern = names_pattern(names)
+    if pattern is None:
+        return None
+    return re.compile(f"^(?:{pattern})" if anchored else f"(?:{pattern})", re.IGNORECASE if ignore_case else 0)
+
+
+def header_fiscal_period(header_lines):
+    """(quarter, year) stated in the transcript header, either possibly None"""
+    quarter = year = None
+    for line in header_lines:
+        if quarter and year:
+            break
+        lowered = line.lower()
+        if not year and ('fiscal year' in lowered or 'fiscal 20' in lowered):
+            year_match = YEAR_PATTERN.search(line)
+            if year_match:
+                year = year_match.group(0)
+        if not quarter:
+            quarter_match = QUARTER_PATTERN.search(lowered)
+            if quarter_match:
+                quarter = QUARTER_WORDS[quarter_match.group(1)]
+    return quarter, year
+
+
+def fiscal_period(file_name, table):
+    """(quarter, year) of a transcript: the file name wins, the header fills in the rest"""
+    name = file_name.lower()
+    quarter_match = FILENAME_QUARTER_PATTERN.search(name)
+    year_match = YEAR_PATTERN.search(name)
+    metadata = table.schema.metadata or {}
+    quarter = f"Q{quarter_match.group(1)}" if quarter_match else metadata.get(b'quarter', b'').decode() or None
+    year = year_match.group(0) if year_match else metadata.get(b'year', b'').decode() or None
+    return quarter, year
+
+
+def fiscal_period_label(file_name, table):
+    quarter, year = fiscal_period(file_name, table)
+    return f"{quarter} FY{year}" if quarter and year else "Quarter Unknown"
+
+
+def header_analysts(header_lines):
+    """Analysts listed in the participants header: lines mentioning 'analyst', minus the last word"""
+    analysts = {}
+    for line in header_lines:
+        if 'analyst' in line.lower():
+            parts = line.split()
+            if len(parts) >= 2:
+                name = ' '.join(parts[:-1])
+                analysts[name.lower()] = {'name': name, 'firm': ''}
+    return analysts
+
+
+def line_table(line_spans):
+    """Non-blank lines of a transcript given as (start, end, line) spans, with header analysts marked.
+
+    This is the expensive pass over the text and does not depend on the
+    management speaker list, so it is stored once per document.
+    """
+    line_spans = iter(line_spans)
+    header = list(islice(line_spans, HEADER_LINES))
+    quarter, year = header_fiscal_period(line for _, _, line in header)
+    analysts = header_analysts(line for _, _, line in header)
+    analyst_matcher = compile_names(analysts.keys(), ignore_case=True)
+
+    columns = {name: [] for name in LINE_SCHEMA.names}
+    for line_number, (start, end, line) in enumerate(chain(header, line_spans)):
+        if not line.strip():
+            continue
+        analyst_match = analyst_matcher.search(line) if analyst_matcher is not None else None
+        analyst = analysts[analyst_match.group(0).lower()] if analyst_match is not None else None
+        columns['line_number'].append(line_number)
+        columns['line_start'].append(start)
+        columns['line_end'].append(end)
+        columns['analyst'].append(analyst['name'] if analyst else None)
+        columns['firm'].append(analyst['firm'] if analyst else None)
+
+    metadata = {'quarter': quarter or '', 'year': year or ''}
+    return pa.Table.from_pydict(columns, schema=LINE_SCHEMA.with_metadata(metadata))
+
+
+class TranscriptParser:
+    """Splits an earnings call transcript into speaker turns.
+
+    Works on a line_table: analyst lines are already marked, and management
+    speakers (and the operator) are matched at the start of each line with
+    one vectorized regex, so a new speaker list never rescans the text. The
+    Q&A section starts at the first analyst turn after the header.
+    """
+
+    def __init__(self, management_speakers=None):
+        if management_speakers is None:
+            management_speakers = parse_speaker_list(IR_MANAGEMENT_SPEAKERS)
+        self.management_speakers = list(management_speakers)
+        pattern = names_pattern(self.management_speakers)
+        self._management = f"^(?P<speaker>{pattern})" if pattern is not None else None
+
+    def turn_table(self, lines, text):
+        """Speaker-turn table from a line_table and the UTF-8 bytes of the text it was built from"""
+        metadata = lines.schema.metadata
+        count = lines.num_rows
+        if count == 0:
+            return TURN_SCHEMA.with_metadata(metadata).empty_table()
+
+        starts = lines['line_start'].to_numpy()
+        ends = lines['line_end'].to_numpy()
+        analysts = lines['analyst'].combine_chunks()
+        is_analyst = analysts.is_valid().to_numpy(zero_copy_only=False)
+
+        # Line i runs to the start of line i + 1; the anchored regex only looks at its head
+        offsets = np.append(starts, len(text)).astype(np.int64)
+        heads = pa.LargeStringArray.from_buffers(count, pa.py_buffer(offsets), pa.py_buffer(text))
+        is_management = np.zeros(count, dtype=bool)
+        management = pa.nulls(count, pa.string())
+        if self._management is not None:
+            is_management = pc.match_substring_regex(heads, self._management).to_numpy(zero_copy_only=False)
+            is_management &= ~is_analyst
+            management = pc.extract_regex(heads, self._management).field('speaker').cast(pa.string())
+
+        # Turns open on speaker lines, plus one for any text before the first speaker
+        opens_turn = is_analyst | is_management
+        lead = not opens_turn[0]
+        openers = np.flatnonzero(opens_turn)
+        if lead:
+            openers = np.insert(openers, 0, 0)
+        turn_of_line = np.cumsum(opens_turn) - (0 if lead else 1)
+
+        line_numbers = lines['line_number'].to_numpy()
+        after_header = line_numbers >= HEADER_LINES
+        qa_lines = np.flatnonzero(is_analyst & after_header)
+        section = np.where(after_header, 'prepared', 'header').astype(object)
+        if len(qa_lines):
+            section[qa_lines[0]:] = 'qa'
+
+        # A turn's body runs from its first to its last non-speaker line, else it is empty at the speaker line's end
+        text_start = ends[openers].copy()
+        text_end = ends[openers].copy()
+        body = np.flatnonzero(~opens_turn)
+        if len(body):
+            body_turns = turn_of_line[body]
+            first = np.unique(body_turns, return_index=True)[1]
+            last = len(body) - 1 - np.unique(body_turns[::-1], return_index=True)[1]
+            text_start[body_turns[first]] = starts[body[first]]
+            text_end[body_turns[last]] = ends[body[last]]
+
+        speakers = pc.if_else(pa.array(is_analyst), analysts, management).take(pa.array(openers)).to_pylist()
+        roles = []
+        for turn, opener in enumerate(openers):
+            if not opens_turn[opener]:
+                roles.append(None)
+            elif is_analyst[opener]:
+                roles.append('analyst')
+            else:
+                roles.append('operator' if speakers[turn].lower() == 'operator' else 'management')
+        if lead:
+            speakers[0] = None
+
+        columns = {
+            'turn': np.arange(len(openers), dtype=np.int32),
+            'speaker': speakers,
+            'role': roles,
+            'firm': lines['firm'].take(pa.array(openers)),
+            'section': section[openers].tolist(),
+            'line_start': starts[openers],
+            'text_start': text_start,
+            'text_end': text_end,
+        }
+        return pa.Table.from_pydict(columns, schema=TURN_SCHEMA.with_metadata(metadata))
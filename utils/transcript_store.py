@@ -0,0 +1,140 @@
+import os
+import threading
+from collections import OrderedDict
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from utils.document_store import get_document_store
+from utils.storage import data_dir
+from utils.transcript_parser import TranscriptParser, line_table
+
+# Bump when the line table's output changes so stale tables are rebuilt
+LINE_TABLE_VERSION = "v2"
+# Documents and speaker lists kept in memory per cache
+DEFAULT_MAX_ENTRIES = int(os.getenv('IR_TRANSCRIPT_CACHE_ENTRIES', 128))
+
+
+class TranscriptStore:
+    """Process-wide speaker-turn tables for stored documents.
+
+    Each document is scanned once into a line table, written as an Arrow IPC
+    file and read back through a memory map. Speaker turns are split from it
+    per management speaker list, so editing the list never rescans the text.
+    The in-memory caches keep the ``max_entries`` most recently used entries.
+    """
+
+    def __init__(self, store_dir, document_store, max_entries=DEFAULT_MAX_ENTRIES):
+        self.store_dir = store_dir
+        self.document_store = document_store
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._lines = OrderedDict()
+        self._tables = OrderedDict()
+        self._questions = OrderedDict()
+        self._parsers = OrderedDict()
+        # Older versions and documents evicted from the document store are never read again
+        for entry in os.scandir(store_dir):
+            digest, _, rest = entry.name.partition('.')
+            if entry.is_file() and (rest != f"{LINE_TABLE_VERSION}.arrow" or not document_store.has(digest)):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    def _cached(self, cache, key):
+        with self._lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+
+    def _remember(self, cache, key, value):
+        with self._lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > self.max_entries:
+                cache.popitem(last=False)
+
+    def _parser(self, speakers_key):
+        parser = self._cached(self._parsers, speakers_key)
+        if parser is None:
+            parser = TranscriptParser(list(speakers_key) if speakers_key is not None else None)
+            self._remember(self._parsers, speakers_key, parser)
+        return parser
+
+    def _path(self, digest):
+        return os.path.join(self.store_dir, f"{digest}.{LINE_TABLE_VERSION}.arrow")
+
+    def lines(self, digest):
+        """Line table of a stored document, scanning it on first use"""
+        table = self._cached(self._lines, digest)
+        if table is not None:
+            return table
+
+        path = self._path(digest)
+        if not os.path.exists(path):
+            table = line_table(self.document_store.iter_line_spans(digest))
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with pa.OSFile(tmp_path, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, path)
+
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        self._remember(self._lines, digest, table)
+        return table
+
+    def table(self, digest, management_speakers=None):
+        """Speaker-turn table of a stored document for a management speaker list"""
+        key = (digest, tuple(management_speakers) if management_speakers is not None else None)
+        table = self._cached(self._tables, key)
+        if table is None:
+            table = self._parser(key[1]).turn_table(self.lines(digest), self.document_store.view(digest))
+            self._remember(self._tables, key, table)
+        return table
+
+    def questions(self, digest, management_speakers=None):
+        """[(analyst, firm, question)] asked in a stored document, computed once per content and speaker list"""
+        key = (digest, tuple(management_speakers) if management_speakers is not None else None)
+        questions = self._cached(self._questions, key)
+        if questions is None:
+            turns = question_turns(self.table(digest, management_speakers))
+            questions = [
+                (turn['speaker'], turn['firm'] or '', self.turn_text(digest, turn['text_start'], turn['text_end']))
+                for turn in turns.select(['speaker', 'firm', 'text_start', 'text_end']).to_pylist()]
+            self._remember(self._questions, key, questions)
+        return questions
+
+    def turn_text(self, digest, text_start, text_end):
+        """Body of a turn as one line of text"""
+        text = self.document_store.read_range(digest, text_start, text_end)
+        return ' '.join(line.strip() for line in text.split('\n') if line.strip())
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_transcript_store():
+    """Process-wide transcript turn store shared across sessions"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TranscriptStore(data_dir('transcripts'), get_document_store())
+        return _store
+
+
+def question_turns(table):
+    """Turns that are analyst questions: non-empty analyst turns answered by management or the operator"""
+    role = table['role'].combine_chunks() if table.num_rows else pa.array([], pa.string())
+    next_role = pa.concat_arrays([role.slice(1), pa.nulls(min(len(role), 1), pa.string())])
+    mask = pc.and_(
+        pc.and_(pc.equal(role, 'analyst'), pc.is_in(next_role, value_set=pa.array(['management', 'operator']))),
+        pc.greater(table['text_end'], table['text_start']))
+    return table.filter(pc.fill_null(mask, False))
+
+
+def has_qa_section(table):
+    return pc.any(pc.equal(table['section'], 'qa')).as_py() or False
+
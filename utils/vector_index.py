@@ -0,0 +1,192 @@
+import json
+import os
+import threading
+import zlib
+
+import numpy as np
+
+from utils.document_store import get_document_store
+from utils.search_index import CHUNK_BYTES, tokenize
+from utils.storage import data_dir
+
+EMBEDDING_DIM = 1024
+
+
+class HashingVectorizer:
+    """Deterministic, offline text embedding via the signed hashing trick.
+
+    Unigrams and bigrams are hashed with CRC32 (stable across processes,
+    unlike hash()) into ``dim`` buckets, weighted by sublinear term frequency
+    and L2-normalised, so cosine similarity is a plain dot product.
+    """
+
+    def __init__(self, dim=EMBEDDING_DIM):
+        self.dim = dim
+
+    @property
+    def name(self):
+        return f"hash{self.dim}"
+
+    def _features(self, text):
+        tokens = tokenize(text)
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def transform(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = self._features(text)
+            if not features:
+                continue
+            hashes = np.fromiter((zlib.crc32(f.encode('utf-8')) for f in features), dtype=np.uint32, count=len(features))
+            buckets = (hashes % self.dim).astype(np.intp)
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+            counts = np.bincount(buckets, weights=signs, minlength=self.dim)
+            matrix[row] = np.sign(counts) * np.log1p(np.abs(counts))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
+class VectorIndex:
+    """Contiguous float32 matrix of unit vectors with batched top-k search"""
+
+    def __init__(self, dim=EMBEDDING_DIM, capacity=256):
+        self.dim = dim
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self._size = 0
+        self.metadata = []
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def vectors(self):
+        return self._matrix[:self._size]
+
+    def add(self, vectors, metadata):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        needed = self._size + len(vectors)
+        if needed > len(self._matrix):
+            # Grow geometrically so appends stay amortised O(1) and rows stay contiguous
+            grown = np.zeros((max(needed, 2 * len(self._matrix)), self.dim), dtype=np.float32)
+            grown[:self._size] = self.vectors
+            self._matrix = grown
+        self._matrix[self._size:needed] = vectors
+        self._size = needed
+        self.metadata.extend(metadata)
+
+    def remove(self, keep):
+        """Drop every row whose metadata fails keep(meta), compacting in place"""
+        mask = np.fromiter((keep(meta) for meta in self.metadata), dtype=bool, count=self._size)
+        kept = int(mask.sum())
+        self._matrix[:kept] = self.vectors[mask]
+        self._size = kept
+        self.metadata = [meta for meta, keep_row in zip(self.metadata, mask) if keep_row]
+
+    def search(self, queries, k=10, row_mask=None):
+        """Top-k (metadata, score) lists for each query row, best first"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if not self._size:
+            return [[] for _ in range(len(queries))]
+
+        scores = queries @ self.vectors.T
+        if row_mask is not None:
+            scores[:, ~row_mask] = -np.inf
+        k = min(k, self._size)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+
+        results = []
+        for rows, row_scores in zip(np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)):
+            results.append([(self.metadata[row], float(score)) for row, score in zip(rows, row_scores)
+                            if np.isfinite(score)])
+        return results
+
+    def save(self, path):
+        with open(f"{path}.json", 'w', encoding='utf-8') as f:
+            json.dump(self.metadata, f)
+        # The matrix lands last and atomically; its presence marks a complete save
+        with open(f"{path}.npy.tmp", 'wb') as f:
+            np.save(f, self.vectors)
+        os.replace(f"{path}.npy.tmp", f"{path}.npy")
+
+    @classmethod
+    def load(cls, path):
+        vectors = np.load(f"{path}.npy")
+        with open(f"{path}.json", 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        index = cls(dim=vectors.shape[1], capacity=max(len(vectors), 1))
+        index.add(vectors, metadata)
+        return index
+
+
+_embedding_lock = threading.Lock()
+
+
+def embed_document(digest, vectorizer):
+    """Chunk spans and embeddings for a stored document, computed once per server and kept on disk"""
+    path = os.path.join(data_dir('embeddings', vectorizer.name), digest)
+    if os.path.exists(f"{path}.npy"):
+        return VectorIndex.load(path)
+
+    with _embedding_lock:
+        if os.path.exists(f"{path}.npy"):
+            return VectorIndex.load(path)
+
+        store = get_document_store()
+        spans = list(store.iter_chunk_spans(digest, max_bytes=CHUNK_BYTES))
+        texts = [store.read_range(digest, start, end) for start, end in spans]
+        document_index = VectorIndex(dim=vectorizer.dim, capacity=max(len(spans), 1))
+        document_index.add(vectorizer.transform(texts),
+                           [{'position': position, 'start': start, 'end': end}
+                            for position, (start, end) in enumerate(spans)])
+        document_index.save(path)
+        return document_index
+
+
+class DocumentVectorIndex:
+    """Session-level semantic index over uploaded documents, keyed like BM25Index"""
+
+    def __init__(self, vectorizer=None):
+        self.vectorizer = vectorizer or HashingVectorizer()
+        self.index = VectorIndex(dim=self.vectorizer.dim)
+        self._doc_keys = set()
+
+    def __contains__(self, doc_key):
+        return doc_key in self._doc_keys
+
+    def add_document(self, doc_key, doc):
+        if doc_key in self._doc_keys:
+            return
+        document_index = embed_document(doc['digest'], self.vectorizer)
+        self.index.add(document_index.vectors, [
+            dict(meta, doc_key=doc_key, name=doc['name'], digest=doc['digest'], category=doc.get('category'))
+            for meta in document_index.metadata
+        ])
+        self._doc_keys.add(doc_key)
+
+    def remove_document(self, doc_key):
+        if doc_key in self._doc_keys:
+            self.index.remove(lambda meta: meta['doc_key'] != doc_key)
+            self._doc_keys.discard(doc_key)
+
+    def sync(self, documents):
+        for doc_key in [key for key in self._doc_keys if key not in documents]:
+            self.remove_document(doc_key)
+        for doc_key, doc in documents.items():
+            self.add_document(doc_key, doc)
+
+    def search(self, query, k=10, doc_keys=None, categories=None):
+        """Return up to k (chunk, score) pairs for one query string, best first"""
+        return self.search_many([query], k=k, doc_keys=doc_keys, categories=categories)[0]
+
+    def search_many(self, queries, k=10, doc_keys=None, categories=None):
+        row_mask = None
+        if doc_keys is not None or categories is not None:
+            row_mask = np.fromiter(
+                ((doc_keys is None or meta['doc_key'] in doc_keys) and
+                 (categories is None or meta['category'] in categories)
+                 for meta in self.index.metadata),
+                dtype=bool, count=len(self.index))
+        return self.index.search(self.vectorizer.transform(queries), k=k, row_mask=row_mask)
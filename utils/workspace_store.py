@@ -0,0 +1,364 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, time as time_of_day
+
+from utils.storage import data_dir
+
+# Shared workspace database; point several app servers at one file to share it between them
+IR_WORKSPACE_DB = os.getenv('IR_WORKSPACE_DB')
+# Most rows a list view loads at once; older history stays on disk until filtered for
+WORKSPACE_PAGE_SIZE = int(os.getenv('IR_WORKSPACE_PAGE_SIZE', 500))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meetings (
+    id TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    firm TEXT NOT NULL,
+    has_questions INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_meetings_date ON meetings (date);
+CREATE INDEX IF NOT EXISTS idx_meetings_firm_date ON meetings (firm, date);
+CREATE INDEX IF NOT EXISTS idx_meetings_questions_date ON meetings (has_questions, date);
+
+CREATE TABLE IF NOT EXISTS contacts (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    firm TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_contacts_name ON contacts (name);
+CREATE INDEX IF NOT EXISTS idx_contacts_firm ON contacts (firm);
+
+CREATE TABLE IF NOT EXISTS analysts (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    firm TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_analysts_name ON analysts (name);
+
+CREATE TABLE IF NOT EXISTS rating_changes (
+    id TEXT PRIMARY KEY,
+    analyst_id TEXT NOT NULL,
+    change_date TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_rating_changes_date ON rating_changes (change_date);
+CREATE INDEX IF NOT EXISTS idx_rating_changes_analyst_date ON rating_changes (analyst_id, change_date);
+
+CREATE TABLE IF NOT EXISTS calendar_events (
+    id TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_calendar_events_date ON calendar_events (date);
+
+CREATE TABLE IF NOT EXISTS emails (
+    id TEXT PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    category TEXT NOT NULL,
+    sender_type TEXT NOT NULL,
+    read INTEGER NOT NULL,
+    responded INTEGER NOT NULL,
+    flagged INTEGER NOT NULL,
+    response_time REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_emails_timestamp ON emails (timestamp);
+CREATE INDEX IF NOT EXISTS idx_emails_category_timestamp ON emails (category, timestamp);
+CREATE INDEX IF NOT EXISTS idx_emails_read_timestamp ON emails (read, timestamp);
+CREATE INDEX IF NOT EXISTS idx_emails_responded_timestamp ON emails (responded, timestamp);
+CREATE INDEX IF NOT EXISTS idx_emails_flagged_timestamp ON emails (flagged, timestamp);
+CREATE INDEX IF NOT EXISTS idx_emails_sender_type ON emails (sender_type);
+-- Covers the inbox totals so they never read the email bodies
+CREATE INDEX IF NOT EXISTS idx_emails_stats ON emails (read, responded, response_time);
+
+CREATE TABLE IF NOT EXISTS weekly_summaries (
+    company TEXT NOT NULL,
+    week_ending TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (company, week_ending)
+);
+
+CREATE TABLE IF NOT EXISTS quarterly_context (
+    company TEXT NOT NULL,
+    quarter TEXT NOT NULL,
+    fiscal_year TEXT NOT NULL,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (company, fiscal_year, quarter)
+);
+"""
+
+# Fields stored as ISO text and turned back into date/time objects on read
+TEMPORAL_FIELDS = {
+    'calendar_events': {'date': date.fromisoformat, 'time': time_of_day.fromisoformat},
+    'emails': {'timestamp': datetime.fromisoformat},
+}
+
+
+def _encode(value):
+    if isinstance(value, (date, datetime, time_of_day)):
+        return value.isoformat()
+    raise TypeError(f"Cannot store {type(value).__name__}")
+
+
+def _iso(value):
+    return value.isoformat() if isinstance(value, (date, datetime, time_of_day)) else value
+
+
+def _decode(table, data):
+    record = json.loads(data)
+    for field, parse in TEMPORAL_FIELDS.get(table, {}).items():
+        if record.get(field):
+            record[field] = parse(record[field])
+    return record
+
+
+def _email_columns(email):
+    return {
+        'id': email['id'],
+        'timestamp': _iso(email['timestamp']),
+        'category': email.get('category', 'Other'),
+        'sender_type': email.get('sender_type', 'Other'),
+        'read': int(bool(email.get('read'))),
+        'responded': int(bool(email.get('responded'))),
+        'flagged': int(bool(email.get('flagged'))),
+        'response_time': email.get('response_time'),
+    }
+
+
+class WorkspaceStore:
+    """Durable IR workspace data (CRM, analyst coverage, calendar, inbox, summaries) shared by every session.
+
+    Each record is kept whole as JSON next to the columns the views filter
+    and sort on, which are indexed, so lists are read a page at a time and
+    aggregates are computed in SQLite rather than in session memory. One
+    connection is shared by the process behind a lock; WAL mode keeps
+    readers from blocking on writes, including those of other processes
+    using the same file.
+    """
+
+    def __init__(self, db_path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        """Hold the lock and a write transaction, so a read-modify-write sees no concurrent writer"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _records(self, table, sql, params=()):
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [_decode(table, data) for (data,) in rows]
+
+    def _insert(self, table, columns, record):
+        """INSERT OR REPLACE a record; callers hold the lock"""
+        names = list(columns) + ['data']
+        values = list(columns.values()) + [json.dumps(record, default=_encode)]
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})", values)
+
+    def _put(self, table, columns, record):
+        with self._lock:
+            self._insert(table, columns, record)
+
+    def _count(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()[0]
+
+    # IR CRM
+
+    def meetings(self, limit=WORKSPACE_PAGE_SIZE, with_questions=False):
+        """Meetings newest first; with_questions keeps only those with questions recorded"""
+        where = "WHERE has_questions = 1 " if with_questions else ""
+        return self._records('meetings', f"SELECT data FROM meetings {where}ORDER BY date DESC LIMIT ?",
+                             (-1 if limit is None else limit,))
+
+    def meeting_count(self):
+        return self._count("SELECT COUNT(*) FROM meetings")
+
+    def add_meeting(self, meeting):
+        self._put('meetings', {'id': meeting['id'], 'date': _iso(meeting.get('date', '')),
+                               'firm': meeting.get('firm', ''), 'has_questions': int(bool(meeting.get('questions')))},
+                  meeting)
+
+    def contacts(self, limit=WORKSPACE_PAGE_SIZE):
+        return self._records('contacts', "SELECT data FROM contacts ORDER BY name LIMIT ?", (limit,))
+
+    def contact_count(self):
+        return self._count("SELECT COUNT(*) FROM contacts")
+
+    def add_contact(self, contact):
+        self._put('contacts', {'id': contact['id'], 'name': contact.get('name', ''), 'firm': contact.get('firm', '')},
+                  contact)
+
+    # Analyst coverage
+
+    def analysts(self):
+        """Every covering analyst, in the order they were added"""
+        return self._records('analysts', "SELECT data FROM analysts ORDER BY rowid")
+
+    def put_analyst(self, analyst):
+        self._put('analysts', {'id': analyst['id'], 'name': analyst['name'], 'firm': analyst['firm']}, analyst)
+
+    def delete_analyst(self, analyst_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM analysts WHERE id = ?", (analyst_id,))
+
+    def rating_changes(self, limit=WORKSPACE_PAGE_SIZE):
+        """Rating changes, most recent change date first"""
+        return self._records('rating_changes', "SELECT data FROM rating_changes ORDER BY change_date DESC LIMIT ?",
+                             (limit,))
+
+    def rating_change_count(self):
+        return self._count("SELECT COUNT(*) FROM rating_changes")
+
+    def record_rating_change(self, change):
+        """Store a rating change and move the analyst's current rating and target to it in one transaction"""
+        with self._transaction():
+            row = self._conn.execute("SELECT data FROM analysts WHERE id = ?", (change['analyst_id'],)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO rating_changes (id, analyst_id, change_date, data) VALUES (?, ?, ?, ?)",
+                (change['id'], change['analyst_id'], change['change_date'], json.dumps(change, default=_encode)))
+            if row is not None:
+                analyst = dict(json.loads(row[0]), current_rating=change['new_rating'],
+                               price_target=change['new_target'], last_updated=change['change_date'])
+                self._conn.execute("UPDATE analysts SET data = ? WHERE id = ?",
+                                   (json.dumps(analyst), change['analyst_id']))
+
+    # IR calendar and quarterly context
+
+    def calendar_events(self, start=None, end=None, limit=WORKSPACE_PAGE_SIZE):
+        """Events dated within [start, end] (either bound optional), soonest first"""
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("date >= ?")
+            params.append(_iso(start))
+        if end is not None:
+            clauses.append("date <= ?")
+            params.append(_iso(end))
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        return self._records('calendar_events', f"SELECT data FROM calendar_events {where}ORDER BY date LIMIT ?",
+                             params + [limit])
+
+    def calendar_event_count(self):
+        return self._count("SELECT COUNT(*) FROM calendar_events")
+
+    def add_calendar_event(self, event):
+        self._put('calendar_events', {'id': event['id'], 'date': _iso(event['date'])}, event)
+
+    def delete_calendar_event(self, event_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM calendar_events WHERE id = ?", (event_id,))
+
+    def quarterly_context(self, company, quarter, fiscal_year):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM quarterly_context WHERE company = ? AND fiscal_year = ? AND quarter = ?",
+                (company, fiscal_year, quarter)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_quarterly_context(self, company, quarter, fiscal_year, context):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO quarterly_context (company, quarter, fiscal_year, data, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (company, quarter, fiscal_year, json.dumps(context), time.time()))
+
+    # IR inbox
+
+    def emails(self, status="All", category="All", since=None, limit=WORKSPACE_PAGE_SIZE):
+        """Emails matching the inbox filters, newest first"""
+        clauses, params = [], []
+        status_clauses = {
+            "Unread": "read = 0",
+            "Read": "read = 1 AND responded = 0",
+            "Responded": "responded = 1",
+            "Flagged": "flagged = 1",
+        }
+        if status in status_clauses:
+            clauses.append(status_clauses[status])
+        if category != "All":
+            clauses.append("category = ?")
+            params.append(category)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(_iso(since))
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        return self._records('emails', f"SELECT data FROM emails {where}ORDER BY timestamp DESC LIMIT ?",
+                             params + [limit])
+
+    def add_email(self, email):
+        self._put('emails', _email_columns(email), email)
+
+    def update_email(self, email_id, **changes):
+        """Apply field changes to a stored email; returns the updated email or None if it is gone"""
+        with self._transaction():
+            row = self._conn.execute("SELECT data FROM emails WHERE id = ?", (email_id,)).fetchone()
+            if row is None:
+                return None
+            email = dict(_decode('emails', row[0]), **changes)
+            self._insert('emails', _email_columns(email), email)
+        return email
+
+    def email_stats(self):
+        """Inbox totals, average response time and counts by category and sender type"""
+        with self._lock:
+            total, responded, unread, avg_response_time = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(responded), 0), COALESCE(SUM(1 - read), 0), AVG(response_time) "
+                "FROM emails").fetchone()
+            by_category = dict(self._conn.execute("SELECT category, COUNT(*) FROM emails GROUP BY category"))
+            by_sender_type = dict(self._conn.execute("SELECT sender_type, COUNT(*) FROM emails GROUP BY sender_type"))
+        return {
+            'total_received': total,
+            'total_responded': responded,
+            'unread': unread,
+            'avg_response_time': avg_response_time or 0,
+            'by_category': by_category,
+            'by_sender_type': by_sender_type,
+        }
+
+    # Market updates
+
+    def weekly_summary(self, company, week_ending):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM weekly_summaries WHERE company = ? AND week_ending = ?",
+                                     (company, _iso(week_ending))).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_weekly_summary(self, company, week_ending, summary):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO weekly_summaries (company, week_ending, data) VALUES (?, ?, ?)",
+                (company, _iso(week_ending), json.dumps(summary)))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_workspace_store():
+    """Process-wide workspace store shared across sessions"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = WorkspaceStore(IR_WORKSPACE_DB or os.path.join(data_dir('workspace'), 'workspace.sqlite3'))
+        return _store
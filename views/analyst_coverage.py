@@ -2,6 +2,8 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 
+from utils.workspace_store import get_workspace_store
+
 def run():
     company_name = {} if 'company_name' not in st.session_state else st.session_state['company_name']
     selected_quarter = {} if 'selected_quarter' not in st.session_state else st.session_state['selected_quarter']
@@ -9,9 +11,8 @@ def run():
 
     st.header(f"Analyst Coverage - {company_name} {selected_quarter} FY{fiscal_year}")
 
-    # Initialize session state for analyst coverage if not exists
-    if 'analyst_coverage_data' not in st.session_state:
-        st.session_state.analyst_coverage_data = []
+    # Coverage and rating history live in the shared workspace store, not in the session
+    store = get_workspace_store()
 
     # Create tabs for different sections
     tab1, tab2, tab3 = st.tabs(["Analyst Directory", "Rating History", "Price Targets"])
@@ -56,15 +57,16 @@ def run():
                     "last_updated": datetime.now().strftime("%Y-%m-%d")
                 }
 
-                st.session_state.analyst_coverage_data.append(new_analyst)
+                store.put_analyst(new_analyst)
                 st.success(f"Added analyst: {analyst_name} from {firm_name}")
 
         # Display existing analysts
-        if st.session_state.analyst_coverage_data:
+        analysts = store.analysts()
+        if analysts:
             st.markdown("### Current Analyst Coverage")
 
             # Convert to DataFrame for display
-            analysts_df = pd.DataFrame(st.session_state.analyst_coverage_data)
+            analysts_df = pd.DataFrame(analysts)
             display_cols = ["name", "firm", "current_rating", "price_target", "last_updated"]
 
             if not analysts_df.empty:
@@ -77,12 +79,12 @@ def run():
                 # Allow user to select an analyst to view or edit
                 selected_analyst_idx = st.selectbox(
                     "Select analyst to view/edit details:",
-                    options=range(len(st.session_state.analyst_coverage_data)),
-                    format_func=lambda i: f"{st.session_state.analyst_coverage_data[i]['name']} ({st.session_state.analyst_coverage_data[i]['firm']})"
+                    options=range(len(analysts)),
+                    format_func=lambda i: f"{analysts[i]['name']} ({analysts[i]['firm']})"
                 )
 
                 # Show analyst details
-                selected_analyst = st.session_state.analyst_coverage_data[selected_analyst_idx]
+                selected_analyst = analysts[selected_analyst_idx]
 
                 with st.expander("Analyst Details", expanded=True):
                     col1, col2 = st.columns(2)
@@ -103,7 +105,7 @@ def run():
 
                     # Delete button
                     if st.button("Delete Analyst"):
-                        st.session_state.analyst_coverage_data.pop(selected_analyst_idx)
+                        store.delete_analyst(selected_analyst['id'])
                         st.success(f"Deleted analyst: {selected_analyst['name']}")
                         st.rerun()
         else:
@@ -113,18 +115,14 @@ def run():
     with tab2:
         st.subheader("Rating History")
 
-        # Initialize rating history if not exists
-        if 'rating_history' not in st.session_state:
-            st.session_state.rating_history = []
-
         # Form to add a rating change
         with st.form("add_rating_change"):
             col1, col2 = st.columns(2)
 
             # Get list of analysts
             analyst_options = []
-            if st.session_state.analyst_coverage_data:
-                analyst_options = [(a["id"], f"{a['name']} ({a['firm']})") for a in st.session_state.analyst_coverage_data]
+            if analysts:
+                analyst_options = [(a["id"], f"{a['name']} ({a['firm']})") for a in analysts]
 
             with col1:
                 selected_analyst_id = st.selectbox(
@@ -158,11 +156,11 @@ def run():
             submit_button = st.form_submit_button("Add Rating Change")
             if submit_button and selected_analyst_id:
                 # Find analyst name and firm
-                analyst_info = next((a for a in st.session_state.analyst_coverage_data if a["id"] == selected_analyst_id), None)
+                analyst_info = next((a for a in analysts if a["id"] == selected_analyst_id), None)
 
                 if analyst_info:
                     new_rating_change = {
-                        "id": f"rating_{datetime.now().strftime('%Y%m%d%H%M%S')}",
+                        "id": f"rating_{selected_analyst_id}_{datetime.now().strftime('%Y%m%d%H%M%S%f')}",
                         "analyst_id": selected_analyst_id,
                         "analyst_name": analyst_info["name"],
                         "firm": analyst_info["firm"],
@@ -174,23 +172,21 @@ def run():
                         "notes": notes
                     }
 
-                    st.session_state.rating_history.append(new_rating_change)
-
-                    # Update the analyst's current rating and price target
-                    for analyst in st.session_state.analyst_coverage_data:
-                        if analyst["id"] == selected_analyst_id:
-                            analyst["current_rating"] = new_rating
-                            analyst["price_target"] = new_target
-                            analyst["last_updated"] = change_date.strftime("%Y-%m-%d")
+                    # Also moves the analyst's current rating and price target to the new ones
+                    store.record_rating_change(new_rating_change)
 
                     st.success(f"Added rating change for {analyst_info['name']}")
 
         # Display rating history
-        if st.session_state.rating_history:
+        rating_history = store.rating_changes()
+        if rating_history:
             st.markdown("### Rating Change History")
+            rating_change_count = store.rating_change_count()
+            if rating_change_count > len(rating_history):
+                st.caption(f"Showing the {len(rating_history)} most recent of {rating_change_count} rating changes")
 
             # Convert to DataFrame for display
-            history_df = pd.DataFrame(st.session_state.rating_history)
+            history_df = pd.DataFrame(rating_history)
             display_cols = ["change_date", "analyst_name", "firm", "previous_rating", "new_rating", "previous_target", "new_target"]
 
             # Sort by date (newest first)
@@ -209,8 +205,9 @@ def run():
         st.subheader("Price Target Trends")
 
         # Display price target statistics
-        if st.session_state.analyst_coverage_data:
-            analysts_df = pd.DataFrame(st.session_state.analyst_coverage_data)
+        analysts = store.analysts()
+        if analysts:
+            analysts_df = pd.DataFrame(analysts)
 
             if not analysts_df.empty and "price_target" in analysts_df.columns:
                 # Calculate statistics
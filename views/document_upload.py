@@ -1,9 +1,15 @@
 # views/document_upload.py
 import streamlit as st
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import pandas as pd
 import uuid
-from utils.document_processing import extract_text_from_pdf, extract_text_from_docx
+from utils.document_processing import extract_pages, is_extraction_error
+from utils.document_store import get_document_store, read_document
+from utils.extraction_cache import hash_file_bytes
+from utils.search_index import BM25Index
+from utils.transcript_store import get_transcript_store
+from utils.vector_index import DocumentVectorIndex
+from utils.workspace_store import get_workspace_store
 
 def run():
     company_name = {} if 'company_name' not in st.session_state else st.session_state['company_name']
@@ -12,16 +18,21 @@ def run():
 
     st.header(f"Setup / Quarterly Context - {company_name} {selected_quarter} FY{fiscal_year}")
 
-    # Initialize session state variables for each tab
-    if 'quarterly_context' not in st.session_state:
-        st.session_state.quarterly_context = {
+    store = get_workspace_store()
+
+    # Quarterly context is saved per company and quarter; the session edits a copy, reloaded when either changes
+    context_period = (str(company_name), str(selected_quarter), str(fiscal_year))
+    if st.session_state.get('quarterly_context_period') != context_period:
+        st.session_state.quarterly_context = store.quarterly_context(*context_period) or {
             "key_highlights": "",
             "business_challenges": "",
             "product_updates": "",
             "financial_metrics": "",
             "outlook": ""
         }
+        st.session_state.quarterly_context_period = context_period
 
+    # Initialize session state variables for each tab
     if 'recommended_themes' not in st.session_state:
         st.session_state.recommended_themes = [
             {"id": "theme1", "title": "Revenue Growth Acceleration", "description": "Focus on how strategic initiatives are accelerating revenue growth across key markets.", "selected": False},
@@ -40,8 +51,11 @@ def run():
             "market_research": {}
         }
 
-    if 'calendar_events' not in st.session_state:
-        st.session_state.calendar_events = []
+    if 'search_index' not in st.session_state:
+        st.session_state.search_index = BM25Index()
+
+    if 'vector_index' not in st.session_state:
+        st.session_state.vector_index = DocumentVectorIndex()
 
     if 'calendar_date_range' not in st.session_state:
         # Default to current quarter
@@ -98,6 +112,7 @@ def run():
 
         # Save button for quarterly context
         if st.button("Save Quarterly Context"):
+            store.put_quarterly_context(*context_period, st.session_state.quarterly_context)
             st.success("Quarterly context saved successfully!")
 
         # AI Recommended Themes Section
@@ -259,7 +274,7 @@ def run():
                     "description": event_description,
                     "location": event_location
                 }
-                st.session_state.calendar_events.append(new_event)
+                store.add_calendar_event(new_event)
                 st.success(f"Added event: {event_title}")
             else:
                 st.error("Event title and date are required.")
@@ -268,22 +283,16 @@ def run():
         st.markdown("---")
         st.subheader("IR Calendar")
 
-        # Convert events to dataframe for display
-        if st.session_state.calendar_events:
-            events_df = pd.DataFrame(st.session_state.calendar_events)
-
-            # Filter events by date range
+        # Only events in the selected date range are read from the store
+        has_events = store.calendar_event_count() > 0
+        if has_events:
             start_date_naive = st.session_state.calendar_date_range["start_date"].date()
             end_date_naive = st.session_state.calendar_date_range["end_date"].date()
+            range_events = store.calendar_events(start_date_naive, end_date_naive)
 
-            filtered_events = events_df[
-                (events_df["date"] >= start_date_naive) &
-                (events_df["date"] <= end_date_naive)
-            ]
-
-            if not filtered_events.empty:
-                # Sort events by date
-                filtered_events = filtered_events.sort_values(by="date")
+            if range_events:
+                # Convert events to dataframe for display, already sorted by date
+                filtered_events = pd.DataFrame(range_events)
 
                 # Display events in a table
                 st.dataframe(
@@ -300,7 +309,7 @@ def run():
                 )
 
                 if selected_event_id:
-                    selected_event = next((e for e in st.session_state.calendar_events if e["id"] == selected_event_id), None)
+                    selected_event = next((e for e in range_events if e["id"] == selected_event_id), None)
                     if selected_event:
                         st.markdown("---")
                         st.subheader("Event Details")
@@ -311,7 +320,7 @@ def run():
                         st.write(f"**Description:** {selected_event['description']}")
 
                         if st.button("Delete Event"):
-                            st.session_state.calendar_events = [e for e in st.session_state.calendar_events if e["id"] != selected_event_id]
+                            store.delete_calendar_event(selected_event_id)
                             st.success(f"Deleted event: {selected_event['title']}")
                             st.rerun()
             else:
@@ -323,7 +332,7 @@ def run():
         st.markdown("---")
         st.subheader("Monthly Calendar View")
 
-        if st.session_state.calendar_events:
+        if has_events:
             # Get the selected month and year
             selected_month = st.selectbox(
                 "Select Month",
@@ -338,11 +347,10 @@ def run():
                 index=1  # Default to current year
             )
 
-            # Filter events for the selected month and year
-            month_events = [
-                e for e in st.session_state.calendar_events
-                if e["date"].month == selected_month and e["date"].year == selected_year
-            ]
+            # Events for the selected month and year
+            month_start = date(selected_year, selected_month, 1)
+            month_end = date(selected_year + selected_month // 12, selected_month % 12 + 1, 1) - timedelta(days=1)
+            month_events = store.calendar_events(month_start, month_end)
 
             # Create a calendar view
             if month_events:
@@ -412,26 +420,48 @@ def process_uploaded_files(uploaded_files, category_key):
     """Process and store uploaded files by category"""
     if uploaded_files:
         for file in uploaded_files:
-            file_key = f"{file.name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            file_bytes = file.getvalue()
+            # Key on content so reruns and re-uploads of the same file are no-ops. The category is part of the
+            # key because uploaded_files and the indexes are shared by all categories: the same file in two
+            # categories gets two handles, and deleting one leaves the other in place
+            digest = hash_file_bytes(file_bytes)
+            file_key = f"{category_key}:{file.name}_{digest[:16]}"
 
             if file_key not in st.session_state.document_categories[category_key]:
-                file_bytes = file.read()
-                file_type = file.name.split('.')[-1].lower()
-
-                if file_type == 'pdf':
-                    text_content = extract_text_from_pdf(file_bytes)
-                elif file_type == 'docx':
-                    text_content = extract_text_from_docx(file_bytes)
-                elif file_type == 'txt':
-                    text_content = file_bytes.decode('utf-8')
-                else:
-                    text_content = f"File uploaded: {file.name} (Content extraction not supported for {file_type} files)"
-
-                st.session_state.document_categories[category_key][file_key] = {
+                store = get_document_store()
+
+                # Another session may already have stored this exact document
+                if not store.has(digest):
+                    progress_bar = st.progress(0.0, text=f"Extracting {file.name}...")
+
+                    def report_progress(pages_done, page_count):
+                        progress_bar.progress(pages_done / page_count,
+                                              text=f"Extracting {file.name}: page {pages_done} of {page_count}")
+
+                    pages = extract_pages(file.name, file_bytes, digest=digest, progress_callback=report_progress)
+                    progress_bar.empty()
+
+                    if is_extraction_error(pages):
+                        st.error(pages[0])
+                        continue
+                    store.put(digest, pages)
+
+                # Scan the lines once so transcript features split turns from the table, not the text
+                get_transcript_store().lines(digest)
+
+                # Sessions keep only a handle; the text itself lives in the shared store
+                document_handle = {
                     'name': file.name,
-                    'content': text_content,
+                    'digest': digest,
+                    'category': category_key,
+                    'size': store.size(digest),
+                    'page_count': store.page_count(digest),
                     'upload_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 }
+                st.session_state.document_categories[category_key][file_key] = document_handle
+                st.session_state.uploaded_files[file_key] = document_handle
+                st.session_state.search_index.add_document(file_key, document_handle)
+                st.session_state.vector_index.add_document(file_key, document_handle)
 
                 st.success(f"Successfully uploaded: {file.name}")
 
@@ -454,10 +484,13 @@ def display_category_documents(category_key):
 
             if view_button:
                 with st.expander(f"Content of {file_data['name']}", expanded=True):
-                    st.text_area("Document Content", file_data['content'], height=300, key=f"content_{file_key}")
+                    st.text_area("Document Content", read_document(file_data), height=300, key=f"content_{file_key}")
 
             if delete_button:
                 del st.session_state.document_categories[category_key][file_key]
+                st.session_state.uploaded_files.pop(file_key, None)
+                st.session_state.search_index.remove_document(file_key)
+                st.session_state.vector_index.remove_document(file_key)
                 st.success(f"Deleted: {file_data['name']}")
                 st.rerun()
 
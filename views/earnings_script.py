@@ -1,9 +1,13 @@
+import time
+from concurrent.futures import as_completed
 from datetime import datetime
 
 import streamlit as st
 import pandas as pd
 
-from utils.openai_client import generate_earnings_template, generate_questions
+from utils.openai_client import (TEMPLATE_SECTIONS, assemble_script, clean_template, generate_earnings_template,
+                                 generate_questions, generate_script_sections, stream_earnings_template)
+from views import live_transcript
 
 
 def run():
@@ -178,61 +182,62 @@ def run():
     with tab1:
         st.subheader("Generate Template")
         if st.session_state.uploaded_files:
+            regenerate_template = st.checkbox("Regenerate (ignore cached result)", key="regenerate_template")
+            stream_template = st.checkbox("Stream the template as it is written", value=True, key="stream_template")
+            parallel_sections = st.checkbox("Generate sections in parallel", key="parallel_sections")
+            summarize_template = st.checkbox("Summarize full earnings calls (slower the first time, cached after)",
+                                             key="summarize_template")
             if st.button("Generate Earnings Call Template", key="generate_template"):
-                with st.spinner(f"Analyzing documents and generating template for {company_name}..."):
-                    # Include script context and metrics in the template generation
-                    context_info = ""
-                    if hasattr(st.session_state, 'script_context'):
-                        context_info = f"""
-                        Script Context:
-                        Tone: {st.session_state.script_context.get('tone', '')}
-                        Strategic Initiatives: {st.session_state.script_context.get('initiatives', '')}
-                        Additional Considerations: {st.session_state.script_context.get('considerations', '')}
-                        """
-
-                    # Add disclosure metrics
-                    if hasattr(st.session_state, 'disclosure_metrics') and st.session_state.disclosure_metrics:
-                        context_info += "\n\nDisclosure Metrics:\n"
-                        for metric in st.session_state.disclosure_metrics:
-                            context_info += f"- {metric['name']}: {metric['value']} ({metric['context']})\n"
-
-                    # Add financial disclosures
-                    if hasattr(st.session_state, 'financial_disclosures'):
-                        context_info += "\n\nFinancial Disclosures:\n"
-
-                        # Financial Highlights
-                        if st.session_state.financial_disclosures.get('financial_highlights'):
-                            context_info += "\nFinancial Highlights:\n"
-                            for metric in st.session_state.financial_disclosures['financial_highlights']:
-                                context_info += f"- {metric['name']}: {metric['value']} ({metric['context']})\n"
-
-                        # Non-GAAP Metrics
-                        if st.session_state.financial_disclosures.get('non_gaap_metrics'):
-                            context_info += "\nNon-GAAP Metrics:\n"
-                            for metric in st.session_state.financial_disclosures['non_gaap_metrics']:
-                                context_info += f"- {metric['name']}: {metric['value']} ({metric['context']})\n"
-
-                        # CFO Metrics
-                        if st.session_state.financial_disclosures.get('cfo_metrics'):
-                            context_info += "\nCFO Metrics:\n"
-                            for metric in st.session_state.financial_disclosures['cfo_metrics']:
-                                context_info += f"- {metric['name']}: {metric['value']} ({metric['context']})\n"
-
-                        # Guidance
-                        if st.session_state.financial_disclosures.get('guidance'):
-                            context_info += "\nGuidance:\n"
-                            for metric in st.session_state.financial_disclosures['guidance']:
-                                context_info += f"- {metric['name']}: {metric['value']} ({metric['context']})\n"
-
-                    generated_template = generate_earnings_template(
-                        uploaded_documents=st.session_state.uploaded_files,
-                        company_name=company_name,
-                        quarter=selected_quarter,
-                        fiscal_year=fiscal_year,
-                        context_info=context_info
+                # Include script context and metrics in the template generation
+                context_info = build_context_info()
+                template_args = dict(
+                    uploaded_documents=st.session_state.uploaded_files,
+                    company_name=company_name,
+                    quarter=selected_quarter,
+                    fiscal_year=fiscal_year,
+                    context_info=context_info,
+                    bypass_cache=regenerate_template,
+                    summarize=summarize_template
+                )
+
+                if parallel_sections:
+                    generate_template_sections(company_name, selected_quarter, fiscal_year,
+                                               bypass_cache=regenerate_template, summarize=summarize_template)
+                elif stream_template:
+                    try:
+                        with st.spinner("Preparing document context..."):
+                            template_stream = stream_earnings_template(**template_args)
+                        with st.container(height=600):
+                            st.write_stream(template_stream)
+                        st.session_state.editable_script = clean_template(template_stream.text)
+                        source = "from cache" if template_stream.cached else "streamed"
+                        st.success(f"Template generated successfully! ({source}: first token after "
+                                   f"{template_stream.ttft or 0:.1f}s, complete in {template_stream.elapsed:.1f}s)")
+                    except Exception as e:
+                        st.error(f"Error generating template: {str(e)}")
+                else:
+                    with st.spinner(f"Analyzing documents and generating template for {company_name}..."):
+                        generated_template = generate_earnings_template(**template_args)
+                        st.session_state.editable_script = generated_template
+                        st.success("Template generated successfully!")
+
+            # Sections from a parallel run can be regenerated one at a time
+            if st.session_state.get('script_sections'):
+                col1, col2 = st.columns([3, 1])
+                with col1:
+                    section_to_regenerate = st.selectbox(
+                        "Regenerate a single section:",
+                        options=[section['heading'] for section in TEMPLATE_SECTIONS
+                                 if section['heading'] in st.session_state.script_sections],
+                        key="section_to_regenerate"
                     )
-                    st.session_state.editable_script = generated_template
-                    st.success("Template generated successfully!")
+                with col2:
+                    if st.button("Regenerate Section", key="regenerate_section"):
+                        generate_template_sections(company_name, selected_quarter, fiscal_year,
+                                                   headings=[section_to_regenerate], bypass_cache=True,
+                                                   summarize=summarize_template)
+                st.caption("Regenerating a section reassembles the script from the generated sections, "
+                           "replacing unsaved edits.")
 
             st.markdown("---")
 
@@ -254,9 +259,14 @@ def run():
     with tab2:
         st.subheader("Q&A Management")
         if st.session_state.uploaded_files:
+            regenerate_questions = st.checkbox("Regenerate (ignore cached result)", key="regenerate_questions")
+            summarize_questions = st.checkbox("Summarize full documents (slower the first time, cached after)",
+                                              key="summarize_questions")
             if st.button("Generate Questions"):
                 with st.spinner("Analyzing documents and generating questions..."):
-                    generated_questions = generate_questions(st.session_state.uploaded_files)
+                    generated_questions = generate_questions(st.session_state.uploaded_files,
+                                                             bypass_cache=regenerate_questions,
+                                                             summarize=summarize_questions)
                     st.session_state.questions = generated_questions
                     st.success("Questions generated successfully!")
 
@@ -273,7 +283,8 @@ def run():
     with tab3:
         st.subheader("Live Transcript")
         if st.session_state.editable_script:
-            st.markdown(st.session_state.editable_script)
+            with st.expander("Prepared Script"):
+                st.markdown(st.session_state.editable_script)
             if st.button("Export Transcript"):
                 st.download_button(
                     label="Download Transcript",
@@ -283,6 +294,93 @@ def run():
                 )
         else:
             st.info("Generate a template first to view the live transcript")
+        live_transcript.run()
+
+
+def generate_template_sections(company_name, quarter, fiscal_year, headings=None, bypass_cache=False, summarize=False):
+    """Generate script sections concurrently, showing each as it completes, then reassemble the script"""
+    started = time.perf_counter()
+    futures = generate_script_sections(
+        st.session_state.uploaded_files, company_name, quarter, fiscal_year,
+        script_context=st.session_state.get('script_context'),
+        disclosure_metrics=st.session_state.get('disclosure_metrics'),
+        financial_disclosures=st.session_state.get('financial_disclosures'),
+        headings=headings,
+        bypass_cache=bypass_cache,
+        summarize=summarize
+    )
+
+    placeholders = {}
+    for heading in futures:
+        placeholders[heading] = st.empty()
+        placeholders[heading].info(f"Generating {heading}...")
+
+    if headings is None or 'script_sections' not in st.session_state:
+        st.session_state.script_sections = {}
+    failed = []
+    headings_by_future = {future: heading for heading, future in futures.items()}
+    for future in as_completed(headings_by_future):
+        heading = headings_by_future[future]
+        try:
+            st.session_state.script_sections[heading] = clean_template(future.result().choices[0].message.content)
+            placeholders[heading].success(f"{heading} ready ({time.perf_counter() - started:.1f}s)")
+        except Exception as e:
+            failed.append(heading)
+            placeholders[heading].error(f"Error generating {heading}: {str(e)}")
+
+    st.session_state.editable_script = assemble_script(st.session_state.script_sections)
+    if failed:
+        st.warning(f"Script assembled without: {', '.join(failed)}. Regenerate those sections to fill them in.")
+    else:
+        st.success(f"Template generated successfully! ({len(futures)} section(s) in {time.perf_counter() - started:.1f}s)")
+
+
+def build_context_info():
+    """Script context, disclosure metrics and financial disclosures as prompt text"""
+    context_info = ""
+    if hasattr(st.session_state, 'script_context'):
+        context_info = f"""
+        Script Context:
+        Tone: {st.session_state.script_context.get('tone', '')}
+        Strategic Initiatives: {st.session_state.script_context.get('initiatives', '')}
+        Additional Considerations: {st.session_state.script_context.get('considerations', '')}
+        """
+
+    # Add disclosure metrics
+    if hasattr(st.session_state, 'disclosure_metrics') and st.session_state.disclosure_metrics:
+        context_info += "\n\nDisclosure Metrics:\n"
+        for metric in st.session_state.disclosure_metrics:
+            context_info += f"- {metric['name']}: {metric['value']} ({metric['context']})\n"
+
+    # Add financial disclosures
+    if hasattr(st.session_state, 'financial_disclosures'):
+        context_info += "\n\nFinancial Disclosures:\n"
+
+        # Financial Highlights
+        if st.session_state.financial_disclosures.get('financial_highlights'):
+            context_info += "\nFinancial Highlights:\n"
+            for metric in st.session_state.financial_disclosures['financial_highlights']:
+                context_info += f"- {metric['name']}: {metric['value']} ({metric['context']})\n"
+
+        # Non-GAAP Metrics
+        if st.session_state.financial_disclosures.get('non_gaap_metrics'):
+            context_info += "\nNon-GAAP Metrics:\n"
+            for metric in st.session_state.financial_disclosures['non_gaap_metrics']:
+                context_info += f"- {metric['name']}: {metric['value']} ({metric['context']})\n"
+
+        # CFO Metrics
+        if st.session_state.financial_disclosures.get('cfo_metrics'):
+            context_info += "\nCFO Metrics:\n"
+            for metric in st.session_state.financial_disclosures['cfo_metrics']:
+                context_info += f"- {metric['name']}: {metric['value']} ({metric['context']})\n"
+
+        # Guidance
+        if st.session_state.financial_disclosures.get('guidance'):
+            context_info += "\nGuidance:\n"
+            for metric in st.session_state.financial_disclosures['guidance']:
+                context_info += f"- {metric['name']}: {metric['value']} ({metric['context']})\n"
+
+    return context_info
 
 
 def handle_financial_section(section_key, section_title, description):
@@ -4,6 +4,8 @@ from datetime import datetime, timedelta
 import time
 import random
 
+from utils.workspace_store import get_workspace_store
+
 def run():
     company_name = {} if 'company_name' not in st.session_state else st.session_state['company_name']
     selected_quarter = {} if 'selected_quarter' not in st.session_state else st.session_state['selected_quarter']
@@ -11,26 +13,7 @@ def run():
 
     st.header(f"Shareholder Communications - {company_name}")
 
-    # Initialize session states for IR communications
-    if 'ir_emails' not in st.session_state:
-        # Sample email data for demonstration
-        st.session_state.ir_emails = generate_sample_emails()
-
-    # Initialize email stats with default values
-    if 'ir_email_stats' not in st.session_state:
-        st.session_state.ir_email_stats = {
-            'total_received': 0,
-            'total_responded': 0,
-            'avg_response_time': 0,
-            'by_category': {},
-            'by_sender_type': {}
-        }
-
-    # Make sure we have emails before updating stats
-    if st.session_state.ir_emails:
-        # Update stats
-        update_email_stats()
-
+    # Emails live in the shared workspace store; the inbox reads only what its filters select
     if 'ir_chatbot_conversations' not in st.session_state:
         st.session_state.ir_chatbot_conversations = []
 
@@ -78,7 +61,6 @@ def run():
 
             # Apply filters to emails
             filtered_emails = filter_emails(
-                st.session_state.ir_emails, 
                 status=filter_status,
                 category=filter_category,
                 time_period=filter_time
@@ -266,80 +248,10 @@ def generate_sample_emails():
     return sample_emails
 
 
-def update_email_stats():
-    """Update email statistics based on current emails"""
-    # Initialize default stats
-    default_stats = {
-        'total_received': 0,
-        'total_responded': 0,
-        'avg_response_time': 0,
-        'by_category': {},
-        'by_sender_type': {}
-    }
-
-    # If ir_email_stats doesn't exist, create it with defaults
-    if 'ir_email_stats' not in st.session_state:
-        st.session_state.ir_email_stats = default_stats.copy()
-
-    # Check if emails exist
-    if 'ir_emails' not in st.session_state or not st.session_state.ir_emails:
-        st.session_state.ir_email_stats = default_stats.copy()
-        return
-
-    try:
-        emails = st.session_state.ir_emails
-
-        # Basic stats
-        total_received = len(emails)
-        total_responded = sum(1 for email in emails if email.get('responded', False))
-
-        # Calculate average response time
-        response_times = [email.get('response_time') for email in emails 
-                         if email.get('response_time') is not None]
-        avg_response_time = sum(response_times) / len(response_times) if response_times else 0
-
-        # Stats by category
-        categories = {}
-        for email in emails:
-            category = email.get('category', 'Other')
-            if category not in categories:
-                categories[category] = 0
-            categories[category] += 1
-
-        # Stats by sender type
-        sender_types = {}
-        for email in emails:
-            sender_type = email.get('sender_type', 'Other')
-            if sender_type not in sender_types:
-                sender_types[sender_type] = 0
-            sender_types[sender_type] += 1
-
-        # Update stats in session state
-        st.session_state.ir_email_stats = {
-            'total_received': total_received,
-            'total_responded': total_responded,
-            'avg_response_time': avg_response_time,
-            'by_category': categories,
-            'by_sender_type': sender_types
-        }
-    except Exception:
-        # If there's an error, use default values
-        st.session_state.ir_email_stats = default_stats.copy()
-
-
 def display_email_stats():
     """Display IR email statistics dashboard"""
-    # Check if stats exist and create default if not
-    if 'ir_email_stats' not in st.session_state or not st.session_state.ir_email_stats:
-        st.session_state.ir_email_stats = {
-            'total_received': 0,
-            'total_responded': 0,
-            'avg_response_time': 0,
-            'by_category': {},
-            'by_sender_type': {}
-        }
-
-    stats = st.session_state.ir_email_stats
+    # Aggregated in SQLite, so the dashboard never loads the whole inbox
+    stats = get_workspace_store().email_stats()
 
     # Main metrics with error handling
     col1, col2, col3, col4 = st.columns(4)
@@ -359,50 +271,23 @@ def display_email_stats():
         st.metric("Avg Response Time", f"{avg_time:.1f} hours")
 
     with col4:
-        if 'ir_emails' in st.session_state:
-            unread_count = sum(1 for email in st.session_state.ir_emails if not email.get('read', False))
-        else:
-            unread_count = 0
-        st.metric("Unread Emails", unread_count)
+        st.metric("Unread Emails", stats.get('unread', 0))
 
 
-def filter_emails(emails, status="All", category="All", time_period="All Time"):
-    """Filter emails based on specified criteria"""
+def filter_emails(status="All", category="All", time_period="All Time"):
+    """Emails matching the specified criteria, newest first, filtered by the workspace store's indexes"""
     try:
-        if not emails:
-            return []
-
-        filtered = emails.copy()
-
-        # Apply status filter
-        if status != "All":
-            if status == "Unread":
-                filtered = [e for e in filtered if not e.get('read', False)]
-            elif status == "Read":
-                filtered = [e for e in filtered if e.get('read', False) and not e.get('responded', False)]
-            elif status == "Responded":
-                filtered = [e for e in filtered if e.get('responded', False)]
-            elif status == "Flagged":
-                filtered = [e for e in filtered if e.get('flagged', False)]
-
-        # Apply category filter
-        if category != "All":
-            filtered = [e for e in filtered if e.get('category', '') == category]
-
         # Apply time period filter
         now = datetime.now()
-        if time_period != "All Time":
-            if time_period == "Today":
-                today = now.date()
-                filtered = [e for e in filtered if 'timestamp' in e and e['timestamp'].date() == today]
-            elif time_period == "This Week":
-                week_start = (now - timedelta(days=now.weekday())).date()
-                filtered = [e for e in filtered if 'timestamp' in e and e['timestamp'].date() >= week_start]
-            elif time_period == "This Month":
-                month_start = datetime(now.year, now.month, 1).date()
-                filtered = [e for e in filtered if 'timestamp' in e and e['timestamp'].date() >= month_start]
-
-        return filtered
+        since = None
+        if time_period == "Today":
+            since = now.date()
+        elif time_period == "This Week":
+            since = (now - timedelta(days=now.weekday())).date()
+        elif time_period == "This Month":
+            since = datetime(now.year, now.month, 1).date()
+
+        return get_workspace_store().emails(status=status, category=category, since=since)
     except Exception:
         # If filtering fails, return empty list
         return []
@@ -455,9 +340,7 @@ def display_email_list(emails):
                     if selected_email:
                         # Mark as read if it wasn't already
                         if not selected_email.get('read', False):
-                            for email in st.session_state.ir_emails:
-                                if email['id'] == selected_email_id:
-                                    email['read'] = True
+                            get_workspace_store().update_email(selected_email_id, read=True)
 
                         # Display email details
                         st.markdown(f"**From:** {selected_email.get('sender_name', 'Unknown')} ({selected_email.get('sender_email', 'Unknown')})")
@@ -485,11 +368,11 @@ def display_email_list(emails):
                         with col1:
                             if st.button("Flag/Unflag", key=f"flag_{selected_email_id}"):
                                 # Toggle flag status
-                                for email in st.session_state.ir_emails:
-                                    if email['id'] == selected_email_id:
-                                        email['flagged'] = not email.get('flagged', False)
-                                        flag_status = "flagged" if email['flagged'] else "unflagged"
-                                        st.success(f"Email {flag_status}")
+                                email = get_workspace_store().update_email(
+                                    selected_email_id, flagged=not selected_email.get('flagged', False))
+                                if email is not None:
+                                    flag_status = "flagged" if email['flagged'] else "unflagged"
+                                    st.success(f"Email {flag_status}")
 
                         # Response section
                         if not selected_email.get('responded', False):
@@ -528,16 +411,12 @@ def display_email_list(emails):
                                     # In a real app, this would send the email
 
                                     # Mark as responded
-                                    for email in st.session_state.ir_emails:
-                                        if email['id'] == selected_email_id:
-                                            email['responded'] = True
-                                            if 'timestamp' in email:
-                                                email['response_time'] = (datetime.now() - email['timestamp']).total_seconds() / 3600  # hours
-                                            else:
-                                                email['response_time'] = 0
-
-                                    # Update stats
-                                    update_email_stats()
+                                    if 'timestamp' in selected_email:
+                                        response_time = (datetime.now() - selected_email['timestamp']).total_seconds() / 3600  # hours
+                                    else:
+                                        response_time = 0
+                                    get_workspace_store().update_email(selected_email_id, responded=True,
+                                                                       response_time=response_time)
 
                                     st.success("Response sent successfully!")
                                     st.session_state.current_response = ""  # Clear current response
@@ -4,14 +4,15 @@ from datetime import datetime, timedelta
 import uuid
 import random
 
+from utils.workspace_store import get_workspace_store
+
 def run():
     company_name = {} if 'company_name' not in st.session_state else st.session_state['company_name']
 
     st.header(f"IR CRM - {company_name}")
 
-    # Initialize session state variables
-    if 'ir_meetings' not in st.session_state:
-        st.session_state.ir_meetings = generate_sample_data()
+    # Meetings and contacts live in the shared workspace store, not in the session
+    store = get_workspace_store()
 
     # Create tabs
     tab1, tab2 = st.tabs(["Meetings", "Contacts"])
@@ -24,9 +25,13 @@ def run():
 
         # Meeting List Tab
         with meeting_tabs[0]:
-            meetings = st.session_state.ir_meetings.get('meetings', [])
+            meetings = store.meetings()
 
             if meetings:
+                meeting_count = store.meeting_count()
+                if meeting_count > len(meetings):
+                    st.caption(f"Showing the {len(meetings)} most recent of {meeting_count} meetings")
+
                 # Create a dataframe for display
                 meetings_df = pd.DataFrame([
                     {
@@ -117,11 +122,7 @@ def run():
                         'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                     }
 
-                    # Add to session state
-                    if 'meetings' not in st.session_state.ir_meetings:
-                        st.session_state.ir_meetings['meetings'] = []
-
-                    st.session_state.ir_meetings['meetings'].append(new_meeting)
+                    store.add_meeting(new_meeting)
                     st.success("Meeting added successfully!")
 
     # Tab 2: Contacts
@@ -132,9 +133,13 @@ def run():
 
         # Contact List Tab
         with contact_tabs[0]:
-            contacts = st.session_state.ir_meetings.get('contacts', [])
+            contacts = store.contacts()
 
             if contacts:
+                contact_count = store.contact_count()
+                if contact_count > len(contacts):
+                    st.caption(f"Showing {len(contacts)} of {contact_count} contacts")
+
                 # Create a dataframe for display
                 contacts_df = pd.DataFrame([
                     {
@@ -213,11 +218,7 @@ def run():
                         'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                     }
 
-                    # Add to session state
-                    if 'contacts' not in st.session_state.ir_meetings:
-                        st.session_state.ir_meetings['contacts'] = []
-
-                    st.session_state.ir_meetings['contacts'].append(new_contact)
+                    store.add_contact(new_contact)
                     st.success("Contact added successfully!")
 
 
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+
+import streamlit as st
+import pandas as pd
+
+from utils.live_matcher import (AnswerIndex, LiveFeed, LiveQuestionTracker, get_live_feed, read_socket,
+                                start_live_feed, stop_live_feed, tail_file)
+from utils.script_aligner import REORDERED, SKIPPED, STATUS_STYLES, ScriptAligner
+from utils.storage import data_dir
+from utils.transcript_parser import parse_speaker_list
+
+LIVE_REFRESH_SECONDS = 0.5
+DEFAULT_LIVE_PORT = 8766
+DEFAULT_LIVE_FILE = 'transcript.txt'
+
+
+def run():
+    st.markdown("### Answer Bank")
+    st.caption("Prepared questions and answers matched against the live call. Generated questions are included "
+               "until you save your own bank.")
+    entries = answer_bank_entries()
+    edited = st.data_editor(
+        pd.DataFrame(entries, columns=['category', 'question', 'answer']),
+        num_rows="dynamic",
+        use_container_width=True,
+        hide_index=True,
+        key="answer_bank_editor"
+    )
+    if st.button("Save Answer Bank"):
+        saved = [{key: str(value or '') for key, value in row.items()}
+                 for row in edited.fillna('').to_dict('records') if str(row.get('question') or '').strip()]
+        st.session_state.answer_bank = saved
+        st.session_state.answers.update({entry['question']: entry['answer'] for entry in saved})
+        entries = saved
+        st.success(f"Saved {len(saved)} prepared answers")
+
+    answer_index = get_answer_index(entries)
+
+    st.markdown("### Live Call")
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        source = st.radio("Transcript source", ["File tail", "Local text stream (TCP)"], horizontal=True,
+                          key="live_source")
+        if source == "File tail":
+            # Only files in the live directory can be tailed; a typed path would read anything on the server
+            live_dir = data_dir('live')
+            names = sorted({entry.name for entry in os.scandir(live_dir) if entry.is_file()} | {DEFAULT_LIVE_FILE})
+            name = st.selectbox(f"Transcript file in {live_dir}", names, index=names.index(DEFAULT_LIVE_FILE),
+                                key="live_file")
+            path = os.path.join(live_dir, name)
+            feed_key = f"file:{path}"
+        else:
+            port = st.number_input("Port on 127.0.0.1", min_value=1024, max_value=65535, value=DEFAULT_LIVE_PORT,
+                                   key="live_port")
+            feed_key = f"tcp:{int(port)}"
+
+    # Feeds belong to the process, so a new session (e.g. after a reload) picks up the one on this source
+    feed = get_live_feed(feed_key)
+    if feed is not None and feed.running:
+        # Edits reach a running call right away
+        feed.tracker.answer_index = answer_index
+
+    with col2:
+        running = feed is not None and feed.running
+        if not running and st.button("Start Listening", disabled=not len(answer_index)):
+            speakers = st.session_state.get('management_speakers')
+            tracker = LiveQuestionTracker(answer_index, parse_speaker_list(speakers) if speakers else None)
+            script = st.session_state.get('editable_script') or ''
+            aligner = ScriptAligner(script) if script.strip() else None
+            if aligner is not None:
+                tracker.speech_listeners.append(script_listener(aligner))
+            if source == "File tail":
+                feed = LiveFeed(lambda stop: tail_file(path, stop), tracker, aligner)
+            else:
+                feed = LiveFeed(lambda stop: read_socket(int(port), stop), tracker, aligner)
+            start_live_feed(feed_key, feed)
+            st.rerun()
+        if running and st.button("Stop Listening"):
+            stop_live_feed(feed_key)
+            st.rerun()
+
+    if not len(answer_index):
+        st.info("Add prepared questions to the answer bank to start matching")
+    if feed is not None:
+        st.fragment(render_live_questions, run_every=LIVE_REFRESH_SECONDS if feed.running else None)(feed)
+
+
+def answer_bank_entries():
+    """Saved answer bank, or the generated questions with any answers written so far"""
+    if st.session_state.get('answer_bank'):
+        return st.session_state.answer_bank
+    answers = st.session_state.get('answers', {})
+    return [{'category': category, 'question': question, 'answer': answers.get(question, '')}
+            for category, questions in (st.session_state.get('questions') or {}).items()
+            for question in questions]
+
+
+def get_answer_index(entries):
+    """Session's answer index, rebuilt only when the bank changes"""
+    key = hashlib.sha256(json.dumps(entries, sort_keys=True).encode('utf-8')).hexdigest()
+    cached = st.session_state.get('answer_index')
+    if cached is None or cached[0] != key:
+        cached = st.session_state.answer_index = (key, AnswerIndex(entries))
+    return cached[1]
+
+
+def render_live_questions(feed):
+    if feed.error is not None:
+        st.error(f"Transcript feed stopped: {feed.error}")
+    elif feed.running:
+        st.caption("Listening for analyst questions...")
+    else:
+        st.caption("Stopped")
+
+    live, turns = feed.tracker.snapshot()
+    if live is not None and live['role'] == 'analyst':
+        firm = f" ({live['firm']})" if live.get('firm') else ""
+        st.markdown(f"**{live['speaker'] or 'Analyst'}{firm} is asking:** {live['text']}")
+        if live['match_ms'] is not None:
+            st.caption(f"Matched in {live['match_ms']:.1f} ms")
+        render_matches(live['matches'])
+    elif live is not None:
+        st.markdown(f"**{live['speaker']}** is speaking")
+
+    if feed.aligner is not None:
+        render_script_alignment(feed.aligner)
+
+    questions = [turn for turn in turns if turn['role'] == 'analyst']
+    if questions:
+        st.markdown("#### Earlier Questions")
+        for turn in questions:
+            with st.expander(f"{turn['speaker']}: {turn['text'][:100]}"):
+                render_matches(turn['matches'])
+
+
+def script_listener(aligner):
+    """Feed everything but analyst questions to the script aligner"""
+    def listener(role, text, new_turn):
+        if role != 'analyst':
+            aligner.feed(text, boundary=new_turn)
+    return listener
+
+
+def render_script_alignment(aligner):
+    state = aligner.snapshot()
+    st.markdown("#### Script Alignment")
+    legend = " · ".join(f'<span style="{STATUS_STYLES[status]}">{label}</span>' for status, label in
+                        [(SKIPPED, "skipped"), (REORDERED, "delivered out of order")])
+    st.markdown(f'<small>Grey is still to come; the red bar marks the speaker. {legend}</small>',
+                unsafe_allow_html=True)
+    with st.container(height=300):
+        st.markdown(aligner.render_html(state['status'], state['cursor']), unsafe_allow_html=True)
+
+    if state['adlib_in_progress']:
+        st.info(f"Off script: {state['adlib_in_progress']}")
+    for passage in reversed(state['passages']):
+        label = {'skipped': "Skipped", 'reordered': "Out of order", 'ad-lib': "Ad-lib"}[passage['kind']]
+        st.markdown(f"- **{label}:** {passage['text']}")
+    if state['live_words']:
+        st.caption(f"{state['live_words']} words aligned, "
+                   f"{state['busy_seconds'] / state['live_words'] * 1e6:.0f} µs per word")
+
+
+def render_matches(matches):
+    if not matches:
+        st.caption("No prepared answer matches yet")
+    for rank, (entry, score) in enumerate(matches):
+        label = f"{entry['question']} — {score:.0%} match" + (f" · {entry['category']}" if entry.get('category') else "")
+        if rank == 0:
+            st.success(label)
+            st.markdown(entry.get('answer') or "_No prepared answer yet_")
+        else:
+            st.markdown(f"- {label}")
@@ -0,0 +1,130 @@
+import streamlit as st
+import pandas as pd
+from datetime import datetime
+
+from utils.llm_metrics import IR_METRICS_PORT, get_llm_metrics
+from utils.startup_metrics import get_startup_metrics
+
+
+def run():
+    st.header("LLM Usage")
+    st.write("Latency, tokens and estimated cost of every model call in this server process, by call site.")
+
+    metrics = get_llm_metrics()
+    calls = pd.DataFrame(metrics.records())
+    if calls.empty:
+        st.info("No LLM calls recorded yet. Generate content on any page to see it here.")
+        render_startup()
+        return
+
+    upstream = calls[calls['cache'] == 'miss']
+
+    # Headline metrics
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Calls", len(calls))
+    with col2:
+        st.metric("Served Without Upstream Call", f"{(calls['cache'] != 'miss').mean():.0%}")
+    with col3:
+        st.metric("Estimated Cost", f"${calls['cost_usd'].fillna(0).sum():.2f}")
+    with col4:
+        st.metric("p95 Upstream Latency", f"{upstream['latency_s'].quantile(0.95):.1f}s" if not upstream.empty else "-")
+
+    # Per call site, most expensive first
+    st.subheader("By Call Site")
+    by_site = calls.groupby('call_site').agg(
+        calls=('call_site', 'size'),
+        cache_hits=('cache', lambda cache: int((cache == 'hit').sum())),
+        coalesced=('cache', lambda cache: int((cache == 'coalesced').sum())),
+        errors=('status', lambda status: int((status == 'error').sum())),
+        retries=('retries', 'sum'),
+        prompt_tokens=('prompt_tokens', 'sum'),
+        completion_tokens=('completion_tokens', 'sum'),
+        cost_usd=('cost_usd', 'sum'),
+    )
+    if not upstream.empty:
+        latency = upstream.groupby('call_site').agg(
+            p50_latency_s=('latency_s', 'median'),
+            p95_latency_s=('latency_s', lambda latency: latency.quantile(0.95)),
+            p50_ttfb_s=('ttfb_s', 'median'),
+            p50_ttft_s=('ttft_s', 'median'),
+            p50_queue_wait_s=('queue_wait_s', 'median'),
+        )
+        by_site = by_site.join(latency)
+    st.dataframe(by_site.sort_values('cost_usd', ascending=False), use_container_width=True)
+
+    # Most recent calls
+    st.subheader("Recent Calls")
+    recent = calls.sort_values('ts', ascending=False).head(200).copy()
+    recent['time'] = recent['ts'].map(lambda ts: datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S'))
+    st.dataframe(
+        recent[['time', 'call_site', 'model', 'cache', 'status', 'error', 'latency_s', 'ttfb_s', 'ttft_s',
+                'retries', 'prompt_tokens', 'completion_tokens', 'cost_usd']],
+        use_container_width=True,
+        hide_index=True
+    )
+
+    # Export options
+    st.subheader("Export")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            label="Download Calls (JSONL)",
+            data=metrics.to_jsonl(),
+            file_name=f"llm_calls_{datetime.now().strftime('%Y%m%d_%H%M')}.jsonl",
+            mime="application/x-ndjson"
+        )
+    with col2:
+        st.download_button(
+            label="Download Prometheus Metrics",
+            data=metrics.to_prometheus(),
+            file_name="llm_metrics.prom",
+            mime="text/plain"
+        )
+    if IR_METRICS_PORT:
+        st.caption(f"Scrape endpoint: http://<host>:{IR_METRICS_PORT}/metrics (JSONL at /calls.jsonl)")
+    else:
+        st.caption("Set IR_METRICS_PORT to also serve /metrics and /calls.jsonl for scraping.")
+
+    render_startup()
+
+
+def render_startup():
+    """Cold-start timings of this server process and of previous starts"""
+    st.subheader("App Startup")
+    startup = get_startup_metrics()
+    state = startup.snapshot()
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Process Start to First Script Run",
+                  f"{state['first_script_run_s']:.1f}s" if state['first_script_run_s'] is not None else "-")
+    with col2:
+        st.metric("Process Start to First Page",
+                  f"{state['first_render_s']:.1f}s" if state['first_render_s'] is not None else "-",
+                  help=state['first_page'])
+    with col3:
+        st.metric("Views Loaded", len(state['imports']))
+
+    timings = pd.DataFrame(
+        [{'page': page, 'first_render_s': seconds} for page, seconds in state['page_renders'].items()])
+    imports = pd.DataFrame(
+        [{'module': module, 'import_s': seconds} for module, seconds in state['imports'].items()])
+    col1, col2 = st.columns(2)
+    with col1:
+        st.caption("First render of each page in this process")
+        st.dataframe(timings, use_container_width=True, hide_index=True)
+    with col2:
+        st.caption("View import time on first visit")
+        st.dataframe(imports, use_container_width=True, hide_index=True)
+
+    history = startup.history()
+    if history:
+        st.caption("Previous process starts")
+        restarts = pd.DataFrame([{
+            'started': datetime.fromtimestamp(start['process_started']).strftime('%Y-%m-%d %H:%M:%S'),
+            'first_script_run_s': start['first_script_run_s'],
+            'first_render_s': start['first_render_s'],
+            'first_page': start['first_page'],
+        } for start in history])
+        st.dataframe(restarts, use_container_width=True, hide_index=True)
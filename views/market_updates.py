@@ -1,12 +1,36 @@
 import streamlit as st
+import asyncio
 import json
+import time
+from concurrent.futures import as_completed
 from datetime import datetime
 
+from utils.news_feed import get_company_news_feed
+from utils.llm_scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+from utils.openai_client import async_chat_completion, chat_completion, submit_async
+from utils.workspace_store import get_workspace_store
+
+# Company news older than this is regenerated in the background on the next visit
+COMPANY_NEWS_MAX_AGE = 3600
+
+# Peer selection defaults, shared by the Peers tab widgets and "Refresh All"
+DEFAULT_MARKET_CAP_RANGE = (1.0, 50.0)
+DEFAULT_PEER_INDUSTRIES = ["Retail", "E-commerce"]
+DEFAULT_MIN_SHARED_ANALYSTS = 3
+DEFAULT_MIN_SHARED_INVESTORS = 5
+
 def run():
     company_name = {} if 'company_name' not in st.session_state else st.session_state['company_name']
-    openai_client = st.session_state['openai_client']
     st.header(f"Market Updates - {company_name}")
 
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        regenerate_all = st.checkbox("Regenerate (ignore cached results)", key="regenerate_all")
+    with col2:
+        refresh_all = st.button("Refresh All Market Updates", key="refresh_all_market_updates")
+    if refresh_all:
+        refresh_all_market_updates(company_name, bypass_cache=regenerate_all)
+
     # Create tabs for Market Updates section - adding Peers as first tab
     mu_tab0, mu_tab1, mu_tab2, mu_tab3 = st.tabs(["Peers", "Market News", "Peer Updates", "Industry Analysis"])
 
@@ -22,14 +46,14 @@ def run():
                     "Market Cap Range ($B)",
                     min_value=0.0,
                     max_value=100.0,
-                    value=(1.0, 50.0),
+                    value=DEFAULT_MARKET_CAP_RANGE,
                     key="peer_market_cap"
                 )
                 industry_options = ["Technology", "Consumer Discretionary", "Retail", "E-commerce", "Fashion"]
                 selected_industries = st.multiselect(
                     "Industry Focus",
                     industry_options,
-                    default=["Retail", "E-commerce"],
+                    default=DEFAULT_PEER_INDUSTRIES,
                     key="peer_industries"
                 )
 
@@ -38,52 +62,27 @@ def run():
                     "Minimum Shared Analysts",
                     min_value=0,
                     max_value=20,
-                    value=3,
+                    value=DEFAULT_MIN_SHARED_ANALYSTS,
                     key="min_analysts"
                 )
                 min_shared_investors = st.slider(
                     "Minimum Shared Investors",
                     min_value=0,
                     max_value=50,
-                    value=5,
+                    value=DEFAULT_MIN_SHARED_INVESTORS,
                     key="min_investors"
                 )
 
         # Button to generate peers
+        regenerate_peers = st.checkbox("Regenerate (ignore cached result)", key="regenerate_peers")
         if st.button("Generate Peer Set", key="generate_peers"):
             with st.spinner("Analyzing peer companies..."):
-                prompt = f"""Based on the following criteria, generate a detailed analysis of 5-7 public company peers for {company_name}:
-                - Market Cap Range: ${market_cap_range[0]}B to ${market_cap_range[1]}B
-                - Industries: {', '.join(selected_industries)}
-                - Minimum shared analysts: {min_shared_analysts}
-                - Minimum shared investors: {min_shared_investors}
-
-                Return the analysis in this exact JSON format:
-                {{
-                    "peers": [
-                        {{
-                            "name": "Company Name",
-                            "ticker": "TICK",
-                            "market_cap": "$XXB",
-                            "industry": "Primary Industry",
-                            "shared_analysts": X,
-                            "shared_investors": X,
-                            "business_model_similarities": "Description...",
-                            "competitive_positioning": "Analysis..."
-                        }}
-                    ]
-                }}"""
-
                 try:
-                    response = openai_client.chat.completions.create(
-                        model="gpt-4-turbo-preview",
-                        messages=[
-                            {"role": "system",
-                             "content": "You are a financial analyst expert. Always return data in the exact JSON format specified."},
-                            {"role": "user", "content": prompt}
-                        ],
-                        temperature=0.7,
-                        response_format={"type": "json_object"}
+                    response = chat_completion(
+                        "market_updates.peer_set",
+                        bypass_cache=regenerate_peers,
+                        **peer_set_request(company_name, market_cap_range, selected_industries,
+                                           min_shared_analysts, min_shared_investors)
                     )
 
                     peers_data = json.loads(response.choices[0].message.content)
@@ -179,52 +178,25 @@ def run():
                     datetime.now().date(),
                     key="summary_date"
                 )
+                regenerate_summary = st.checkbox("Regenerate (ignore cached result)", key="regenerate_summary")
             with col2:
                 if st.button("Generate New Summary"):
                     try:
-                        # Generate a comprehensive weekly summary using GPT-4
-                        summary_prompt = f"""Create a comprehensive weekly market summary for {company_name} for the week ending {selected_date}.
-                        Include:
-                        1. Key company events and announcements
-                        2. Notable peer activities and their implications
-                        3. Major industry developments
-                        4. Stock performance analysis (company and peers)
-
-                        Format the response as JSON:
-                        {{
-                            "date": "YYYY-MM-DD",
-                            "company_events": ["event1", "event2"],
-                            "peer_events": ["event1", "event2"],
-                            "industry_events": ["event1", "event2"],
-                            "performance_data": {{
-                                "company": {{"1w": -2.3, "6m": 15.4, "52w": 28.7}},
-                                "peer_avg": {{"1w": -1.8, "6m": 12.1, "52w": 22.3}}
-                            }}
-                        }}"""
-
-                        response = openai_client.chat.completions.create(
-                            model="gpt-4-turbo-preview",
-                            messages=[
-                                {"role": "system",
-                                 "content": "You are an IR professional creating executive summaries."},
-                                {"role": "user", "content": summary_prompt}
-                            ],
-                            temperature=0.7,
-                            response_format={"type": "json_object"}
+                        response = chat_completion(
+                            "market_updates.weekly_summary",
+                            bypass_cache=regenerate_summary,
+                            **weekly_summary_request(company_name, selected_date)
                         )
 
                         new_summary = json.loads(response.choices[0].message.content)
-                        if 'weekly_summaries' not in st.session_state:
-                            st.session_state.weekly_summaries = {}
-                        st.session_state.weekly_summaries[selected_date.strftime('%Y-%m-%d')] = new_summary
+                        get_workspace_store().put_weekly_summary(company_name, selected_date, new_summary)
                         st.success("New summary generated!")
                     except Exception as e:
                         st.error(f"Error generating weekly summary: {str(e)}")
 
             # Display the summary if available
-            selected_summary_date = selected_date.strftime('%Y-%m-%d')
-            if 'weekly_summaries' in st.session_state and selected_summary_date in st.session_state.weekly_summaries:
-                summary = st.session_state.weekly_summaries[selected_summary_date]
+            summary = get_workspace_store().weekly_summary(company_name, selected_date)
+            if summary is not None:
 
                 # Create three columns for performance metrics
                 met_col1, met_col2, met_col3 = st.columns(3)
@@ -329,51 +301,29 @@ def run():
         with news_tab2:
             st.subheader(f"{company_name} News")
 
-            # Generate company-specific news using AI
-            try:
-                company_prompt = f"""Generate 5 recent, realistic market news items for {company_name}.
-                Include varied news types (earnings, operations, strategy, market performance, analyst coverage).
-                Format exactly as JSON:
-                {{
-                    "news_items": [
-                        {{
-                            "headline": "Title of the news item",
-                            "date": "YYYY-MM-DD",
-                            "summary": "2-3 sentence summary of the news",
-                            "source": "Name of news source",
-                            "link": "https://example.com/news",
-                            "category": "News category (e.g., Earnings, Strategy, etc.)"
-                        }}
-                    ]
-                }}"""
-
-                response = openai_client.chat.completions.create(
-                    model="gpt-4-turbo-preview",
-                    messages=[
-                        {"role": "system", "content": "You are a financial news analyst providing market updates."},
-                        {"role": "user", "content": company_prompt}
-                    ],
-                    temperature=0.7,
-                    response_format={"type": "json_object"}
-                )
-
-                company_news = json.loads(response.choices[0].message.content)
-
-                # Display company news
-                for news in company_news['news_items']:
-                    with st.container():
-                        st.markdown(f"### {news['headline']}")
-                        col1, col2 = st.columns([3, 1])
-                        with col1:
-                            st.markdown(f"*{news['date']}* - {news['source']}")
-                            st.markdown(news['summary'])
-                        with col2:
-                            st.markdown(f"**Category:** {news['category']}")
-                            st.markdown(f"[Read More]({news['link']})")
-                        st.markdown("---")
+            news_date = datetime.now().date().strftime('%Y-%m-%d')
+            feed_key = (company_name, news_date)
+            news_feed = get_company_news_feed()
 
-            except Exception as e:
-                st.error(f"Error generating company news: {str(e)}")
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                st.caption(f"News feed for {news_date}")
+            with col2:
+                if st.button("Generate Company News", key="generate_company_news"):
+                    entry = news_feed.get(feed_key)
+                    # A feed already on screen is refreshed for real rather than served from cache
+                    news_feed.refresh(feed_key, lambda: fetch_company_news(
+                        company_name, news_date, bypass_cache=bool(entry and entry['data'])))
+
+            # Keep an already generated feed fresh without blocking this rerun; nobody waits on it, so it yields
+            news_feed.refresh_if_stale(feed_key, lambda: fetch_company_news(company_name, news_date, bypass_cache=True,
+                                                                            priority=PRIORITY_BACKGROUND),
+                                       max_age=COMPANY_NEWS_MAX_AGE)
+
+            entry = news_feed.get(feed_key)
+            polling = bool(entry and entry['refreshing'])
+            # Poll only while a refresh is in flight; otherwise render once and stay idle
+            st.fragment(render_company_news, run_every=2 if polling else None)(feed_key, polling)
 
         # Peer News tab
         with news_tab3:
@@ -384,39 +334,17 @@ def run():
                 peers = st.session_state.peers_data['peers']
 
                 # Create a multiselect to filter which peers to show news for
+                st.session_state.peer_news_selection = peer_news_selection(
+                    peers, st.session_state.get('peer_news_selection'))
                 selected_peers = st.multiselect(
                     "Select peers to show news for:",
                     options=[f"{peer['name']} ({peer['ticker']})" for peer in peers],
-                    default=[f"{peer['name']} ({peer['ticker']})" for peer in peers[:3]]
+                    key="peer_news_selection"
                 )
 
                 if selected_peers:
                     try:
-                        peers_prompt = f"""Generate 2 recent, realistic market news items for each of these companies: {', '.join(selected_peers)}.
-                        Format exactly as JSON:
-                        {{
-                            "news_items": [
-                                {{
-                                    "company": "Company Name (TICK)",
-                                    "headline": "Title",
-                                    "date": "YYYY-MM-DD",
-                                    "summary": "2-3 sentence summary",
-                                    "source": "Source Name",
-                                    "link": "https://example.com"
-                                }}
-                            ]
-                        }}"""
-
-                        response = openai_client.chat.completions.create(
-                            model="gpt-4-turbo-preview",
-                            messages=[
-                                {"role": "system",
-                                 "content": "You are a financial news analyst providing market updates."},
-                                {"role": "user", "content": peers_prompt}
-                            ],
-                            temperature=0.7,
-                            response_format={"type": "json_object"}
-                        )
+                        response = chat_completion("market_updates.peer_news", **peer_news_request(selected_peers))
 
                         peer_news = json.loads(response.choices[0].message.content)
 
@@ -442,35 +370,10 @@ def run():
             if 'peer_industries' in st.session_state:
                 industries = st.session_state.peer_industries
             else:
-                industries = ["Retail", "E-commerce"]  # Default industries
+                industries = DEFAULT_PEER_INDUSTRIES
 
             try:
-                industry_prompt = f"""Generate 3 recent, realistic market news items for these industries: {', '.join(industries)}.
-                Include major trends, market shifts, and regulatory updates.
-                Format exactly as JSON:
-                {{
-                    "news_items": [
-                        {{
-                            "industry": "Industry Name",
-                            "headline": "Title",
-                            "date": "YYYY-MM-DD",
-                            "summary": "2-3 sentence summary",
-                            "source": "Source Name",
-                            "link": "https://example.com",
-                            "impact": "Brief description of industry impact"
-                        }}
-                    ]
-                }}"""
-
-                response = openai_client.chat.completions.create(
-                    model="gpt-4-turbo-preview",
-                    messages=[
-                        {"role": "system", "content": "You are a financial news analyst providing market updates."},
-                        {"role": "user", "content": industry_prompt}
-                    ],
-                    temperature=0.7,
-                    response_format={"type": "json_object"}
-                )
+                response = chat_completion("market_updates.industry_news", **industry_news_request(industries))
 
                 industry_news = json.loads(response.choices[0].message.content)
 
@@ -498,4 +401,285 @@ def run():
                             st.markdown("---")
 
             except Exception as e:
-                st.error(f"Error generating industry news: {str(e)}")
\ No newline at end of file
+                st.error(f"Error generating industry news: {str(e)}")
+
+
+def peer_news_selection(peers, previous=None):
+    """Keep the previous peer news selection while it still matches the peer set, else the first three peers"""
+    options = [f"{peer['name']} ({peer['ticker']})" for peer in peers]
+    if previous is not None and all(option in options for option in previous):
+        return previous
+    return options[:3]
+
+
+def refresh_all_market_updates(company_name, bypass_cache=False):
+    """Run every Market Updates generation concurrently, reporting each section as it completes"""
+    today = datetime.now().date()
+    week_ending = st.session_state.get('summary_date', today)
+    news_date = today.strftime('%Y-%m-%d')
+    industries = st.session_state.get('peer_industries', DEFAULT_PEER_INDUSTRIES)
+    previous_selection = st.session_state.get('peer_news_selection')
+
+    peers_future = submit_async(async_chat_completion(
+        "market_updates.peer_set",
+        bypass_cache=bypass_cache,
+        **peer_set_request(company_name,
+                           st.session_state.get('peer_market_cap', DEFAULT_MARKET_CAP_RANGE),
+                           industries,
+                           st.session_state.get('min_analysts', DEFAULT_MIN_SHARED_ANALYSTS),
+                           st.session_state.get('min_investors', DEFAULT_MIN_SHARED_INVESTORS))))
+
+    async def peer_news():
+        # Peer news depends on the peer set, so it starts the moment that lands
+        peers_response = await asyncio.wrap_future(peers_future)
+        selection = peer_news_selection(json.loads(peers_response.choices[0].message.content)['peers'],
+                                        previous_selection)
+        response = await async_chat_completion("market_updates.peer_news", bypass_cache=bypass_cache,
+                                               **peer_news_request(selection))
+        return selection, response
+
+    def apply_peers(response):
+        peers_data = json.loads(response.choices[0].message.content)
+        if 'peers' not in peers_data:
+            raise ValueError("Invalid response format from AI")
+        st.session_state.peers_data = peers_data
+        return f"{len(peers_data['peers'])} peers"
+
+    def apply_summary(response):
+        get_workspace_store().put_weekly_summary(company_name, week_ending,
+                                                 json.loads(response.choices[0].message.content))
+        return f"week ending {week_ending}"
+
+    def apply_company_news(response):
+        company_news = json.loads(response.choices[0].message.content)
+        get_company_news_feed().put((company_name, news_date), company_news)
+        return f"{len(company_news['news_items'])} items"
+
+    def apply_peer_news(result):
+        selection, response = result
+        st.session_state.peer_news_selection = selection
+        return f"{len(json.loads(response.choices[0].message.content)['news_items'])} items"
+
+    def apply_industry_news(response):
+        return f"{len(json.loads(response.choices[0].message.content)['news_items'])} items"
+
+    # Peer and industry news tabs read through the response cache, so landing there is enough
+    sections = {
+        peers_future: ("Peer set", apply_peers),
+        submit_async(async_chat_completion("market_updates.weekly_summary", bypass_cache=bypass_cache,
+                                           **weekly_summary_request(company_name, week_ending))):
+            ("Executive summary", apply_summary),
+        submit_async(async_chat_completion("market_updates.company_news", bypass_cache=bypass_cache,
+                                           **company_news_request(company_name, news_date))):
+            ("Company news", apply_company_news),
+        submit_async(peer_news()): ("Peer news", apply_peer_news),
+        submit_async(async_chat_completion("market_updates.industry_news", bypass_cache=bypass_cache,
+                                           **industry_news_request(industries))):
+            ("Industry news", apply_industry_news),
+    }
+
+    started = time.perf_counter()
+    failures = 0
+    with st.status("Refreshing market updates...", expanded=True) as status:
+        for future in as_completed(sections):
+            section, apply = sections[future]
+            try:
+                st.write(f"✅ {section}: {apply(future.result())} ({time.perf_counter() - started:.1f}s)")
+            except Exception as e:
+                failures += 1
+                st.write(f"❌ {section}: {str(e)}")
+        status.update(label=f"Market updates refreshed in {time.perf_counter() - started:.1f}s"
+                            + (f" ({failures} failed)" if failures else ""),
+                      state="error" if failures else "complete", expanded=bool(failures))
+
+
+def peer_set_request(company_name, market_cap_range, industries, min_shared_analysts, min_shared_investors):
+    prompt = f"""Based on the following criteria, generate a detailed analysis of 5-7 public company peers for {company_name}:
+    - Market Cap Range: ${market_cap_range[0]}B to ${market_cap_range[1]}B
+    - Industries: {', '.join(industries)}
+    - Minimum shared analysts: {min_shared_analysts}
+    - Minimum shared investors: {min_shared_investors}
+
+    Return the analysis in this exact JSON format:
+    {{
+        "peers": [
+            {{
+                "name": "Company Name",
+                "ticker": "TICK",
+                "market_cap": "$XXB",
+                "industry": "Primary Industry",
+                "shared_analysts": X,
+                "shared_investors": X,
+                "business_model_similarities": "Description...",
+                "competitive_positioning": "Analysis..."
+            }}
+        ]
+    }}"""
+
+    return dict(
+        model="gpt-4-turbo-preview",
+        messages=[
+            {"role": "system",
+             "content": "You are a financial analyst expert. Always return data in the exact JSON format specified."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.7,
+        response_format={"type": "json_object"}
+    )
+
+
+def weekly_summary_request(company_name, week_ending):
+    summary_prompt = f"""Create a comprehensive weekly market summary for {company_name} for the week ending {week_ending}.
+    Include:
+    1. Key company events and announcements
+    2. Notable peer activities and their implications
+    3. Major industry developments
+    4. Stock performance analysis (company and peers)
+
+    Format the response as JSON:
+    {{
+        "date": "YYYY-MM-DD",
+        "company_events": ["event1", "event2"],
+        "peer_events": ["event1", "event2"],
+        "industry_events": ["event1", "event2"],
+        "performance_data": {{
+            "company": {{"1w": -2.3, "6m": 15.4, "52w": 28.7}},
+            "peer_avg": {{"1w": -1.8, "6m": 12.1, "52w": 22.3}}
+        }}
+    }}"""
+
+    return dict(
+        model="gpt-4-turbo-preview",
+        messages=[
+            {"role": "system", "content": "You are an IR professional creating executive summaries."},
+            {"role": "user", "content": summary_prompt}
+        ],
+        temperature=0.7,
+        response_format={"type": "json_object"}
+    )
+
+
+def company_news_request(company_name, news_date):
+    company_prompt = f"""Generate 5 recent, realistic market news items for {company_name} as of {news_date}.
+    Include varied news types (earnings, operations, strategy, market performance, analyst coverage).
+    Format exactly as JSON:
+    {{
+        "news_items": [
+            {{
+                "headline": "Title of the news item",
+                "date": "YYYY-MM-DD",
+                "summary": "2-3 sentence summary of the news",
+                "source": "Name of news source",
+                "link": "https://example.com/news",
+                "category": "News category (e.g., Earnings, Strategy, etc.)"
+            }}
+        ]
+    }}"""
+
+    return dict(
+        model="gpt-4-turbo-preview",
+        messages=[
+            {"role": "system", "content": "You are a financial news analyst providing market updates."},
+            {"role": "user", "content": company_prompt}
+        ],
+        temperature=0.7,
+        response_format={"type": "json_object"}
+    )
+
+
+def peer_news_request(selected_peers):
+    peers_prompt = f"""Generate 2 recent, realistic market news items for each of these companies: {', '.join(selected_peers)}.
+    Format exactly as JSON:
+    {{
+        "news_items": [
+            {{
+                "company": "Company Name (TICK)",
+                "headline": "Title",
+                "date": "YYYY-MM-DD",
+                "summary": "2-3 sentence summary",
+                "source": "Source Name",
+                "link": "https://example.com"
+            }}
+        ]
+    }}"""
+
+    return dict(
+        model="gpt-4-turbo-preview",
+        messages=[
+            {"role": "system", "content": "You are a financial news analyst providing market updates."},
+            {"role": "user", "content": peers_prompt}
+        ],
+        temperature=0.7,
+        response_format={"type": "json_object"}
+    )
+
+
+def industry_news_request(industries):
+    industry_prompt = f"""Generate 3 recent, realistic market news items for these industries: {', '.join(industries)}.
+    Include major trends, market shifts, and regulatory updates.
+    Format exactly as JSON:
+    {{
+        "news_items": [
+            {{
+                "industry": "Industry Name",
+                "headline": "Title",
+                "date": "YYYY-MM-DD",
+                "summary": "2-3 sentence summary",
+                "source": "Source Name",
+                "link": "https://example.com",
+                "impact": "Brief description of industry impact"
+            }}
+        ]
+    }}"""
+
+    return dict(
+        model="gpt-4-turbo-preview",
+        messages=[
+            {"role": "system", "content": "You are a financial news analyst providing market updates."},
+            {"role": "user", "content": industry_prompt}
+        ],
+        temperature=0.7,
+        response_format={"type": "json_object"}
+    )
+
+
+def fetch_company_news(company_name, news_date, bypass_cache=False, priority=PRIORITY_INTERACTIVE):
+    """Generate the company news feed; safe to run off the script thread"""
+    response = chat_completion("market_updates.company_news", bypass_cache=bypass_cache, priority=priority,
+                               **company_news_request(company_name, news_date))
+    return json.loads(response.choices[0].message.content)
+
+
+def render_company_news(feed_key, polling=False):
+    """Render the last generated company news feed for (company, date)"""
+    entry = get_company_news_feed().get(feed_key)
+    if polling and entry and not entry['refreshing']:
+        # The refresh landed; a full rerun redraws the feed and stops the polling timer
+        st.rerun()
+
+    if entry is None or (entry['data'] is None and not entry['refreshing'] and not entry['error']):
+        st.info("No company news generated yet. Click 'Generate Company News' to create the feed.")
+        return
+
+    if entry['refreshing']:
+        st.info("Refreshing company news in the background...")
+    if entry['error']:
+        st.error(f"Error generating company news: {entry['error']}")
+    if entry['generated_at']:
+        st.caption(f"Last updated {datetime.fromtimestamp(entry['generated_at']).strftime('%Y-%m-%d %H:%M')}")
+
+    try:
+        # Display company news
+        for news in (entry['data'] or {}).get('news_items', []):
+            with st.container():
+                st.markdown(f"### {news['headline']}")
+                col1, col2 = st.columns([3, 1])
+                with col1:
+                    st.markdown(f"*{news['date']}* - {news['source']}")
+                    st.markdown(news['summary'])
+                with col2:
+                    st.markdown(f"**Category:** {news['category']}")
+                    st.markdown(f"[Read More]({news['link']})")
+                st.markdown("---")
+    except Exception as e:
+        st.error(f"Error generating company news: {str(e)}")
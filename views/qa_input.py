@@ -1,6 +1,10 @@
 import streamlit as st
+import pandas as pd
 
 from utils.openai_client import analyze_analyst_questions
+from utils.question_topics import QuestionTopicModel, historical_questions
+from utils.transcript_parser import IR_MANAGEMENT_SPEAKERS, parse_speaker_list
+from utils.workspace_store import get_workspace_store
 
 
 def run():
@@ -22,9 +26,22 @@ def run():
             col1, col2 = st.columns([2, 1])
 
             with col1:
+                management_speakers = st.text_input(
+                    "Management speakers (comma separated)",
+                    value=IR_MANAGEMENT_SPEAKERS,
+                    key="management_speakers",
+                    help="Lines starting with one of these names end an analyst's question"
+                )
+                speakers = parse_speaker_list(management_speakers)
                 if st.button("Analyze Historical Questions"):
                     with st.spinner("Analyzing previous earnings calls for analyst questions..."):
-                        analyst_questions = analyze_analyst_questions(st.session_state.uploaded_files)
+                        # Per-document results are reused unless the speaker list changed
+                        previous = st.session_state.get('analyst_question_analyses')
+                        if previous is None or previous['speakers'] != speakers:
+                            previous = {'speakers': speakers, 'documents': {}}
+                        st.session_state.analyst_question_analyses = previous
+                        analyst_questions = analyze_analyst_questions(st.session_state.uploaded_files, speakers,
+                                                                      previous['documents'])
                         st.session_state.analyst_questions = analyst_questions
 
                         if analyst_questions:
@@ -36,6 +53,12 @@ def run():
             with col2:
                 st.info(f"📊 Analyzing transcripts for analyst participation and question patterns")
 
+            # After an analysis, added or removed uploads update the results one document at a time
+            analyses = st.session_state.get('analyst_question_analyses')
+            if analyses is not None and analyses['documents'].keys() != st.session_state.uploaded_files.keys():
+                st.session_state.analyst_questions = analyze_analyst_questions(
+                    st.session_state.uploaded_files, analyses['speakers'], analyses['documents'])
+
             # Display analyst questions if available
             # Inside your Q&A Prep section, in the Analysts tab:
             if hasattr(st.session_state, 'analyst_questions') and st.session_state.analyst_questions:
@@ -86,15 +109,43 @@ def run():
     # Full Q&A Prep Tab
     with qa_tab3:
         st.subheader("Comprehensive Q&A Preparation")
-        st.info(
-            "This section will combine sell-side and buy-side preparation into a complete Q&A guide. Feature coming soon.")
 
-        # Placeholder for future comprehensive Q&A prep
+        questions = historical_questions(st.session_state.get('analyst_questions'),
+                                         get_workspace_store().meetings(limit=None, with_questions=True))
+        if not questions:
+            st.info("Analyze historical questions in the Analysts tab or record meeting questions in the IR CRM "
+                    "to see question topics and predictions.")
+        else:
+            if 'question_topics' not in st.session_state:
+                st.session_state.question_topics = QuestionTopicModel()
+            topic_model = st.session_state.question_topics.sync(questions)
+
+            st.markdown("### Question Topics")
+            st.caption(f"{len(questions)} historical questions from earnings calls and investor meetings, "
+                       "clustered by wording")
+            topics_df = pd.DataFrame([
+                {
+                    'Topic': topic['label'],
+                    'Questions': topic['questions'],
+                    'Asked By': ', '.join(topic['askers']),
+                    'Example': topic['examples'][0] if topic['examples'] else ''
+                } for topic in topic_model.topics()
+            ])
+            st.dataframe(topics_df, use_container_width=True, hide_index=True)
+
+            st.markdown("### Likely Topics This Quarter")
+            st.caption("Recent questions count most; askers with little history lean on the overall topic mix")
+            predictions_df = pd.DataFrame([
+                dict({'Analyst / Investor': asker},
+                     **{f"Topic {i + 1}": f"{label} ({probability:.0%})"
+                        for i, (label, probability) in enumerate(ranked)})
+                for asker, ranked in topic_model.predict().items()
+            ])
+            st.dataframe(predictions_df, use_container_width=True, hide_index=True)
+
         st.markdown("""
         Future features will include:
-        - Question categorization
-        - Topic prediction
         - Answer templates
         - Risk area identification
         - Preparation checklist
-        """)
\ No newline at end of file
+        """)